@@ -0,0 +1,5 @@
+"""
+Microbenchmarks for the crypto and secret-sharing hot paths.
+
+Run with `python -m benchmarks --help`.
+"""
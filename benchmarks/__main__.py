@@ -0,0 +1,56 @@
+import re
+import sys
+import json
+import argparse
+from benchmarks import suite
+
+def _parse_size(text: str) -> int:
+    match = re.fullmatch(r'(\d+)([KMG]?)B?', text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {text}")
+    return int(match.group(1)) * {'': 1, 'K': suite.KB, 'M': suite.MB, 'G': suite.GB}[match.group(2)]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Crypto and secret-sharing microbenchmarks.')
+    parser.add_argument('-o', '--output', help='Write results as JSON to this file.')
+    parser.add_argument('-b', '--baseline', help='Compare against a previous JSON result.')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                        help='Slowdown ratio reported as a regression (default: 0.10 = 10%%).')
+    parser.add_argument('-k', '--filter', default='', help='Only run cases whose name contains this text.')
+    parser.add_argument('--max-size', type=_parse_size, default=suite.MB * 64,
+                        help='Largest file size to benchmark, e.g. 4G (default: 64M).')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per sample.')
+    parser.add_argument('--quick', action='store_true', help='Fewer, shorter samples and files up to 1M.')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.repeats, args.min_time, args.max_size = 3, 0.05, min(args.max_size, suite.MB)
+
+    report = {'environment': suite.environment(), 'results': {}}
+    for case in suite.all_cases(args.max_size):
+        if args.filter not in case.name:
+            continue
+        result = suite.measure(case, repeats=args.repeats, min_time=args.min_time)
+        report['results'][case.name] = result
+        throughput = f"  {result['mb_per_s']:10.1f} MB/s" if 'mb_per_s' in result else ''
+        print(f"{case.name:48s} {result['median_s'] * 1000:12.4f} ms{throughput}", flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = suite.compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for name, base, current, ratio in regressions:
+                print(f"  {name:46s} {base * 1000:10.4f} ms -> {current * 1000:10.4f} ms  (x{ratio:.2f})")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import time
+import uuid
+import random
+import datetime
+import threading
+
+class InjectedFailure(Exception):
+    """Raised by the stand-in to simulate a failed PostgREST or Storage call."""
+
+class _Faults:
+    """Latency and error injection shared by the table and storage stand-ins."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def hit(self, what: str):
+        with self._lock:
+            delay = self.latency * self._random.uniform(0.5, 1.5) if self.latency else 0.0
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise InjectedFailure(f"Injected failure in {what}")
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+# Column defaults of the production schema besides id and created_at
+_DEFAULTS = {
+    'key_sets': {'share_generation': 0},
+    'files': {'layout': 'single'},
+}
+
+def _new_row(table: str, data: dict) -> dict:
+    row = {'id': str(uuid.uuid4()), 'created_at': _now()}
+    if table == 'audit_logs':
+        row['timestamp'] = _now()
+    row.update(_DEFAULTS.get(table, {}))
+    row.update(data)
+    return row
+
+class _Query:
+    """The subset of the postgrest-py builder SupabaseModels uses."""
+
+    def __init__(self, client, table: str):
+        self._client = client
+        self._table = table
+        self._action = None
+        self._payload = None
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def insert(self, data):
+        self._action, self._payload = 'insert', data
+        return self
+
+    def select(self, *_columns, **_kwargs):
+        self._action = 'select'
+        return self
+
+    def update(self, data):
+        self._action, self._payload = 'update', data
+        return self
+
+    def delete(self):
+        self._action = 'delete'
+        return self
+
+    def _filter(self, column, op, value):
+        self._filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda a, b: a == b, value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda a, b: a != b, value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda a, b: a is not None and a > b, value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda a, b: a is not None and a >= b, value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda a, b: a is not None and a < b, value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda a, b: a is not None and a <= b, value)
+
+    def in_(self, column, values):
+        return self._filter(column, lambda a, b: a in b, list(values))
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def _matches(self, row) -> bool:
+        return all(op(row.get(column), value) for column, op, value in self._filters)
+
+    def execute(self) -> _Response:
+        self._client.table_faults.hit(f"{self._action} {self._table}")
+        with self._client.lock:
+            rows = self._client.tables.setdefault(self._table, [])
+            if self._action == 'insert':
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                inserted = []
+                for item in payload:
+                    row = _new_row(self._table, item)
+                    rows.append(row)
+                    inserted.append(dict(row))
+                return _Response(inserted)
+
+            matched = [row for row in rows if self._matches(row)]
+            if self._action == 'update':
+                for row in matched:
+                    row.update(self._payload)
+                return _Response([dict(r) for r in matched])
+            if self._action == 'delete':
+                self._client.tables[self._table] = [row for row in rows if not self._matches(row)]
+                return _Response([dict(r) for r in matched])
+
+            if self._order:
+                column, desc = self._order
+                matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if self._limit is not None:
+                matched = matched[:self._limit]
+            return _Response([dict(r) for r in matched])
+
+class _Rpc:
+    """
+    The SQL functions SupabaseModels calls: apply_writes (migrations/010)
+    and the audit partition functions (migrations/006).
+    """
+
+    # Tables apply_writes may write
+    WRITABLE = ('key_sets', 'files', 'reconstruction_sessions', 'audit_logs')
+
+    def __init__(self, client, name: str, params: dict):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self) -> _Response:
+        handler = getattr(self, f"_{self._name}", None)
+        if handler is None:
+            raise NotImplementedError(f"No stand-in for the SQL function {self._name}")
+        self._client.table_faults.hit(f"rpc {self._name}")
+        with self._client.lock:
+            return _Response(handler(**self._params))
+
+    def _apply_writes(self, ops: list) -> list:
+        for op in ops:
+            if op.get('table') not in self.WRITABLE or op.get('op') not in ('insert', 'update', 'count'):
+                raise ValueError(f"apply_writes: cannot {op.get('op')} {op.get('table')}")
+        results = []
+        undo = []
+        try:
+            for op in ops:
+                rows = self._client.tables.setdefault(op['table'], [])
+                if op['op'] == 'insert':
+                    row = _new_row(op['table'], op['row'])
+                    rows.append(row)
+                    undo.append(lambda rows=rows, row=row: rows.remove(row))
+                    results.append(dict(row))
+                    continue
+                if op['op'] == 'update':
+                    expect = op.get('expect') or {}
+                    matched = [row for row in rows if row['id'] == op['id']
+                               and all(row.get(c) == v for c, v in expect.items())]
+                    if expect and not matched:
+                        raise ValueError(f"apply_writes: conflict: {op['table']} {op['id']} has changed")
+                    for row in matched:
+                        undo.append(lambda row=row, old=dict(row): (row.clear(), row.update(old)))
+                        row.update(op['values'])
+                elif sum(1 for row in rows if row.get(op['column']) == op['value']) != op['count']:
+                    raise ValueError(f"apply_writes: conflict: {op['table']} has changed")
+                results.append(None)
+        except Exception:
+            # One transaction, like the SQL function: nothing stays applied
+            for step in reversed(undo):
+                step()
+            raise
+        return results
+
+    def _ensure_audit_partitions(self, months_ahead: int = 3):
+        return None
+
+    def _list_audit_partitions(self) -> list:
+        counts = {}
+        for row in self._client.tables.get('audit_logs', []):
+            counts[row['timestamp'][:7]] = counts.get(row['timestamp'][:7], 0) + 1
+        return [{'month': month, 'row_count': count} for month, count in sorted(counts.items())]
+
+    def _drop_audit_partition(self, month: str):
+        rows = self._client.tables.get('audit_logs', [])
+        self._client.tables['audit_logs'] = [row for row in rows if not row['timestamp'].startswith(month)]
+        return None
+
+class _Bucket:
+    """The subset of the storage3 bucket API SupabaseStorage uses."""
+
+    def __init__(self, client, name: str):
+        self._client = client
+        self._name = name
+
+    def _objects(self) -> dict:
+        return self._client.buckets.setdefault(self._name, {})
+
+    def upload(self, path, file, file_options=None):
+        data = file.read() if hasattr(file, 'read') else bytes(file)
+        self._client.storage_faults.hit(f"upload {path}")
+        with self._client.lock:
+            self._objects()[path] = data
+        return {'Key': f"{self._name}/{path}"}
+
+    def download(self, path) -> bytes:
+        self._client.storage_faults.hit(f"download {path}")
+        with self._client.lock:
+            if path not in self._objects():
+                raise FileNotFoundError(path)
+            return self._objects()[path]
+
+    def remove(self, paths):
+        self._client.storage_faults.hit("remove")
+        with self._client.lock:
+            for path in paths:
+                self._objects().pop(path, None)
+
+    def list(self, folder='', options=None):
+        self._client.storage_faults.hit(f"list {folder}")
+        prefix = f"{folder}/" if folder else ''
+        with self._client.lock:
+            return [{'name': p[len(prefix):]} for p in self._objects() if p.startswith(prefix) and '/' not in p[len(prefix):]]
+
+    def create_signed_url(self, path, expires_in):
+        raise NotImplementedError("Signed URLs are not available offline; use download().")
+
+class _Storage:
+    def __init__(self, client):
+        self._client = client
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(self._client, bucket)
+
+class FakeSupabase:
+    """
+    In-process stand-in for the Supabase client: tables and buckets live in
+    memory, and every call can be slowed down or failed on purpose.
+
+    Args:
+        db_latency: Mean seconds added to every table call (+/-50% jitter).
+        storage_latency: Mean seconds added to every storage call.
+        error_rate: Probability that any call raises InjectedFailure.
+        seed: Seed for the jitter and failure draws.
+    """
+
+    def __init__(self, db_latency: float = 0.0, storage_latency: float = 0.0, error_rate: float = 0.0,
+                 seed: int = None):
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.buckets = {}
+        self.table_faults = _Faults(db_latency, error_rate, seed)
+        self.storage_faults = _Faults(storage_latency, error_rate, None if seed is None else seed + 1)
+        self.storage = _Storage(self)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict = None) -> _Rpc:
+        return _Rpc(self, name, params or {})
+
+def install(fake: FakeSupabase):
+    """Makes get_supabase() (and so SupabaseModels and SupabaseStorage) use fake."""
+    import os
+    import securevault.supabase_client as supabase_client
+    import securevault.storage as storage
+
+    os.environ['METADATA_BACKEND'] = 'supabase'
+    os.environ['STORAGE_BACKEND'] = 'supabase'
+    os.environ.pop('CIPHERTEXT_CACHE_DIR', None)
+    supabase_client._supabase = fake
+    storage._storage = None
@@ -0,0 +1,165 @@
+"""
+Offline load test of the web routes against an in-process Supabase stand-in.
+
+Each virtual user repeatedly walks the full workflow with its own session:
+generate a key set, encrypt a file, reconstruct the key, decrypt the file and
+view the logs. Users run as threads inside worker processes, so
+`--processes 4 --threads 8` approximates `gunicorn -w 4 --threads 8`. Each
+user stays pinned to one process, as it would with sticky sessions, because
+reconstructed keys and the stand-in's data live in process memory.
+
+    python -m benchmarks.loadtest --processes 2 --threads 4 --duration 30 \
+        --db-latency-ms 15 --storage-latency-ms 40 --error-rate 0.01
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import argparse
+import threading
+import multiprocessing
+from benchmarks.fake_supabase import FakeSupabase, install
+
+ENDPOINTS = ['/generate-key', '/encrypt-file', '/reconstruct-key', '/decrypt-file', '/logs']
+
+def _user_flow(client, fake, args, record):
+    """One pass through the workflow; stops at the first failed step."""
+    def timed(endpoint, fn, check):
+        start = time.perf_counter()
+        try:
+            response = fn()
+            ok = check(response)
+        except Exception:
+            response, ok = None, False
+        record(endpoint, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    form = {'n_shares': str(args.shares), 'threshold': str(args.threshold), 'password': 'load-test'}
+    if not timed('/generate-key',
+                 lambda: client.post('/generate-key', data=dict(form, label='load')),
+                 lambda r: r.status_code == 200 and r.mimetype == 'application/json'):
+        return
+
+    content = os.urandom(args.file_size)
+    filename = f"load-{uuid.uuid4().hex}.bin"
+    response = timed('/encrypt-file',
+                     lambda: client.post('/encrypt-file', data=dict(form, key_set_id='new', file=(io.BytesIO(content), filename)),
+                                         content_type='multipart/form-data'),
+                     lambda r: r.status_code == 200 and r.mimetype == 'application/json')
+    if response is None:
+        return
+    export = json.loads(response.data)
+
+    bundle = json.dumps({'key_set_id': export['key_set_id'], 'shares': export['shares'][:args.threshold]}).encode()
+    if not timed('/reconstruct-key',
+                 lambda: client.post('/reconstruct-key', data={'shares': [(io.BytesIO(bundle), 'shares.json')], 'password': 'load-test'},
+                                     content_type='multipart/form-data'),
+                 lambda r: r.status_code == 302 and 'decrypt-file' in r.headers.get('Location', '')):
+        return
+
+    with fake.lock:
+        file_id = next(row['id'] for row in fake.tables['files'] if row['original_filename'] == filename)
+    if not timed('/decrypt-file',
+                 lambda: client.post('/decrypt-file', data={'file_id': file_id}),
+                 lambda r: r.status_code == 200 and r.data == content):
+        return
+
+    timed('/logs', lambda: client.get('/logs'), lambda r: r.status_code == 200)
+
+def _run_process(args, start_at: float) -> list:
+    fake = FakeSupabase(args.db_latency_ms / 1000, args.storage_latency_ms / 1000, args.error_rate, seed=os.getpid())
+    install(fake)
+    from securevault import create_app
+    app = create_app()
+    app.config['SECRET_KEY'] = 'load-test'
+
+    samples = []
+    lock = threading.Lock()
+
+    def record(endpoint, seconds, ok):
+        with lock:
+            samples.append((endpoint, seconds, ok))
+
+    deadline = start_at + args.duration
+
+    def user():
+        client = app.test_client()
+        while time.time() < deadline:
+            _user_flow(client, fake, args, record)
+
+    time.sleep(max(0.0, start_at - time.time()))
+    threads = [threading.Thread(target=user) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank method
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(samples: list, duration: float) -> dict:
+    report = {'duration_s': duration, 'requests': len(samples),
+              'rps': len(samples) / duration if duration else 0.0,
+              'errors': sum(1 for _, _, ok in samples if not ok), 'endpoints': {}}
+    for endpoint in ENDPOINTS:
+        latencies = sorted(s for e, s, _ in samples if e == endpoint)
+        if not latencies:
+            continue
+        report['endpoints'][endpoint] = {
+            'requests': len(latencies),
+            'rps': len(latencies) / duration,
+            'errors': sum(1 for e, _, ok in samples if e == endpoint and not ok),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p90_ms': percentile(latencies, 0.90) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000
+        }
+    return report
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes (like gunicorn -w).')
+    parser.add_argument('--threads', type=int, default=4, help='Concurrent users per process.')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run.')
+    parser.add_argument('--db-latency-ms', type=float, default=10.0, help='Mean latency added to table calls.')
+    parser.add_argument('--storage-latency-ms', type=float, default=30.0, help='Mean latency added to storage calls.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability that a backend call fails.')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='Plaintext bytes per encrypted file.')
+    parser.add_argument('--shares', type=int, default=3)
+    parser.add_argument('--threshold', type=int, default=2)
+    parser.add_argument('-o', '--output', help='Write the report as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    start_at = time.time() + 1.0  # lets every process finish importing first
+    if args.processes == 1:
+        samples = _run_process(args, start_at)
+    else:
+        # fork keeps start-up cheap and mirrors gunicorn's worker model
+        with multiprocessing.get_context('fork').Pool(args.processes) as pool:
+            results = pool.starmap(_run_process, [(args, start_at)] * args.processes)
+        samples = [s for result in results for s in result]
+
+    report = summarize(samples, args.duration)
+    report['config'] = vars(args)
+
+    print(f"{report['requests']} requests in {args.duration:.0f}s: {report['rps']:.1f} req/s, {report['errors']} errors")
+    print(f"{'endpoint':18s} {'req/s':>8s} {'errors':>7s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:18s} {stats['rps']:8.2f} {stats['errors']:7d} {stats['p50_ms']:9.1f} "
+              f"{stats['p90_ms']:9.1f} {stats['p99_ms']:9.1f} {stats['max_ms']:9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
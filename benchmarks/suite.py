@@ -0,0 +1,201 @@
+import gc
+import os
+import time
+import random
+import statistics
+from securevault.services import security_utils, file_crypto, share_crypto, cipher_suite
+from securevault.services.sss_manager import SSSManager
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+# Larger plaintexts are timed through the multipart path (one reused part
+# buffer), since encrypting them in a single call needs twice their size in RAM
+SINGLE_SHOT_LIMIT = 256 * MB
+PART_SIZE = 8 * MB
+
+SSS_SHAPES = [(3, 2), (5, 3), (10, 5), (50, 25), (255, 128)]
+SSS_SECRET_SIZES = [32, 1 * KB]
+KDF_ITERATIONS = [10_000, 100_000, 600_000]
+FILE_SIZES = [1 * KB, 64 * KB, 1 * MB, 16 * MB, 64 * MB, 256 * MB, 1 * GB, 4 * GB]
+
+def _data(size: int, seed: int = 0) -> bytes:
+    # Deterministic input so runs on different commits time the same work
+    return random.Random(seed).randbytes(size)
+
+class Case:
+    """
+    One benchmark: `setup()` returns the zero-argument callable that is timed.
+    `nbytes` (if set) turns timings into throughput.
+    """
+
+    def __init__(self, name: str, setup, nbytes: int = None):
+        self.name = name
+        self.setup = setup
+        self.nbytes = nbytes
+
+def _sss_cases():
+    for n, k in SSS_SHAPES:
+        for size in SSS_SECRET_SIZES:
+            secret = _data(size)
+
+            def split(secret=secret, n=n, k=k):
+                return lambda: SSSManager.split_secret(secret, n, k)
+
+            def combine(secret=secret, n=n, k=k):
+                shares = SSSManager.split_secret(secret, n, k)[:k]
+                return lambda: SSSManager.combine_shares(shares)
+
+            yield Case(f"sss.split[n={n},k={k},bytes={size}]", split)
+            yield Case(f"sss.combine[n={n},k={k},bytes={size}]", combine)
+
+    # Above 255 shares the GF(2^16) field takes over
+    secret = _data(32)
+    yield Case("sss.split[n=300,k=150,bytes=32]", lambda: (lambda: SSSManager.split_secret(secret, 300, 150)))
+
+def _kdf_cases():
+    salt = _data(16)
+    for iterations in KDF_ITERATIONS:
+        yield Case(
+            f"kdf.derive_key[iterations={iterations}]",
+            lambda iterations=iterations: (lambda: security_utils.derive_key('benchmark', salt, iterations=iterations))
+        )
+
+def _file_cases(max_size: int):
+    key = _data(32, seed=1)
+    for size in FILE_SIZES:
+        if size > max_size:
+            continue
+        if size <= SINGLE_SHOT_LIMIT:
+            def encrypt(size=size):
+                plaintext = _data(size)
+                return lambda: file_crypto.encrypt_file(plaintext, key, cipher_suite.preferred())
+
+            def decrypt(size=size):
+                enc = file_crypto.encrypt_file(_data(size), key, cipher_suite.preferred())
+                return lambda: file_crypto.decrypt_file(enc['ciphertext'], key, enc['nonce'], enc['auth_tag'],
+                                                        enc['cipher_suite'])
+        else:
+            def encrypt(size=size):
+                part = _data(PART_SIZE)
+                base = file_crypto.generate_part_nonce_base()
+                count = size // PART_SIZE
+
+                def run():
+                    for i in range(count):
+                        file_crypto.encrypt_part(part, key, base, i, i == count - 1)
+                return run
+
+            def decrypt(size=size):
+                part = _data(PART_SIZE)
+                base = file_crypto.generate_part_nonce_base()
+                count = size // PART_SIZE
+                # Parts are bound to their index, so one sealed part is
+                # decrypted count times under index 0
+                sealed = file_crypto.encrypt_part(part, key, base, 0, False)
+
+                def run():
+                    for _ in range(count):
+                        file_crypto.decrypt_part(sealed, key, base, 0, False)
+                return run
+
+        yield Case(f"file.encrypt[bytes={size}]", encrypt, size)
+        yield Case(f"file.decrypt[bytes={size}]", decrypt, size)
+
+def _share_cases():
+    share = SSSManager.split_secret(_data(32), 5, 3)[0]
+    yield Case("share.wrap", lambda: (lambda: share_crypto.encrypt_share(share, 'benchmark', key_set_id='ks')))
+
+    def unwrap():
+        wrapped = share_crypto.encrypt_share(share, 'benchmark', key_set_id='ks')
+        return lambda: share_crypto.decrypt_share(wrapped, 'benchmark')
+    yield Case("share.unwrap", unwrap)
+
+def _aead_cases():
+    # Both suites side by side; file.* cases time whichever one this host prefers
+    key = _data(32, seed=1)
+    nonce = _data(12)
+    for suite in cipher_suite.SUITES:
+        for size in (64 * KB, 1 * MB):
+            def encrypt(suite=suite, size=size):
+                plaintext = _data(size)
+                aead = cipher_suite.aead(key, suite)
+                return lambda: aead.encrypt(nonce, plaintext, None)
+            yield Case(f"aead.encrypt[suite={suite},bytes={size}]", encrypt, size)
+
+def all_cases(max_size: int = 64 * MB) -> list:
+    return [*_sss_cases(), *_kdf_cases(), *_file_cases(max_size), *_aead_cases(), *_share_cases()]
+
+def measure(case: Case, repeats: int = 5, min_time: float = 0.2) -> dict:
+    """
+    Times a case: calibrates a loop count so one sample lasts at least
+    min_time, then reports statistics over `repeats` samples (per call).
+    """
+    fn = case.setup()
+    fn()  # warm-up: table construction, lazy imports, allocator
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            samples.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    result = {
+        'median_s': statistics.median(samples),
+        'min_s': min(samples),
+        'stdev_s': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'loops': loops,
+        'repeats': repeats
+    }
+    if case.nbytes:
+        result['mb_per_s'] = case.nbytes / MB / result['median_s']
+    return result
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10) -> list:
+    """
+    Cases whose median got slower than the baseline by more than threshold.
+
+    Returns:
+        list: (name, baseline_median, current_median, ratio), worst first.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        ratio = result['median_s'] / base['median_s']
+        if ratio > 1 + threshold:
+            regressions.append((name, base['median_s'], result['median_s'], ratio))
+    return sorted(regressions, key=lambda r: r[3], reverse=True)
+
+def environment() -> dict:
+    import sys
+    import platform
+    import cryptography
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'cryptography': cryptography.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
@@ -10,9 +10,56 @@ class Config:
     SUPABASE_URL = os.environ.get('SUPABASE_URL')
     SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
     
+    # Shared directory for per-worker metrics snapshots; point it at a fresh
+    # directory on each deploy so /metrics sums every gunicorn worker
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    
+    # Add per-request backend call counts to response headers (always on in debug)
+    TRACE_HEADERS = os.environ.get('TRACE_HEADERS', '').lower() in ('1', 'true', 'yes')
+    
+    # Optional on-disk LRU cache of ciphertext blobs (unset = disabled)
+    CIPHERTEXT_CACHE_DIR = os.environ.get('CIPHERTEXT_CACHE_DIR')
+    CIPHERTEXT_CACHE_MAX_BYTES = int(os.environ.get('CIPHERTEXT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+    
+    # Months of audit logs kept online (including the current one); older
+    # months are archived to storage by `flask compact-audit-logs`
+    AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', 12))
+    
+    # Metadata backend: 'supabase' (PostgREST) or 'sqlite' (embedded, WAL mode)
+    METADATA_BACKEND = os.environ.get('METADATA_BACKEND', 'supabase')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'instance/securevault.db')
+    
+    # Ciphertext storage: 'supabase' (bucket encrypted-files) or 'local'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'supabase')
+    LOCAL_STORAGE_ROOT = os.environ.get('LOCAL_STORAGE_ROOT', 'instance/storage')
+    
+    # Files larger than this are encrypted and uploaded as parallel, resumable parts
+    MULTIPART_THRESHOLD = int(os.environ.get('MULTIPART_THRESHOLD', 64 * 1024 * 1024))
+    MULTIPART_CHUNK_SIZE = int(os.environ.get('MULTIPART_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+    UPLOAD_STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR', 'instance/uploads')
+    
+    # Uploads and multipart downloads larger than this run as background jobs
+    # (0 = never) on JOB_WORKERS threads per process; the job queue is a local
+    # SQLite database, whichever METADATA_BACKEND is used
+    BACKGROUND_JOB_THRESHOLD = int(os.environ.get('BACKGROUND_JOB_THRESHOLD', 256 * 1024 * 1024))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    
+    # Information dispersal: with DISPERSAL_K > 0, files below the multipart
+    # threshold are stored as DISPERSAL_N fragments, any DISPERSAL_K of which
+    # recover them (storage cost N/K). Set DISPERSAL_TARGETS to spread the
+    # fragments over N separate backends.
+    DISPERSAL_N = int(os.environ.get('DISPERSAL_N', 0))
+    DISPERSAL_K = int(os.environ.get('DISPERSAL_K', 0))
+    
     # Session Security
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=15)
     
+    # AEAD for new encryptions: 'auto' benchmarks AES-256-GCM against
+    # ChaCha20-Poly1305 at startup and picks the faster; either name pins it.
+    # Decryption follows the suite recorded with each file and share.
+    CIPHER_SUITE = os.environ.get('CIPHER_SUITE', 'auto')
+    
     # Cryptography settings
     # PBKDF2 iterations - higher is safer but slower. 100,000 is a good baseline.
     KDF_ITERATIONS = 100_000
@@ -0,0 +1,52 @@
+# Picked up automatically by `gunicorn app:app` (see Procfile).
+import os
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# Reconstructed KEKs and background-job keys live in the memory of the worker
+# that made them, and requests are not routed back to it. One worker by
+# default, then, scaled with threads; WEB_CONCURRENCY > 1 needs sticky routing.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Import the app and do the expensive, fork-safe initialization (GF tables,
+# OpenSSL backend, KDF calibration) once in the master. Workers inherit it
+# copy-on-write, so booting or recycling a worker is just a fork.
+preload_app = True
+
+# Recycling a worker wipes its live sessions and in-flight jobs, so it is off
+# unless GUNICORN_MAX_REQUESTS is set; cheap thanks to preload_app when it is
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = 100 if max_requests else 0
+
+# Config is read before the preloaded app is imported, so this covers the whole master start-up
+_master_started = time.perf_counter()
+
+def when_ready(server):
+    from securevault import startup
+    calibration = startup.warm_up()
+    server.log.info("Startup phases: %s", startup.report())
+    server.log.info("Master ready in %.1f ms; PBKDF2 %.1f ms per share",
+                    (time.perf_counter() - _master_started) * 1000, calibration['kdf_ms_per_share'])
+
+def post_fork(server, worker):
+    # Network clients reset themselves after fork (os.register_at_fork in
+    # supabase_client); this only records how fast the worker came up.
+    worker._securevault_forked = time.perf_counter()
+
+def post_worker_init(worker):
+    from securevault import metrics
+    elapsed = time.perf_counter() - getattr(worker, '_securevault_forked', time.perf_counter())
+    metrics.REGISTRY.observe('startup.worker_boot', elapsed)
+    worker.log.info("Worker %s booted in %.1f ms", worker.pid, elapsed * 1000)
+
+def worker_exit(server, worker):
+    # A job's keys live only in the worker that accepted it, so let its
+    # background jobs finish before a recycled or stopped worker goes away
+    from securevault.services import job_queue
+    from securevault import metrics
+    unfinished = job_queue.drain(server.cfg.graceful_timeout)
+    if unfinished:
+        worker.log.warning("Worker %s exiting with %d unfinished background job(s)", worker.pid, unfinished)
+    # Its last observations, which no timer may have written yet
+    metrics.REGISTRY.flush()
@@ -0,0 +1,5 @@
+-- Envelope encryption: each file carries its own data key (DEK), wrapped
+-- under the key set's KEK. Rows without a wrapped key were encrypted
+-- directly with the split key and keep working unchanged.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS wrapped_key TEXT;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS wrap_nonce TEXT;
@@ -0,0 +1,6 @@
+-- Multipart layout: large files are stored as independently encrypted parts
+-- under '<storage_path>.parts/NNNNNN'. 'nonce' then holds the per-file nonce
+-- prefix and 'auth_tag' is empty, since every part carries its own tag.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS layout TEXT NOT NULL DEFAULT 'single';
+ALTER TABLE files ADD COLUMN IF NOT EXISTS chunk_size INTEGER;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS part_count INTEGER;
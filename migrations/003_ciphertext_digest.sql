@@ -0,0 +1,6 @@
+-- Keyless integrity digest of the stored ciphertext, recorded at upload:
+-- SHA-256 of the blob for 'single' files, Merkle root over the per-part
+-- SHA-256 digests for 'multipart' files. Checked by the integrity scrubber
+-- without any key material. NULL for files uploaded before this migration
+-- (the scrubber can backfill them).
+ALTER TABLE files ADD COLUMN IF NOT EXISTS ciphertext_digest TEXT;
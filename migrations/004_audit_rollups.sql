@@ -0,0 +1,30 @@
+-- Per-operation, per-hour audit event counts for dashboards and the /logs
+-- chart, kept current by a trigger so nothing has to scan audit_logs.
+CREATE TABLE IF NOT EXISTS audit_rollups (
+    hour TIMESTAMPTZ NOT NULL,
+    operation_type TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (hour, operation_type)
+);
+
+CREATE OR REPLACE FUNCTION audit_logs_rollup() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO audit_rollups (hour, operation_type, count)
+    VALUES (date_trunc('hour', NEW.timestamp), NEW.operation_type, 1)
+    ON CONFLICT (hour, operation_type) DO UPDATE SET count = audit_rollups.count + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_audit_logs_rollup ON audit_logs;
+CREATE TRIGGER trg_audit_logs_rollup AFTER INSERT ON audit_logs
+    FOR EACH ROW EXECUTE FUNCTION audit_logs_rollup();
+
+-- Backfill from existing history (a no-op once rollups exist)
+INSERT INTO audit_rollups (hour, operation_type, count)
+SELECT date_trunc('hour', timestamp), operation_type, COUNT(*)
+FROM audit_logs
+WHERE NOT EXISTS (SELECT 1 FROM audit_rollups)
+GROUP BY 1, 2;
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp);
@@ -0,0 +1,5 @@
+-- Indexes behind the streaming audit export (GET /logs/export): the
+-- (timestamp, id) keyset cursor and its key set and IP filters.
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp_id ON audit_logs (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_ip_timestamp ON audit_logs (ip, timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_key_set_id ON audit_logs ((details->>'key_set_id'));
@@ -0,0 +1,103 @@
+-- Range-partitions audit_logs by calendar month so recent-log queries only
+-- touch the newest partitions, and retention drops whole partitions instead
+-- of deleting rows. Old months are archived first by the retention job
+-- (flask compact-audit-logs), which records each archive in audit_archives.
+--
+-- Run in a maintenance window: the table is rebuilt and its rows copied.
+-- Re-apply any row-level security policies defined on audit_logs afterwards.
+
+BEGIN;
+
+ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned;
+DROP TRIGGER IF EXISTS trg_audit_logs_rollup ON audit_logs_unpartitioned;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE audit_logs (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    operation_type TEXT NOT NULL,
+    user_identifier TEXT,
+    details JSONB,
+    ip TEXT,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Catches rows outside every monthly partition, so inserts never fail
+CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT;
+
+CREATE OR REPLACE FUNCTION create_audit_partition(month DATE) RETURNS VOID AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+        'audit_logs_' || to_char(month, 'YYYY_MM'), month, (month + INTERVAL '1 month')::DATE
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Creates this month's partition and the next months_ahead, ahead of time
+CREATE OR REPLACE FUNCTION ensure_audit_partitions(months_ahead INT DEFAULT 3) RETURNS VOID AS $$
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        PERFORM create_audit_partition((date_trunc('month', now()) + make_interval(months => i))::DATE);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Monthly partitions as 'YYYY-MM' with planner row estimates
+CREATE OR REPLACE FUNCTION list_audit_partitions() RETURNS TABLE (month TEXT, row_count BIGINT) AS $$
+    SELECT replace(substring(c.relname FROM '^audit_logs_(\d{4}_\d{2})$'), '_', '-'), GREATEST(c.reltuples, 0)::BIGINT
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'audit_logs'::regclass AND c.relname ~ '^audit_logs_\d{4}_\d{2}$'
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION drop_audit_partition(month TEXT) RETURNS VOID AS $$
+BEGIN
+    IF month !~ '^\d{4}-\d{2}$' THEN
+        RAISE EXCEPTION 'Invalid partition month: %', month;
+    END IF;
+    EXECUTE format('DROP TABLE IF EXISTS %I', 'audit_logs_' || replace(month, '-', '_'));
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    m DATE;
+BEGIN
+    FOR m IN SELECT DISTINCT date_trunc('month', timestamp)::DATE FROM audit_logs_unpartitioned LOOP
+        PERFORM create_audit_partition(m);
+    END LOOP;
+END;
+$$;
+SELECT ensure_audit_partitions(3);
+
+INSERT INTO audit_logs (id, operation_type, user_identifier, details, ip, timestamp)
+SELECT id, operation_type, user_identifier, details, ip, timestamp FROM audit_logs_unpartitioned;
+DROP TABLE audit_logs_unpartitioned;
+
+-- Created on the parent, so every partition gets them
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_operation_timestamp ON audit_logs (operation_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp_id ON audit_logs (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_ip_timestamp ON audit_logs (ip, timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_key_set_id ON audit_logs ((details->>'key_set_id'));
+
+CREATE TRIGGER trg_audit_logs_rollup AFTER INSERT ON audit_logs
+    FOR EACH ROW EXECUTE FUNCTION audit_logs_rollup();
+
+-- One row per compacted month: where its gzipped NDJSON segment lives, its
+-- checksum and per-operation counts. Hourly counts stay in audit_rollups.
+CREATE TABLE IF NOT EXISTS audit_archives (
+    month TEXT PRIMARY KEY,
+    storage_path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    row_count BIGINT NOT NULL,
+    summary JSONB NOT NULL DEFAULT '{}',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+REVOKE ALL ON FUNCTION create_audit_partition(DATE), ensure_audit_partitions(INT),
+    list_audit_partitions(), drop_audit_partition(TEXT) FROM PUBLIC, anon, authenticated;
+
+COMMIT;
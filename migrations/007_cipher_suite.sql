@@ -0,0 +1,5 @@
+-- AEAD used for a file's content and its wrapped data key: 'AES-256-GCM' or
+-- 'CHACHA20-POLY1305', chosen per host at encryption time (see
+-- services/cipher_suite.py). NULL for files written before this migration,
+-- which are all AES-256-GCM.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS cipher_suite TEXT;
@@ -0,0 +1,4 @@
+-- Information-dispersal layout: layout = 'dispersed' files are stored as
+-- part_count fragments, any fragment_threshold of which recover the
+-- ciphertext (see services/dispersal.py). NULL for other layouts.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS fragment_threshold INTEGER;
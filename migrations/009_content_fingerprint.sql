@@ -0,0 +1,8 @@
+-- Content-hash index: HMAC-SHA256 of a file's plaintext under a key derived
+-- from its key set's KEK (see services/content_index.py). Uploads whose
+-- fingerprint already exists in the key set reuse that row's storage object.
+-- The key set is bound into the HMAC key, so the fingerprint alone is as
+-- selective as (key_set_id, fingerprint) and leaves key_set_id lookups to
+-- idx_files_key_set_id.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS content_fingerprint TEXT;
+CREATE INDEX IF NOT EXISTS idx_files_content_fingerprint ON files (content_fingerprint);
@@ -0,0 +1,57 @@
+-- Batched metadata writes: apply_writes(ops) applies a request's inserts and
+-- updates of key_sets, files, reconstruction_sessions and audit_logs in one
+-- RPC (see securevault/unit_of_work.py). PostgREST runs each RPC in its own
+-- transaction, so either every op is applied or none is.
+--
+-- ops is a JSON array, applied in order:
+--   {"op": "insert", "table": "files", "row": {"id": "<uuid>", ...}}
+--   {"op": "update", "table": "files", "id": "<uuid>", "values": {...}}
+-- Inserts name only the columns they set, so column defaults (created_at,
+-- timestamp) still apply. Returns, per op, the stored row of an insert and
+-- null for an update.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION apply_writes(ops JSONB) RETURNS JSONB AS $$
+DECLARE
+    op JSONB;
+    tbl TEXT;
+    payload JSONB;
+    columns TEXT;
+    stored JSONB;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    FOR op IN SELECT value FROM jsonb_array_elements(ops) LOOP
+        tbl := op->>'table';
+        IF tbl IS NULL OR tbl NOT IN ('key_sets', 'files', 'reconstruction_sessions', 'audit_logs') THEN
+            RAISE EXCEPTION 'apply_writes: table % is not writable', tbl;
+        END IF;
+
+        IF op->>'op' = 'insert' THEN
+            payload := op->'row';
+            SELECT string_agg(quote_ident(key), ', ') INTO columns FROM jsonb_object_keys(payload) AS key;
+            EXECUTE format(
+                'INSERT INTO %I (%s) SELECT %s FROM jsonb_populate_record(NULL::%I, $1) RETURNING to_jsonb(%I.*)',
+                tbl, columns, columns, tbl, tbl
+            ) INTO stored USING payload;
+            results := results || jsonb_build_array(stored);
+        ELSIF op->>'op' = 'update' THEN
+            payload := (op->'values') - 'id';
+            SELECT string_agg(format('%I = r.%I', key, key), ', ') INTO columns FROM jsonb_object_keys(payload) AS key;
+            EXECUTE format(
+                'UPDATE %I t SET %s FROM jsonb_populate_record(NULL::%I, $1) r WHERE t.id = r.id',
+                tbl, columns, tbl
+            ) USING payload || jsonb_build_object('id', op->>'id');
+            results := results || jsonb_build_array(NULL::JSONB);
+        ELSE
+            RAISE EXCEPTION 'apply_writes: unknown op %', op->>'op';
+        END IF;
+    END LOOP;
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Called with the service key only, like the partition functions
+REVOKE ALL ON FUNCTION apply_writes(JSONB) FROM PUBLIC, anon, authenticated;
+
+COMMIT;
@@ -0,0 +1,5 @@
+-- Share generation: incremented by every re-share and rotation, and bound
+-- into the AAD of each new share (see services/share_crypto.py). Shares of
+-- an earlier split are rejected at reconstruction, so old and new shares can
+-- never be combined into a wrong key. Existing shares are generation 0.
+ALTER TABLE key_sets ADD COLUMN IF NOT EXISTS share_generation INTEGER NOT NULL DEFAULT 0;
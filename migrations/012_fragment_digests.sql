@@ -0,0 +1,5 @@
+-- Per-fragment SHA-256 digests of dispersed files, as a JSON array in
+-- fragment index order. A fragment that fails its digest is replaced by
+-- another one when the file is fetched (see services/dispersal.py). NULL
+-- for other layouts and for files dispersed before this column existed.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS fragment_digests JSONB;
@@ -0,0 +1,70 @@
+-- Guarded writes for apply_writes (migrations/010_unit_of_work.sql), so a
+-- unit of work can fail as a whole when what it read has changed since:
+--   {"op": "update", ..., "expect": {"share_generation": 1}}
+--       applies only if the row still has those values;
+--   {"op": "count", "table": "files", "column": "key_set_id", "value": "<uuid>", "count": 3}
+--       checks that exactly that many rows match.
+-- A failed guard raises 'apply_writes: conflict ...', which rolls back every
+-- op and is reported to the app as unit_of_work.WriteConflict. Both ops
+-- return null.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION apply_writes(ops JSONB) RETURNS JSONB AS $$
+DECLARE
+    op JSONB;
+    tbl TEXT;
+    payload JSONB;
+    columns TEXT;
+    guards TEXT;
+    affected BIGINT;
+    stored JSONB;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    FOR op IN SELECT value FROM jsonb_array_elements(ops) LOOP
+        tbl := op->>'table';
+        IF tbl IS NULL OR tbl NOT IN ('key_sets', 'files', 'reconstruction_sessions', 'audit_logs') THEN
+            RAISE EXCEPTION 'apply_writes: table % is not writable', tbl;
+        END IF;
+
+        IF op->>'op' = 'insert' THEN
+            payload := op->'row';
+            SELECT string_agg(quote_ident(key), ', ') INTO columns FROM jsonb_object_keys(payload) AS key;
+            EXECUTE format(
+                'INSERT INTO %I (%s) SELECT %s FROM jsonb_populate_record(NULL::%I, $1) RETURNING to_jsonb(%I.*)',
+                tbl, columns, columns, tbl, tbl
+            ) INTO stored USING payload;
+            results := results || jsonb_build_array(stored);
+        ELSIF op->>'op' = 'update' THEN
+            payload := (op->'values') - 'id';
+            SELECT string_agg(format('%I = r.%I', key, key), ', ') INTO columns FROM jsonb_object_keys(payload) AS key;
+            SELECT coalesce(string_agg(format(' AND t.%I IS NOT DISTINCT FROM e.%I', key, key), ''), '')
+                INTO guards FROM jsonb_object_keys(coalesce(op->'expect', '{}'::JSONB)) AS key;
+            EXECUTE format(
+                'UPDATE %I t SET %s FROM jsonb_populate_record(NULL::%I, $1) r, jsonb_populate_record(NULL::%I, $2) e '
+                'WHERE t.id = r.id%s',
+                tbl, columns, tbl, tbl, guards
+            ) USING payload || jsonb_build_object('id', op->>'id'), coalesce(op->'expect', '{}'::JSONB);
+            GET DIAGNOSTICS affected = ROW_COUNT;
+            IF op ? 'expect' AND affected = 0 THEN
+                RAISE EXCEPTION 'apply_writes: conflict: % % has changed', tbl, op->>'id';
+            END IF;
+            results := results || jsonb_build_array(NULL::JSONB);
+        ELSIF op->>'op' = 'count' THEN
+            EXECUTE format('SELECT count(*) FROM %I WHERE %I::TEXT = $1', tbl, op->>'column')
+                INTO affected USING op->>'value';
+            IF affected <> (op->>'count')::BIGINT THEN
+                RAISE EXCEPTION 'apply_writes: conflict: % has changed', tbl;
+            END IF;
+            results := results || jsonb_build_array(NULL::JSONB);
+        ELSE
+            RAISE EXCEPTION 'apply_writes: unknown op %', op->>'op';
+        END IF;
+    END LOOP;
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE ALL ON FUNCTION apply_writes(JSONB) FROM PUBLIC, anon, authenticated;
+
+COMMIT;
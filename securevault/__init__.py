@@ -1,26 +1,138 @@
-from flask import Flask
-from config import Config
+from securevault import startup
 
-def create_app(config_class=Config):
-    app = Flask(__name__)
-    app.config.from_object(config_class)
+def create_app(config_class=None):
+    """
+    Builds the Flask app. Only configuration, blueprints and hooks are set up
+    here; network clients (Supabase, storage) are created lazily on first use
+    in each worker, so the app can be preloaded and forked safely.
+    """
+    with startup.phase('import_flask'):
+        from flask import Flask
 
-    # Initialize Supabase Client early to catch config errors
-    from securevault.supabase_client import get_supabase
-    try:
-        get_supabase()
-    except Exception as e:
-        print(f"Error initializing Supabase: {e}")
+    with startup.phase('config'):
+        if config_class is None:
+            from config import Config as config_class
+        app = Flask(__name__)
+        app.config.from_object(config_class)
 
     # Register custom template filters
-    from securevault.utils.filters import format_operation, format_details, format_datetime, operation_color, operation_icon
-    app.jinja_env.filters['format_operation'] = format_operation
-    app.jinja_env.filters['format_details'] = format_details
-    app.jinja_env.filters['format_datetime'] = format_datetime
-    app.jinja_env.filters['operation_color'] = operation_color
-    app.jinja_env.filters['operation_icon'] = operation_icon
+    with startup.phase('filters'):
+        from securevault.utils.filters import format_operation, format_details, format_datetime, operation_color, operation_icon
+        app.jinja_env.filters['format_operation'] = format_operation
+        app.jinja_env.filters['format_details'] = format_details
+        app.jinja_env.filters['format_datetime'] = format_datetime
+        app.jinja_env.filters['operation_color'] = operation_color
+        app.jinja_env.filters['operation_icon'] = operation_icon
 
-    from securevault import routes
-    app.register_blueprint(routes.bp)
+    with startup.phase('instrumentation'):
+        from securevault import metrics, tracing
+        metrics.init_app(app)
+        tracing.init_app(app)
+
+    with startup.phase('blueprints'):
+        from securevault import routes
+        app.register_blueprint(routes.bp)
+        register_commands(app)
 
     return app
+
+def register_commands(app):
+    import click
+
+    @app.cli.command('scrub-storage')
+    @click.option('--workers', default=4, show_default=True, help='Files checked concurrently.')
+    @click.option('--rate-mb', default=0.0, help='Read budget in MB/s (0 = unlimited).')
+    @click.option('--backfill', is_flag=True, help='Record digests for files that have none.')
+    def scrub_storage(workers, rate_mb, backfill):
+        """Verify stored ciphertexts against their recorded digests."""
+        from securevault.services import integrity
+        from securevault.services.audit_logger import AuditLogger
+        from securevault.storage import get_storage
+        from securevault.models import get_models
+
+        report = integrity.scrub(
+            get_storage(), get_models(), max_workers=workers,
+            bytes_per_sec=int(rate_mb * 1024 * 1024) or None, backfill=backfill
+        )
+        AuditLogger.log('INTEGRITY_SCRUB', user_identifier='System', details={
+            'checked': report['checked'],
+            'skipped': report['skipped'],
+            'backfilled': report['backfilled'],
+            'corrupt': report['corrupt'],
+            'missing': report['missing'],
+            'unreadable': report['unreadable']
+        })
+        click.echo(f"checked={report['checked']} skipped={report['skipped']} backfilled={report['backfilled']}")
+        for outcome in ('corrupt', 'missing', 'unreadable'):
+            for file_id in report[outcome]:
+                click.echo(f"{outcome}: {file_id}")
+        if report['corrupt'] or report['missing'] or report['unreadable']:
+            raise SystemExit(1)
+
+    @app.cli.command('resume-uploads')
+    @click.option('--min-age', default=3600, show_default=True,
+                  help='Seconds since an upload last made progress before it is resumed or removed.')
+    def resume_uploads(min_age):
+        """Finish interrupted multipart uploads and remove abandoned ones."""
+        from securevault.services import multipart_upload, job_queue
+        from securevault.services.audit_logger import AuditLogger
+        from securevault.storage import get_storage
+        from securevault.models import get_models
+
+        models = get_models()
+
+        def is_current(manifest):
+            # The data key is wrapped under the KEK of that share generation
+            key_set = models.get_key_set(manifest['record']['key_set_id'])
+            return bool(key_set) and (key_set.get('share_generation') or 0) == manifest.get('key_generation', 0)
+
+        def create_record(**record):
+            with models.unit_of_work() as uow:
+                uow.create_file_record(**record)
+                AuditLogger.log('FILE_ENCRYPTED', user_identifier='System', uow=uow, details={
+                    'filename': record['original_filename'], 'key_set_id': record['key_set_id'], 'resumed': True
+                })
+
+        # Jobs of exited processes will never resume their uploads
+        job_queue.fail_orphans()
+        report = multipart_upload.resume_pending_uploads(
+            get_storage(), app.config['UPLOAD_STAGING_DIR'], create_record=create_record, is_current=is_current,
+            skip=job_queue.staging_dirs(), min_age=min_age, max_workers=app.config['UPLOAD_WORKERS']
+        )
+        for path in report['completed']:
+            click.echo(f"completed: {path}")
+        for path in report['removed']:
+            click.echo(f"removed: {path}")
+
+    @app.cli.command('compact-audit-logs')
+    @click.option('--retain-months', type=int, default=None,
+                  help='Months kept online, including the current one (default: AUDIT_RETENTION_MONTHS).')
+    def compact_audit_logs(retain_months):
+        """
+        Archive audit log partitions older than the retention window.
+
+        Web workers drop their cached /logs rows when they next read the
+        AUDIT_COMPACTED entry this logs.
+        """
+        from securevault.services import audit_retention
+        from securevault.services.audit_logger import AuditLogger, COMPACTED, log_cache
+        from securevault.storage import get_storage
+        from securevault.models import get_models
+
+        retain_months = retain_months or app.config['AUDIT_RETENTION_MONTHS']
+        report = audit_retention.compact(get_models(), get_storage(), retain_months)
+        log_cache.clear()
+        AuditLogger.log(COMPACTED, user_identifier='System', details={
+            'retain_months': retain_months,
+            'months': [archive['month'] for archive in report['archived']],
+            'rows': sum(archive['row_count'] for archive in report['archived'])
+        })
+        for archive in report['archived']:
+            click.echo(f"archived {archive['month']}: {archive['row_count']} rows -> {archive['storage_path']}")
+        click.echo(f"retained {len(report['retained'])} month(s)")
+
+    @app.cli.command('prune-sessions')
+    def prune_sessions():
+        """Mark every expired ACTIVE reconstruction session EXPIRED."""
+        from securevault.services.reconstruction_engine import ReconstructionEngine
+        click.echo(f"expired {ReconstructionEngine.cleanup_expired_sessions()} session(s)")
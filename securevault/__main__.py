@@ -0,0 +1,4 @@
+import sys
+from securevault.cli import main
+
+sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Offline bulk operations, without the web tier or a database.
+
+    python -m securevault keygen --count 10 -n 5 -k 3 --out keysets/
+    python -m securevault encrypt documents/ sealed/ -n 5 -k 3
+    python -m securevault decrypt sealed/ restored/ --shares sealed/keyset.json
+    python -m securevault reconstruct keysets/*.json --key-out keys/
+
+Passwords are read from the environment variable named by --password-env
+(SECUREVAULT_PASSWORD by default) or prompted for. --password-file supplies
+one password per share instead.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import getpass
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from securevault.services import key_manager, security_utils, sealed_file
+
+SEALED_SUFFIX = '.svlt'
+
+# Set in each worker process by _init_worker, so the key is sent once per
+# worker rather than with every task
+_worker_key = None
+
+def _init_worker(key: bytes):
+    global _worker_key
+    _worker_key = key
+
+class Progress:
+    """One-line progress and throughput report on stderr."""
+
+    def __init__(self, total_items: int, stream=sys.stderr):
+        self.total_items = total_items
+        self.items = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.stream = stream
+
+    def update(self, nbytes: int, label: str = ''):
+        self.items += 1
+        self.bytes += nbytes
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        self.stream.write(
+            f"\r[{self.items}/{self.total_items}] {self.bytes / 1024 / 1024:.1f} MB "
+            f"{self.bytes / 1024 / 1024 / elapsed:.1f} MB/s {self.items / elapsed:.1f} items/s {label[-40:]:40s}"
+        )
+        self.stream.flush()
+
+    def finish(self):
+        self.stream.write('\n')
+        self.stream.flush()
+
+def _read_password_file(path: str) -> list:
+    with open(path) as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+def _passwords(args, n: int) -> list:
+    """N passwords for new shares."""
+    if args.password_file:
+        passwords = _read_password_file(args.password_file)
+        if len(passwords) != n:
+            raise SystemExit(f"--password-file must contain {n} passwords, one per line.")
+        return passwords
+    password = os.environ.get(args.password_env) or getpass.getpass('Share password: ')
+    return [password] * n
+
+def _unlock_passwords(args) -> list:
+    """Passwords for existing shares: one per share in bundle order, or a single shared one."""
+    if args.password_file:
+        return _read_password_file(args.password_file)
+    return [os.environ.get(args.password_env) or getpass.getpass('Share password: ')]
+
+def _write_private(path: str, data: bytes):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+
+def _new_bundle(n: int, k: int, passwords: list, key: bytes = None) -> dict:
+    """A key set bundle in the same format /encrypt-file hands out."""
+    key_set_id = str(uuid.uuid4())
+    key = key or security_utils.generate_random_key(32)
+    shares = key_manager.split_and_encrypt_key(key, n, k, passwords, key_set_id=key_set_id)
+    return {'key_set_id': key_set_id, 'n': n, 'k': k, 'shares': shares}
+
+def _recover(bundle: dict, passwords: list) -> tuple:
+    shares = bundle['shares']
+    if len(passwords) == 1:
+        passwords = passwords * len(shares)
+    return key_manager.recover_key(shares, passwords[:len(shares)], bundle['key_set_id'], bundle.get('k'))
+
+def _walk(root: str, suffix: str = '') -> list:
+    found = []
+    for dirpath, _, names in os.walk(root):
+        for name in sorted(names):
+            if name.endswith(suffix):
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(found)
+
+def _run_pool(tasks: list, fn, jobs: int, key: bytes = None) -> int:
+    """Runs fn(*task) across worker processes, reporting progress. Returns the failure count."""
+    progress = Progress(len(tasks))
+    failures = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(key,)) as pool:
+        futures = {pool.submit(fn, *task): task for task in tasks}
+        for future in as_completed(futures):
+            label = str(futures[future][0])
+            try:
+                progress.update(future.result(), label)
+            except Exception as e:
+                failures += 1
+                progress.stream.write(f"\nFAILED {label}: {e}\n")
+    progress.finish()
+    return failures
+
+# Worker tasks. Module-level so they can be pickled to worker processes.
+
+def _keygen_task(out_path: str, n: int, k: int, passwords: list) -> int:
+    bundle = _new_bundle(n, k, passwords)
+    _write_private(os.path.join(out_path, f"{bundle['key_set_id']}.json"), json.dumps(bundle, indent=2).encode())
+    return 0
+
+def _reconstruct_task(bundle_path: str, key_out: str, passwords: list) -> int:
+    with open(bundle_path) as f:
+        bundle = json.load(f)
+    key, rejected = _recover(bundle, passwords)
+    if rejected:
+        sys.stderr.write(f"\n{bundle_path}: dropped corrupt shares {rejected}\n")
+    if key_out:
+        _write_private(os.path.join(key_out, f"{bundle['key_set_id']}.key"), key)
+    return 0
+
+def _encrypt_task(src_path: str, dst_path: str, chunk_size: int) -> int:
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = dst_path + '.tmp'
+    try:
+        with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            total = sealed_file.seal(src, dst, _worker_key, chunk_size)
+    except Exception:
+        # A truncated container would only fail later, at decryption
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, dst_path)
+    return total
+
+def _decrypt_task(src_path: str, dst_path: str) -> int:
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = dst_path + '.tmp'
+    try:
+        with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            total = sealed_file.unseal(src, dst, _worker_key)
+    except Exception:
+        # Never leave partially decrypted, unauthenticated output behind
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, dst_path)
+    return total
+
+# Commands
+
+def cmd_keygen(args) -> int:
+    passwords = _passwords(args, args.n)
+    tasks = [(args.out, args.n, args.k, passwords) for _ in range(args.count)]
+    return 1 if _run_pool(tasks, _keygen_task, args.jobs) else 0
+
+def cmd_reconstruct(args) -> int:
+    passwords = _unlock_passwords(args)
+    tasks = [(path, args.key_out, passwords) for path in args.bundles]
+    return 1 if _run_pool(tasks, _reconstruct_task, args.jobs) else 0
+
+def _load_key(args) -> bytes:
+    if args.key_file:
+        with open(args.key_file, 'rb') as f:
+            return f.read()
+    passwords = _unlock_passwords(args)
+    shares = []
+    key_set_id = None
+    threshold = None
+    for path in args.shares:
+        with open(path) as f:
+            bundle = json.load(f)
+        key_set_id = key_set_id or bundle['key_set_id']
+        threshold = threshold or bundle.get('k')
+        shares.extend(bundle['shares'])
+    key, rejected = _recover({'key_set_id': key_set_id, 'k': threshold, 'shares': shares}, passwords)
+    if rejected:
+        sys.stderr.write(f"Dropped corrupt shares {rejected}\n")
+    return key
+
+def cmd_encrypt(args) -> int:
+    if args.shares:
+        key = _load_key(args)
+    else:
+        passwords = _passwords(args, args.n)
+        key = security_utils.generate_random_key(32)
+        bundle = _new_bundle(args.n, args.k, passwords, key)
+        bundle_path = args.shares_out or os.path.join(args.dst, 'keyset.json')
+        # Written before any file is encrypted, so an interrupted run never
+        # leaves ciphertext without the shares to open it
+        _write_private(bundle_path, json.dumps(bundle, indent=2).encode())
+        print(f"Key set {bundle['key_set_id']}: shares written to {bundle_path}")
+
+    tasks = [
+        (os.path.join(args.src, rel), os.path.join(args.dst, rel + SEALED_SUFFIX), args.chunk_size)
+        for rel in _walk(args.src)
+    ]
+    return 1 if _run_pool(tasks, _encrypt_task, args.jobs, key) else 0
+
+def cmd_decrypt(args) -> int:
+    key = _load_key(args)
+    tasks = [
+        (os.path.join(args.src, rel), os.path.join(args.dst, rel[:-len(SEALED_SUFFIX)]))
+        for rel in _walk(args.src, SEALED_SUFFIX)
+    ]
+    return 1 if _run_pool(tasks, _decrypt_task, args.jobs, key) else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m securevault', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes.')
+        p.add_argument('--password-env', default='SECUREVAULT_PASSWORD',
+                       help='Environment variable holding the share password.')
+        p.add_argument('--password-file', help='File with one password per share.')
+
+    def split_options(p):
+        p.add_argument('-n', type=int, default=5, help='Total shares (N).')
+        p.add_argument('-k', type=int, default=3, help='Threshold (K).')
+
+    def key_source(p):
+        p.add_argument('--shares', nargs='+', help='Key set bundle(s) to reconstruct the key from.')
+        p.add_argument('--key-file', help='Raw key written by "reconstruct --key-out".')
+
+    p = sub.add_parser('keygen', help='Generate key sets and write their share bundles.')
+    common(p)
+    split_options(p)
+    p.add_argument('--count', type=int, default=1)
+    p.add_argument('--out', required=True, help='Directory for the bundles.')
+    p.set_defaults(func=cmd_keygen)
+
+    p = sub.add_parser('reconstruct', help='Verify share bundles and optionally export their keys.')
+    common(p)
+    p.add_argument('bundles', nargs='+')
+    p.add_argument('--key-out', help='Directory to write raw keys to (mode 0600).')
+    p.set_defaults(func=cmd_reconstruct)
+
+    p = sub.add_parser('encrypt', help='Encrypt a directory tree under one key set.')
+    common(p)
+    split_options(p)
+    key_source(p)
+    p.add_argument('src')
+    p.add_argument('dst')
+    p.add_argument('--shares-out', help='Where to write the new key set bundle (default: DST/keyset.json).')
+    p.add_argument('--chunk-size', type=int, default=sealed_file.DEFAULT_CHUNK_SIZE)
+    p.set_defaults(func=cmd_encrypt)
+
+    p = sub.add_parser('decrypt', help='Decrypt a directory tree of sealed files.')
+    common(p)
+    key_source(p)
+    p.add_argument('src')
+    p.add_argument('dst')
+    p.set_defaults(func=cmd_decrypt)
+
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'decrypt' and not (args.shares or args.key_file):
+        raise SystemExit("decrypt needs --shares or --key-file.")
+    if args.command in ('keygen', 'encrypt') and not getattr(args, 'shares', None) and not 1 < args.k <= args.n:
+        raise SystemExit("Invalid threshold. Must be 1 < K <= N.")
+    try:
+        return args.func(args)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"error: {e}\n")
+        return 2
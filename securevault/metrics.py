@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import bisect
+import functools
+import threading
+from securevault import tracing
+
+# Upper bounds (seconds) of the latency buckets. Wide enough to cover a cache
+# hit (sub-millisecond) up to a multi-gigabyte multipart upload.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Minimum seconds between writes of this process's snapshot to METRICS_DIR
+FLUSH_INTERVAL = 1.0
+
+class _Registry:
+    """
+    Per-process latency histograms.
+
+    Observations only touch in-memory counters. When METRICS_DIR is set,
+    each process writes a snapshot to its own file there at most every
+    FLUSH_INTERVAL, and /metrics sums every snapshot, so the endpoint
+    reports all gunicorn workers no matter which one serves the scrape.
+    Observations that arrive between writes are written by a timer within
+    one interval, and once more at exit, so an idle worker's last requests
+    are not lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # Unique per process lifetime, so a recycled pid never overwrites
+        # the counters of the worker that previously had it
+        self._token = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+        self._histograms = {}  # stage -> [bucket counts..., +Inf count, sum]
+        self._last_flush = 0.0
+        # Timers do not survive fork, so a child schedules its own
+        self._timer = None
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked from a preloaded parent: start from zero, the parent's
+                # observations are already accounted for in its own file
+                self._reset()
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+            hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+            hist[-1] += seconds
+            now = time.monotonic()
+            wait = FLUSH_INTERVAL - (now - self._last_flush)
+            if wait <= 0:
+                self._last_flush = now
+                self._flush()
+            elif self._timer is None and os.environ.get('METRICS_DIR'):
+                self._timer = threading.Timer(wait, self._flush_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_pending(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._timer = None
+            self._last_flush = time.monotonic()
+            self._flush()
+
+    def flush(self):
+        """Writes this process's snapshot now, e.g. before it exits."""
+        with self._lock:
+            if self._pid == os.getpid() and self._histograms:
+                self._flush()
+
+    def _flush(self):
+        metrics_dir = os.environ.get('METRICS_DIR')
+        if not metrics_dir:
+            return
+        os.makedirs(metrics_dir, exist_ok=True)
+        path = os.path.join(metrics_dir, f"{self._token}.json")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._histograms, f)
+        os.replace(tmp_path, path)
+
+    def snapshot(self) -> dict:
+        """Histograms of every process writing to METRICS_DIR (or just this one)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._flush()
+            local = {stage: list(hist) for stage, hist in self._histograms.items()}
+
+        metrics_dir = os.environ.get('METRICS_DIR')
+        if not metrics_dir or not os.path.isdir(metrics_dir):
+            return local
+
+        merged = {}
+        for name in os.listdir(metrics_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(metrics_dir, name)) as f:
+                    histograms = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for stage, hist in histograms.items():
+                total = merged.setdefault(stage, [0] * (len(BUCKETS) + 1) + [0.0])
+                for i, value in enumerate(hist):
+                    total[i] += value
+        return merged
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+REGISTRY = _Registry()
+atexit.register(REGISTRY.flush)
+
+class timed:
+    """
+    Records the duration of a stage, as a decorator or a context manager:
+
+        @timed('derive_key')
+        def derive_key(...): ...
+
+        with timed('storage.get'):
+            ...
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(self.stage, time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        stage = self.stage
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(stage, time.perf_counter() - start)
+        return wrapper
+
+def untimed(fn):
+    """Marks a backend method that makes no round trip; Instrumented passes it through."""
+    fn.untimed = True
+    return fn
+
+class Instrumented:
+    """
+    Proxy that times every method call of a backend under '<prefix>.<method>'
+    and counts it against the current request's trace (see tracing).
+    Non-callable attributes and @untimed methods are passed through unchanged.
+    """
+
+    def __init__(self, target, prefix: str):
+        self._target = target
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith('_') or getattr(attr, 'untimed', False):
+            return attr
+        stage = f"{self._prefix}.{name}"
+
+        @functools.wraps(attr)
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = attr(*args, **kwargs)
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                REGISTRY.observe(stage, elapsed)
+                trace = tracing.current()
+                if trace is not None:
+                    trace.record(stage, elapsed, tracing.payload_size(*args, result))
+
+        # Cached on the proxy so later lookups skip __getattr__ entirely
+        self.__dict__[name] = wrapped
+        return wrapped
+
+def quantile(hist: list, q: float) -> float:
+    """
+    Estimates a quantile from bucket counts by linear interpolation inside
+    the bucket, as Prometheus' histogram_quantile does.
+    """
+    counts = hist[:-1]
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            lower = BUCKETS[i - 1] if i > 0 else 0.0
+            upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return BUCKETS[-1]
+
+def render_prometheus(histograms: dict) -> str:
+    """Prometheus text exposition (version 0.0.4) of the stage histograms."""
+    lines = [
+        '# HELP securevault_stage_duration_seconds Time spent per processing stage.',
+        '# TYPE securevault_stage_duration_seconds histogram'
+    ]
+    for stage in sorted(histograms):
+        hist = histograms[stage]
+        cumulative = 0
+        for i, bound in enumerate(BUCKETS):
+            cumulative += hist[i]
+            lines.append(f'securevault_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        cumulative += hist[len(BUCKETS)]
+        lines.append(f'securevault_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+        lines.append(f'securevault_stage_duration_seconds_sum{{stage="{stage}"}} {hist[-1]}')
+        lines.append(f'securevault_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+def init_app(app):
+    """Times every request under 'http.<endpoint>'."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.teardown_request
+    def _record_request_time(exc):
+        started = g.pop('request_started', None)
+        if started is not None:
+            REGISTRY.observe(f"http.{request.endpoint or 'unmatched'}", time.perf_counter() - started)
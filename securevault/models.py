@@ -0,0 +1,25 @@
+import os
+from securevault.metrics import Instrumented
+
+# One timing proxy per backend, so the wrapped methods are built only once
+_instrumented = {}
+
+def get_models():
+    """
+    Returns the metadata backend selected by METADATA_BACKEND.
+
+    Both backends expose the same static-method interface (see
+    SupabaseModels): 'supabase' (default) talks to PostgREST, 'sqlite' uses
+    the embedded database at SQLITE_PATH. Every call is timed under
+    'db.<method>' (see metrics).
+    """
+    backend = os.environ.get("METADATA_BACKEND", "supabase")
+    if backend not in _instrumented:
+        if backend == "supabase":
+            from securevault.models_supabase import SupabaseModels as models
+        elif backend == "sqlite":
+            from securevault.models_sqlite import SQLiteModels as models
+        else:
+            raise ValueError(f"Unknown METADATA_BACKEND: {backend}")
+        _instrumented[backend] = Instrumented(models, 'db')
+    return _instrumented[backend]
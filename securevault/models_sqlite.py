@@ -0,0 +1,450 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+import datetime
+from securevault.metrics import untimed
+from securevault.unit_of_work import UnitOfWork, WriteConflict
+
+# One connection per thread (sqlite3 connections are not shareable across
+# threads), re-opened after fork so workers never inherit a parent handle.
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS key_sets (
+    id TEXT PRIMARY KEY,
+    n_shares INTEGER NOT NULL,
+    threshold INTEGER NOT NULL,
+    label TEXT,
+    share_generation INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_key_sets_created_at ON key_sets (created_at);
+
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    key_set_id TEXT NOT NULL REFERENCES key_sets (id),
+    original_filename TEXT NOT NULL,
+    storage_path TEXT NOT NULL,
+    nonce TEXT NOT NULL,
+    auth_tag TEXT NOT NULL,
+    wrapped_key TEXT,
+    wrap_nonce TEXT,
+    layout TEXT NOT NULL DEFAULT 'single',
+    chunk_size INTEGER,
+    part_count INTEGER,
+    ciphertext_digest TEXT,
+    cipher_suite TEXT,
+    fragment_threshold INTEGER,
+    fragment_digests TEXT,
+    content_fingerprint TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_key_set_id ON files (key_set_id, created_at);
+
+CREATE TABLE IF NOT EXISTS reconstruction_sessions (
+    id TEXT PRIMARY KEY,
+    key_set_id TEXT NOT NULL REFERENCES key_sets (id),
+    status TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_key_set_status ON reconstruction_sessions (key_set_id, status);
+CREATE INDEX IF NOT EXISTS idx_sessions_status_expires ON reconstruction_sessions (status, expires_at);
+
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id TEXT PRIMARY KEY,
+    operation_type TEXT NOT NULL,
+    user_identifier TEXT,
+    details TEXT,
+    ip TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_operation_timestamp ON audit_logs (operation_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp_id ON audit_logs (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_ip_timestamp ON audit_logs (ip, timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_key_set_id ON audit_logs (json_extract(details, '$.key_set_id'));
+
+-- Per-operation, per-hour event counts, maintained by the trigger below so
+-- dashboards never scan audit_logs
+CREATE TABLE IF NOT EXISTS audit_rollups (
+    hour TEXT NOT NULL,
+    operation_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, operation_type)
+);
+CREATE TRIGGER IF NOT EXISTS trg_audit_logs_rollup AFTER INSERT ON audit_logs
+BEGIN
+    INSERT INTO audit_rollups (hour, operation_type, count)
+    VALUES (substr(NEW.timestamp, 1, 13) || ':00:00+00:00', NEW.operation_type, 1)
+    ON CONFLICT (hour, operation_type) DO UPDATE SET count = count + 1;
+END;
+
+-- Months compacted out of audit_logs by the retention job (see audit_retention)
+CREATE TABLE IF NOT EXISTS audit_archives (
+    month TEXT PRIMARY KEY,
+    storage_path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+# Columns added after a table was first created: (table, column, declaration).
+# CREATE TABLE IF NOT EXISTS leaves existing databases alone, so these are
+# applied with ALTER TABLE when missing.
+_ADDED_COLUMNS = [
+    ('files', 'ciphertext_digest', 'TEXT'),
+    ('files', 'cipher_suite', 'TEXT'),
+    ('files', 'fragment_threshold', 'INTEGER'),
+    ('files', 'content_fingerprint', 'TEXT'),
+    ('key_sets', 'share_generation', 'INTEGER NOT NULL DEFAULT 0'),
+    ('files', 'fragment_digests', 'TEXT'),
+]
+
+# Indexes on added columns, created once the columns exist
+_ADDED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_files_content_fingerprint ON files (content_fingerprint)",
+]
+
+def _upgrade_columns(conn: sqlite3.Connection):
+    for table, column, declaration in _ADDED_COLUMNS:
+        existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    for statement in _ADDED_INDEXES:
+        conn.execute(statement)
+
+def _backfill_rollups(conn: sqlite3.Connection):
+    # Databases created before audit_rollups existed have logs the trigger never saw
+    if conn.execute("SELECT 1 FROM audit_rollups LIMIT 1").fetchone() is None:
+        conn.execute(
+            "INSERT INTO audit_rollups (hour, operation_type, count) "
+            "SELECT substr(timestamp, 1, 13) || ':00:00+00:00', operation_type, COUNT(*) "
+            "FROM audit_logs GROUP BY 1, 2"
+        )
+
+def _month_bounds(month: str) -> tuple:
+    # 'YYYY-MM' -> [first instant, first instant of next month) as stored timestamps
+    year, mon = (int(part) for part in month.split('-'))
+    start = datetime.datetime(year, mon, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+    return start.isoformat(), end.isoformat()
+
+def _now() -> str:
+    # Same ISO-8601 shape Postgres returns, e.g. 2025-12-08T07:56:37.956276+00:00
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's connection to the database at SQLITE_PATH,
+    creating the schema on first use.
+    """
+    path = os.environ.get("SQLITE_PATH", "instance/securevault.db")
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid() or getattr(_local, 'path', None) != path:
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        _upgrade_columns(conn)
+        _backfill_rollups(conn)
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = path
+    return conn
+
+# Columns stored as JSON text
+_JSON_COLUMNS = ('details', 'summary', 'fragment_digests')
+
+def _row(row) -> dict:
+    if row is None:
+        return None
+    data = dict(row)
+    for column in _JSON_COLUMNS:
+        if column in data and data[column] is not None:
+            data[column] = json.loads(data[column])
+    return data
+
+def _insert(table: str, data: dict) -> dict:
+    data = dict(data)
+    data.setdefault('id', _new_id())
+    columns = ', '.join(data)
+    placeholders = ', '.join('?' for _ in data)
+    get_connection().execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", list(data.values()))
+    return _row(get_connection().execute(f"SELECT * FROM {table} WHERE id = ?", (data['id'],)).fetchone())
+
+class SQLiteUnitOfWork(UnitOfWork):
+    """Commits as one BEGIN IMMEDIATE ... COMMIT on this thread's connection."""
+
+    def _flush(self, ops: list) -> list:
+        conn = get_connection()
+        now = _now()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                if op['op'] == 'insert':
+                    # Stamped in place, so the caller's row matches what is stored
+                    op['row'].setdefault('timestamp' if op['table'] == 'audit_logs' else 'created_at', now)
+                    data = dict(op['row'])
+                    if op['table'] == 'audit_logs':
+                        data['details'] = json.dumps(data.get('details') or {})
+                    elif data.get('fragment_digests') is not None:
+                        data['fragment_digests'] = json.dumps(data['fragment_digests'])
+                    columns = ', '.join(data)
+                    placeholders = ', '.join('?' for _ in data)
+                    conn.execute(f"INSERT INTO {op['table']} ({columns}) VALUES ({placeholders})", list(data.values()))
+                elif op['op'] == 'update':
+                    expect = op.get('expect') or {}
+                    assignments = ', '.join(f"{column} = ?" for column in op['values'])
+                    guards = ''.join(f" AND {column} IS ?" for column in expect)
+                    cursor = conn.execute(
+                        f"UPDATE {op['table']} SET {assignments} WHERE id = ?{guards}",
+                        [*op['values'].values(), op['id'], *expect.values()]
+                    )
+                    if expect and cursor.rowcount == 0:
+                        raise WriteConflict(f"{op['table']} {op['id']} has changed.")
+                else:
+                    (found,) = conn.execute(
+                        f"SELECT COUNT(*) FROM {op['table']} WHERE {op['column']} = ?", (op['value'],)
+                    ).fetchone()
+                    if found != op['count']:
+                        raise WriteConflict(f"{op['table']} has changed.")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return None
+
+class SQLiteModels:
+    """
+    Embedded metadata backend with the same interface as SupabaseModels.
+    Suited to single-node and edge deployments, and to tests that need
+    real queries.
+    """
+
+    @staticmethod
+    @untimed
+    def unit_of_work() -> UnitOfWork:
+        return SQLiteUnitOfWork()
+
+    @staticmethod
+    def create_key_set(n_shares: int, threshold: int, label: str = None) -> dict:
+        return _insert('key_sets', {
+            'n_shares': n_shares,
+            'threshold': threshold,
+            'label': label,
+            'created_at': _now()
+        })
+
+    @staticmethod
+    def get_key_set(key_set_id: str) -> dict:
+        return _row(get_connection().execute("SELECT * FROM key_sets WHERE id = ?", (key_set_id,)).fetchone())
+
+    @staticmethod
+    def list_key_sets() -> list:
+        rows = get_connection().execute("SELECT * FROM key_sets ORDER BY created_at DESC").fetchall()
+        return [_row(r) for r in rows]
+
+    @staticmethod
+    def update_key_set_shares(key_set_id: str, n_shares: int, threshold: int, share_generation: int = None) -> bool:
+        if share_generation is None:
+            return get_connection().execute(
+                "UPDATE key_sets SET n_shares = ?, threshold = ? WHERE id = ?", (n_shares, threshold, key_set_id)
+            ).rowcount > 0
+        return get_connection().execute(
+            "UPDATE key_sets SET n_shares = ?, threshold = ?, share_generation = ? WHERE id = ? AND share_generation = ?",
+            (n_shares, threshold, share_generation, key_set_id, share_generation - 1)
+        ).rowcount > 0
+
+    @staticmethod
+    def create_file_record(original_filename: str, storage_path: str, nonce: str, auth_tag: str, key_set_id: str,
+                           wrapped_key: str = None, wrap_nonce: str = None,
+                           layout: str = 'single', chunk_size: int = None, part_count: int = None,
+                           ciphertext_digest: str = None, cipher_suite: str = None,
+                           fragment_threshold: int = None, content_fingerprint: str = None,
+                           fragment_digests: list = None) -> dict:
+        return _insert('files', {
+            'original_filename': original_filename,
+            'storage_path': storage_path,
+            'nonce': nonce,
+            'auth_tag': auth_tag,
+            'key_set_id': key_set_id,
+            'wrapped_key': wrapped_key,
+            'wrap_nonce': wrap_nonce,
+            'layout': layout,
+            'chunk_size': chunk_size,
+            'part_count': part_count,
+            'ciphertext_digest': ciphertext_digest,
+            'cipher_suite': cipher_suite,
+            'fragment_threshold': fragment_threshold,
+            'fragment_digests': json.dumps(fragment_digests) if fragment_digests is not None else None,
+            'content_fingerprint': content_fingerprint,
+            'created_at': _now()
+        })
+
+    @staticmethod
+    def get_file_record(file_id: str) -> dict:
+        return _row(get_connection().execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone())
+
+    @staticmethod
+    def list_files_for_keyset(key_set_id: str) -> list:
+        rows = get_connection().execute(
+            "SELECT * FROM files WHERE key_set_id = ? ORDER BY created_at", (key_set_id,)
+        ).fetchall()
+        return [_row(r) for r in rows]
+
+    @staticmethod
+    def find_file_by_fingerprint(key_set_id: str, content_fingerprint: str) -> dict:
+        return _row(get_connection().execute(
+            "SELECT * FROM files WHERE key_set_id = ? AND content_fingerprint = ? ORDER BY created_at LIMIT 1",
+            (key_set_id, content_fingerprint)
+        ).fetchone())
+
+    @staticmethod
+    def list_files(after_id: str = None, limit: int = 500) -> list:
+        rows = get_connection().execute(
+            "SELECT * FROM files WHERE id > ? ORDER BY id LIMIT ?", (after_id or '', limit)
+        ).fetchall()
+        return [_row(r) for r in rows]
+
+    @staticmethod
+    def update_file_digest(file_id: str, ciphertext_digest: str):
+        get_connection().execute("UPDATE files SET ciphertext_digest = ? WHERE id = ?", (ciphertext_digest, file_id))
+
+    @staticmethod
+    def update_file_wrapped_key(file_id: str, wrapped_key: str, wrap_nonce: str):
+        get_connection().execute(
+            "UPDATE files SET wrapped_key = ?, wrap_nonce = ? WHERE id = ?", (wrapped_key, wrap_nonce, file_id)
+        )
+
+    @staticmethod
+    def create_reconstruction_session(key_set_id: str, expires_at: str) -> dict:
+        return _insert('reconstruction_sessions', {
+            'key_set_id': key_set_id,
+            'expires_at': expires_at,
+            'status': 'ACTIVE',
+            'created_at': _now()
+        })
+
+    @staticmethod
+    def get_active_session(key_set_id: str) -> dict:
+        return _row(get_connection().execute(
+            "SELECT * FROM reconstruction_sessions WHERE key_set_id = ? AND status = 'ACTIVE' "
+            "ORDER BY created_at DESC LIMIT 1", (key_set_id,)
+        ).fetchone())
+
+    @staticmethod
+    def update_session_status(session_id: str, status: str):
+        get_connection().execute("UPDATE reconstruction_sessions SET status = ? WHERE id = ?", (status, session_id))
+
+    @staticmethod
+    def expire_stale_sessions(now: str) -> int:
+        return get_connection().execute(
+            "UPDATE reconstruction_sessions SET status = 'EXPIRED' WHERE status = 'ACTIVE' AND expires_at < ?", (now,)
+        ).rowcount
+
+    @staticmethod
+    def insert_audit_log(data: dict):
+        data = dict(data)
+        data['details'] = json.dumps(data.get('details') or {})
+        data.setdefault('timestamp', _now())
+        return _insert('audit_logs', data)
+
+    @staticmethod
+    def list_audit_logs(limit: int = 50, since: str = None) -> list:
+        rows = get_connection().execute(
+            "SELECT * FROM audit_logs WHERE timestamp >= ? ORDER BY timestamp DESC LIMIT ?", (since or '', limit)
+        ).fetchall()
+        return [_row(r) for r in rows]
+
+    @staticmethod
+    def list_audit_logs_page(after: tuple = None, limit: int = 1000, operation_types: list = None,
+                             since: str = None, until: str = None, key_set_id: str = None, ip: str = None) -> list:
+        clauses, params = [], []
+        if after:
+            clauses.append("(timestamp, id) > (?, ?)")
+            params.extend(after)
+        if operation_types:
+            clauses.append(f"operation_type IN ({', '.join('?' for _ in operation_types)})")
+            params.extend(operation_types)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if key_set_id:
+            clauses.append("json_extract(details, '$.key_set_id') = ?")
+            params.append(key_set_id)
+        if ip:
+            clauses.append("ip = ?")
+            params.append(ip)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ''
+        rows = get_connection().execute(
+            f"SELECT * FROM audit_logs {where}ORDER BY timestamp, id LIMIT ?", params + [limit]
+        ).fetchall()
+        return [_row(r) for r in rows]
+
+    # SQLite has no table partitioning. A "partition" here is a calendar month
+    # of the timestamp index: listing and dropping one are index range
+    # operations, so their cost depends on the month, not the table.
+
+    @staticmethod
+    def ensure_audit_partitions(months_ahead: int = 3):
+        pass
+
+    @staticmethod
+    def list_audit_partitions() -> list:
+        conn = get_connection()
+        # Candidate months come from the small rollup table, not a scan of audit_logs
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(hour, 1, 7) FROM audit_rollups ORDER BY 1"
+        )]
+        partitions = []
+        for month in months:
+            since, until = _month_bounds(month)
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM audit_logs WHERE timestamp >= ? AND timestamp < ?", (since, until)
+            ).fetchone()
+            if count:
+                partitions.append({'month': month, 'row_count': count})
+        return partitions
+
+    @staticmethod
+    def drop_audit_partition(month: str):
+        since, until = _month_bounds(month)
+        get_connection().execute("DELETE FROM audit_logs WHERE timestamp >= ? AND timestamp < ?", (since, until))
+
+    @staticmethod
+    def upsert_audit_archive(data: dict) -> dict:
+        data = dict(data)
+        data['summary'] = json.dumps(data.get('summary') or {})
+        data['created_at'] = _now()
+        columns = ', '.join(data)
+        placeholders = ', '.join('?' for _ in data)
+        conn = get_connection()
+        conn.execute(f"INSERT OR REPLACE INTO audit_archives ({columns}) VALUES ({placeholders})", list(data.values()))
+        return _row(conn.execute("SELECT * FROM audit_archives WHERE month = ?", (data['month'],)).fetchone())
+
+    @staticmethod
+    def list_audit_archives() -> list:
+        rows = get_connection().execute("SELECT * FROM audit_archives ORDER BY month").fetchall()
+        return [_row(r) for r in rows]
+
+    @staticmethod
+    def list_audit_rollups(since: str = None) -> list:
+        rows = get_connection().execute(
+            "SELECT * FROM audit_rollups WHERE hour >= ? ORDER BY hour", (since or '',)
+        ).fetchall()
+        return [_row(r) for r in rows]
@@ -1,6 +1,34 @@
 from securevault.supabase_client import get_supabase
+from securevault.metrics import untimed
+from securevault.unit_of_work import UnitOfWork, WriteConflict
+
+class SupabaseUnitOfWork(UnitOfWork):
+    """
+    Commits through apply_writes (migrations/010_unit_of_work.sql): one RPC,
+    which PostgREST runs in a single transaction.
+    """
+
+    def _flush(self, ops: list) -> list:
+        try:
+            response = get_supabase().rpc('apply_writes', {'ops': ops}).execute()
+        except Exception as e:
+            # Raised by a failed guard (migrations/013_unit_of_work_guards.sql)
+            if 'apply_writes: conflict' in str(e):
+                raise WriteConflict(str(e)) from e
+            raise
+        return response.data or []
 
 class SupabaseModels:
+
+    @staticmethod
+    @untimed
+    def unit_of_work() -> UnitOfWork:
+        """
+        Starts a batch of inserts and updates of key_sets, files,
+        reconstruction_sessions and audit_logs, committed together in one
+        round trip (see unit_of_work.UnitOfWork).
+        """
+        return SupabaseUnitOfWork()
     
     @staticmethod
     def create_key_set(n_shares: int, threshold: int, label: str = None) -> dict:
@@ -23,13 +51,61 @@ class SupabaseModels:
         return response.data
 
     @staticmethod
-    def create_file_record(original_filename: str, storage_path: str, nonce: str, auth_tag: str, key_set_id: str) -> dict:
+    def update_key_set_shares(key_set_id: str, n_shares: int, threshold: int, share_generation: int = None) -> bool:
+        """
+        Records a new split of a key set.
+
+        With share_generation, the row is only updated if it is still at the
+        generation before, so of two concurrent re-shares only one wins.
+
+        Returns:
+            bool: Whether the row was updated.
+        """
+        data = {
+            'n_shares': n_shares,
+            'threshold': threshold
+        }
+        query = get_supabase().table('key_sets')
+        if share_generation is None:
+            query = query.update(data).eq('id', key_set_id)
+        else:
+            query = query.update(dict(data, share_generation=share_generation)) \
+                .eq('id', key_set_id) \
+                .eq('share_generation', share_generation - 1)
+        response = query.execute()
+        return bool(response.data)
+
+    @staticmethod
+    def create_file_record(original_filename: str, storage_path: str, nonce: str, auth_tag: str, key_set_id: str,
+                           wrapped_key: str = None, wrap_nonce: str = None,
+                           layout: str = 'single', chunk_size: int = None, part_count: int = None,
+                           ciphertext_digest: str = None, cipher_suite: str = None,
+                           fragment_threshold: int = None, content_fingerprint: str = None,
+                           fragment_digests: list = None) -> dict:
         data = {
             'original_filename': original_filename,
             'storage_path': storage_path,
             'nonce': nonce,
             'auth_tag': auth_tag,
-            'key_set_id': key_set_id
+            'key_set_id': key_set_id,
+            # Envelope mode: the per-file data key wrapped under the key-set KEK
+            'wrapped_key': wrapped_key,
+            'wrap_nonce': wrap_nonce,
+            # 'multipart' files are stored as independently encrypted parts,
+            # 'dispersed' ones as part_count IDA fragments
+            'layout': layout,
+            'chunk_size': chunk_size,
+            'part_count': part_count,
+            # Keyless SHA-256 (Merkle root for multipart) checked by the integrity scrubber
+            'ciphertext_digest': ciphertext_digest,
+            # AEAD of the content and wrapped key; NULL means AES-256-GCM
+            'cipher_suite': cipher_suite,
+            # 'dispersed' files: K of the part_count fragments recover the ciphertext
+            'fragment_threshold': fragment_threshold,
+            # 'dispersed' files: SHA-256 of each fragment, checked as it is fetched
+            'fragment_digests': fragment_digests,
+            # Keyed HMAC of the plaintext, unique per key set (see content_index)
+            'content_fingerprint': content_fingerprint
         }
         response = get_supabase().table('files').insert(data).execute()
         return response.data[0] if response.data else None
@@ -44,6 +120,36 @@ class SupabaseModels:
         response = get_supabase().table('files').select('*').eq('key_set_id', key_set_id).execute()
         return response.data if response.data else []
 
+    @staticmethod
+    def find_file_by_fingerprint(key_set_id: str, content_fingerprint: str) -> dict:
+        response = get_supabase().table('files').select('*') \
+            .eq('key_set_id', key_set_id) \
+            .eq('content_fingerprint', content_fingerprint) \
+            .order('created_at') \
+            .limit(1) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    def list_files(after_id: str = None, limit: int = 500) -> list:
+        # Keyset pagination on id so full scans never use growing OFFSETs
+        query = get_supabase().table('files').select('*').order('id').limit(limit)
+        if after_id:
+            query = query.gt('id', after_id)
+        response = query.execute()
+        return response.data if response.data else []
+
+    @staticmethod
+    def update_file_digest(file_id: str, ciphertext_digest: str):
+        get_supabase().table('files').update({'ciphertext_digest': ciphertext_digest}).eq('id', file_id).execute()
+
+    @staticmethod
+    def update_file_wrapped_key(file_id: str, wrapped_key: str, wrap_nonce: str):
+        get_supabase().table('files').update({
+            'wrapped_key': wrapped_key,
+            'wrap_nonce': wrap_nonce
+        }).eq('id', file_id).execute()
+
     @staticmethod
     def create_reconstruction_session(key_set_id: str, expires_at: str) -> dict:
         data = {
@@ -68,3 +174,92 @@ class SupabaseModels:
     @staticmethod
     def update_session_status(session_id: str, status: str):
         get_supabase().table('reconstruction_sessions').update({'status': status}).eq('id', session_id).execute()
+
+    @staticmethod
+    def expire_stale_sessions(now: str) -> int:
+        # One bulk UPDATE (served by idx_sessions_status_expires) instead of a row at a time
+        response = get_supabase().table('reconstruction_sessions') \
+            .update({'status': 'EXPIRED'}) \
+            .eq('status', 'ACTIVE') \
+            .lt('expires_at', now) \
+            .execute()
+        return len(response.data) if response.data else 0
+
+    @staticmethod
+    def insert_audit_log(data: dict) -> dict:
+        response = get_supabase().table('audit_logs').insert(data).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    def list_audit_logs(limit: int = 50, since: str = None) -> list:
+        query = get_supabase().table('audit_logs').select('*')
+        if since:
+            query = query.gte('timestamp', since)
+        response = query.order('timestamp', desc=True).limit(limit).execute()
+        return response.data if response.data else []
+
+    @staticmethod
+    def list_audit_logs_page(after: tuple = None, limit: int = 1000, operation_types: list = None,
+                             since: str = None, until: str = None, key_set_id: str = None, ip: str = None) -> list:
+        """
+        One page of audit logs in (timestamp, id) order, for exports.
+
+        Args:
+            after (tuple): (timestamp, id) of the last row of the previous page.
+            limit (int): Page size.
+            operation_types, since, until, key_set_id, ip: Optional filters;
+                until is exclusive.
+        """
+        query = get_supabase().table('audit_logs').select('*')
+        if after:
+            timestamp, log_id = after
+            # Keyset cursor; quoted because timestamps contain reserved characters
+            query = query.or_(f'timestamp.gt."{timestamp}",and(timestamp.eq."{timestamp}",id.gt.{log_id})')
+        if operation_types:
+            query = query.in_('operation_type', operation_types)
+        if since:
+            query = query.gte('timestamp', since)
+        if until:
+            query = query.lt('timestamp', until)
+        if key_set_id:
+            query = query.eq('details->>key_set_id', key_set_id)
+        if ip:
+            query = query.eq('ip', ip)
+        # One order parameter with both columns; repeated .order() calls send two
+        response = query.order('timestamp,id').limit(limit).execute()
+        return response.data if response.data else []
+
+    # Partition management runs through the SQL functions in
+    # migrations/006_partition_audit_logs.sql
+
+    @staticmethod
+    def ensure_audit_partitions(months_ahead: int = 3):
+        get_supabase().rpc('ensure_audit_partitions', {'months_ahead': months_ahead}).execute()
+
+    @staticmethod
+    def list_audit_partitions() -> list:
+        response = get_supabase().rpc('list_audit_partitions', {}).execute()
+        return response.data if response.data else []
+
+    @staticmethod
+    def drop_audit_partition(month: str):
+        get_supabase().rpc('drop_audit_partition', {'month': month}).execute()
+
+    @staticmethod
+    def upsert_audit_archive(data: dict) -> dict:
+        response = get_supabase().table('audit_archives').upsert(data).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    def list_audit_archives() -> list:
+        response = get_supabase().table('audit_archives').select('*').order('month').execute()
+        return response.data if response.data else []
+
+    @staticmethod
+    def list_audit_rollups(since: str = None) -> list:
+        # Maintained by the trigger in migrations/004_audit_rollups.sql
+        query = get_supabase().table('audit_rollups').select('*')
+        if since:
+            query = query.gte('hour', since)
+        response = query.order('hour').execute()
+        return response.data if response.data else []
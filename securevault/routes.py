@@ -1,15 +1,24 @@
+import os
 import json
 import io
-from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, session
-from securevault.services import key_manager, file_crypto, reconstruction_engine, audit_logger
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, current_app, stream_with_context, render_template, request, flash, redirect, url_for, send_file, session
+from securevault.services import key_manager, file_crypto, reconstruction_engine, audit_logger, audit_export, cipher_suite, security_utils, multipart_upload, integrity, dispersal, content_index, job_queue, sealed_file
 
 
-from securevault.supabase_client import get_supabase
-from securevault.models_supabase import SupabaseModels
+from securevault.storage import get_storage
+from securevault.models import get_models
+from securevault.unit_of_work import WriteConflict
+from securevault import metrics
+from securevault.utils.filters import format_operation
 
 bp = Blueprint('main', __name__)
 
+# Background jobs remembered per browser session
+MAX_SESSION_JOBS = 20
+
 @bp.route('/')
 def index():
     return render_template('index.html')
@@ -31,16 +40,16 @@ def generate_key():
                 flash('Invalid threshold. Must be 1 < K <= N.', 'danger')
                 return redirect(url_for('main.generate_key'))
 
-            result = key_manager.generate_and_split_key(n_shares, threshold, passwords)
+            # The KeySet row gets its ID when queued, so the shares can be bound
+            # to it; the row and its audit entry are written together
+            uow = get_models().unit_of_work()
+            key_set = uow.create_key_set(n_shares, threshold, label)
             
-            # Store KeySet in DB
-            key_set = SupabaseModels.create_key_set(n_shares, threshold, label)
-            if not key_set:
-                 flash('Database Error: Failed to create Key Set record.', 'danger')
-                 return redirect(url_for('main.generate_key'))
+            result = key_manager.generate_and_split_key(n_shares, threshold, passwords, key_set_id=key_set['id'])
             
             # Log
-            audit_logger.AuditLogger.log('KEY_GENERATION', user_identifier='Guest', details={'key_set_id': key_set['id'], 'label': label})
+            audit_logger.AuditLogger.log('KEY_GENERATION', user_identifier='Guest', details={'key_set_id': key_set['id'], 'label': label}, uow=uow)
+            uow.commit()
             
             # Prepare shares for download - simplified
             shares_export = {
@@ -67,6 +76,152 @@ def generate_key():
     
     return render_template('generate_key.html')
 
+def _run_in_background(size: int) -> bool:
+    # Forced with the form's 'background' field, or above BACKGROUND_JOB_THRESHOLD
+    threshold = current_app.config['BACKGROUND_JOB_THRESHOLD']
+    return bool(request.form.get('background')) or bool(threshold and size > threshold)
+
+def _job_redirect(job: dict, result_key: bytes = None):
+    # Jobs are only visible to the browser session that submitted them
+    session['jobs'] = session.get('jobs', [])[-(MAX_SESSION_JOBS - 1):] + [job['id']]
+    if result_key:
+        # The key of a sealed result stays with the client that may read it,
+        # so whichever worker serves the download can unseal it
+        keys = {job_id: key for job_id, key in session.get('job_keys', {}).items() if job_id in session['jobs']}
+        keys[job['id']] = security_utils.encode_bytes_to_base64(result_key)
+        session['job_keys'] = keys
+    return redirect(url_for('main.job_status', job_id=job['id']))
+
+def _store_file(src, file_size: int, record: dict, data_key: bytes, fingerprint_key: bytes,
+                check_duplicates: bool, uow, job: job_queue.Job = None, ip: str = None,
+                key_generation: int = 0) -> tuple:
+    """
+    Encrypts and uploads a plaintext stream, then queues its `files` row.
+
+    Args:
+        src: Seekable binary stream of plaintext, positioned at its start.
+        file_size (int): Plaintext bytes.
+        record (dict): Naming and key fields of the row; completed in place.
+        data_key (bytes): The file's DEK (wrapped in record).
+        fingerprint_key (bytes): The key set's content-fingerprint key.
+        check_duplicates (bool): Look the content up in the key set first.
+        uow (UnitOfWork): Batch the row and its audit entry are queued on;
+            the caller commits it.
+        job (Job): The background job doing this, for progress and resume.
+        ip (str): Client address for the audit log, outside a request.
+        key_generation (int): Share generation of the KEK that wrapped
+            data_key, recorded for resuming an interrupted upload.
+
+    Returns:
+        tuple: (files row, True if it is an existing row with the same content);
+            a new row is complete once uow is committed.
+    """
+    models = get_models()
+    storage = get_storage()
+    suite = record['cipher_suite']
+    staging_dir = job.state.get('staging_dir') if job else None
+    
+    # Content fingerprint: a keyed HMAC of the plaintext, indexed per key set.
+    # An existing set is checked before any encryption, so a re-submitted
+    # file costs one hashing pass; a new set cannot hold duplicates, so
+    # its fingerprint is taken while the file streams through the cipher
+    # (unless a resumed upload means the file is not read again).
+    fingerprint = None
+    if check_duplicates or staging_dir:
+        fingerprint = content_index.fingerprint(src, fingerprint_key)
+    if check_duplicates:
+        existing = models.find_file_by_fingerprint(record['key_set_id'], fingerprint)
+        if existing:
+            # Same content: point at the stored object, no upload and no new row
+            # unless the name differs
+            if existing['original_filename'] != record['original_filename']:
+                uow.create_file_record(**content_index.reuse(existing, record['original_filename']))
+            audit_logger.AuditLogger.log('FILE_DEDUPLICATED', user_identifier='Guest', ip=ip, uow=uow, details={
+                'filename': record['original_filename'], 'key_set_id': record['key_set_id'], 'file_id': existing['id']
+            })
+            return existing, True
+    reader = None
+    if fingerprint is None:
+        src = reader = content_index.FingerprintingReader(src, fingerprint_key)
+    if job:
+        src = job_queue.ProgressReader(src, job)
+    record['content_fingerprint'] = fingerprint
+    
+    if file_size > current_app.config['MULTIPART_THRESHOLD']:
+        # Large files: independently encrypted parts, uploaded concurrently
+        # and resumable from the staging manifest if the upload fails.
+        upload = None
+        if staging_dir:
+            try:
+                upload = multipart_upload.MultipartUpload.resume(
+                    storage, staging_dir, max_workers=current_app.config['UPLOAD_WORKERS']
+                )
+            except (OSError, ValueError):
+                # Interrupted before every part was encrypted: start again
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        if upload:
+            layout = upload.upload_remaining()
+        else:
+            upload = multipart_upload.MultipartUpload.start(
+                storage, current_app.config['UPLOAD_STAGING_DIR'], record['storage_path'],
+                record=record, chunk_size=current_app.config['MULTIPART_CHUNK_SIZE'],
+                key_generation=key_generation, max_workers=current_app.config['UPLOAD_WORKERS']
+            )
+            if job:
+                job.checkpoint(staging_dir=upload.staging_dir)
+            layout = upload.encrypt_and_upload(src, data_key, suite)
+        record.update(layout)
+    elif current_app.config['DISPERSAL_K']:
+        # Dispersal: the ciphertext is erasure-coded into N fragments, any K recover it
+        enc_result = file_crypto.encrypt_file(src.read(), data_key, suite)
+        layout = dispersal.store(
+            storage, record['storage_path'], enc_result['ciphertext'],
+            current_app.config['DISPERSAL_N'], current_app.config['DISPERSAL_K'],
+            max_workers=current_app.config['UPLOAD_WORKERS']
+        )
+        record.update(layout, nonce=enc_result['nonce'], auth_tag=enc_result['auth_tag'])
+    else:
+        # Note: Supabase Storage limits might apply.
+        enc_result = file_crypto.encrypt_file(src.read(), data_key, suite)
+        storage.put(record['storage_path'], enc_result['ciphertext'])
+        record.update(nonce=enc_result['nonce'], auth_tag=enc_result['auth_tag'],
+                      ciphertext_digest=integrity.sha256_hex(enc_result['ciphertext']))
+    
+    record['content_fingerprint'] = fingerprint or reader.hexdigest()
+    stored = uow.create_file_record(**record)
+    audit_logger.AuditLogger.log('FILE_ENCRYPTED', user_identifier='Guest', ip=ip, uow=uow, details={
+        'filename': record['original_filename'], 'key_set_id': record['key_set_id']
+    })
+    return stored, False
+
+def _plaintext_parts(file_record: dict, file_key: bytes):
+    """
+    Returns an iterator over a file's plaintext: a lazy part-by-part
+    generator for multipart files, else the whole plaintext in one piece.
+    """
+    if file_record.get('layout') == 'multipart':
+        # Parts are fetched in parallel and yielded as each one authenticates
+        return multipart_upload.download_and_decrypt(
+            get_storage(), file_record['storage_path'], file_key,
+            file_record['nonce'], file_record['part_count'],
+            max_workers=current_app.config['UPLOAD_WORKERS'],
+            suite=file_record.get('cipher_suite')
+        )
+    
+    # Download Encrypted File (any K fragments, in parallel, if dispersed)
+    if file_record.get('layout') == 'dispersed':
+        ciphertext = dispersal.fetch(get_storage(), file_record)
+    else:
+        ciphertext = get_storage().get(file_record['storage_path'])
+    
+    return iter([file_crypto.decrypt_file(
+        ciphertext,
+        file_key,
+        file_record['nonce'],
+        file_record['auth_tag'],
+        file_record.get('cipher_suite')
+    )])
+
 @bp.route('/encrypt-file', methods=['GET', 'POST'])
 def encrypt_file():
     if request.method == 'POST':
@@ -77,77 +232,106 @@ def encrypt_file():
             flash('File and Key Set are required.', 'danger')
             return redirect(url_for('main.encrypt_file'))
 
-        # Check for active reconstruction session to get the key
-        # WAIT - the requirement says "Simplify: Generate NEW AES key, encrypt file, THEN split AES key".
-        # Let's support the prompt's Flow #3 "Simplified recommended approach".
-        # Flow 3: Upload File -> Generate AES -> Encrypt File -> Split AES -> User gets shares.
-        
         try:
-            n_shares = int(request.form['n_shares'])
-            threshold = int(request.form['threshold'])
-            password = request.form['password']
-            
-            file_bytes = file.read()
-            
-            # 1. Generate AES KEY
-            from securevault.services import security_utils
-            aes_key = security_utils.generate_random_key(32)
-            
-            # 2. Encrypt File
-            enc_result = file_crypto.encrypt_file(file_bytes, aes_key)
-            
-            # 3. Split AES Key
-            from securevault.services import sss_manager
-            shares = sss_manager.SSSManager.split_secret(aes_key, n_shares, threshold)
-            
-            # 4. Encrypt Shares
-            from securevault.services import share_crypto
-            encrypted_shares = []
-            for i, share in enumerate(shares):
-                # Using same password for all shares for MVP
-                enc_share = share_crypto.encrypt_share(share, password)
-                enc_share['share_index'] = i + 1
-                encrypted_shares.append(enc_share)
+            # Envelope mode: a fresh per-file data key (DEK) encrypts the file and the
+            # key set's KEK - the secret that actually gets split - wraps the DEK.
+            # The request's metadata rows are queued and written in one commit
+            # once the ciphertext is stored, so a failure leaves no rows behind.
+            uow = get_models().unit_of_work()
+            encrypted_shares = None
+            if key_set_id == 'new':
+                # 1a. New key set: generate a KEK, split it and encrypt the shares
+                n_shares = int(request.form['n_shares'])
+                threshold = int(request.form['threshold'])
+                password = request.form['password']
                 
-            # 5. Store Metadata
-            # Create a "KeySet" record to track this specific file's key strategy
-            key_set = SupabaseModels.create_key_set(n_shares, threshold, f"Key for {file.filename}")
-            
-            if not key_set:
-                raise Exception("Failed to create Key Set record in database.")
-
-            
-            # Upload encrypted file to Supabase Storage
-            # Note: Supabase Storage limits might apply.
-            storage_path = f"encrypted/{key_set['id']}/{file.filename}.enc"
-            
-            # Wrap bytes in BytesIO for reliable upload
-            file_stream = io.BytesIO(enc_result['ciphertext'])
-            
-            get_supabase().storage.from_("encrypted-files").upload(
-                path=storage_path,
-                file=file_stream,
-                file_options={"content-type": "application/octet-stream"}
-            )
-            
-            # Create File record
-            SupabaseModels.create_file_record(
-                original_filename=file.filename,
-                storage_path=storage_path,
-                nonce=enc_result['nonce'],
-                auth_tag=enc_result['auth_tag'],
-                key_set_id=key_set['id']
+                key_set = uow.create_key_set(n_shares, threshold, f"Key for {file.filename}")
+                key_generation = 0
+                
+                kek = security_utils.generate_random_key(32)
+                # Using same password for all shares for MVP
+                encrypted_shares = key_manager.split_and_encrypt_key(
+                    kek, n_shares, threshold, [password] * n_shares, key_set_id=key_set['id']
+                )
+            else:
+                # 1b. Existing key set: reuse the KEK held by the active reconstruction session
+                if key_set_id != session.get('active_key_set_id'):
+                    flash('Reconstruct this Key Set before adding files to it.', 'warning')
+                    return redirect(url_for('main.reconstruct_key'))
+                kek = reconstruction_engine.ReconstructionEngine.get_key_for_session(session.get('active_session_id'))
+                if not kek:
+                    flash("Session expired.", 'warning')
+                    return redirect(url_for('main.reconstruct_key'))
+                key_set = {'id': key_set_id}
+                key_generation = reconstruction_engine.ReconstructionEngine.get_session_generation(session.get('active_session_id'))
+            
+            # 2. Generate the DEK and wrap it under the KEK, with the AEAD this
+            #    host encrypts fastest; the suite is recorded for decryption
+            suite = cipher_suite.preferred()
+            data_key = file_crypto.generate_data_key()
+            wrap_result = file_crypto.wrap_data_key(data_key, kek, suite)
+            
+            # The object is named after the pre-assigned file id, so files with
+            # the same name in one key set never share (or overwrite) an object
+            file_id = str(uuid.uuid4())
+            record = {
+                'id': file_id,
+                'original_filename': file.filename,
+                'storage_path': f"encrypted/{key_set['id']}/{file_id}.enc",
+                'key_set_id': key_set['id'],
+                'wrapped_key': wrap_result['wrapped_key'],
+                'wrap_nonce': wrap_result['wrap_nonce'],
+                'cipher_suite': suite
+            }
+            fingerprint_key = content_index.fingerprint_key(kek, key_set['id'])
+            
+            shares_export = None
+            if encrypted_shares is not None:
+                shares_export = {
+                    'key_set_id': key_set['id'],
+                    'filename': file.filename,
+                    'shares': encrypted_shares
+                }
+            
+            file.stream.seek(0, os.SEEK_END)
+            file_size = file.stream.tell()
+            file.stream.seek(0)
+            
+            if _run_in_background(file_size):
+                # Long uploads run as a background job so this worker is free at once;
+                # the job page reports progress and hands out the shares when done.
+                # A new key set's row is written by the job, with the file's. Its
+                # shares are persisted (password-encrypted) before the job runs, so
+                # the row is never committed while they exist only in memory.
+                job = job_queue.submit('encrypt', {
+                    'record': record,
+                    'key_set': key_set if encrypted_shares is not None else None,
+                    'file_size': file_size,
+                    'check_duplicates': encrypted_shares is None,
+                    'key_generation': key_generation,
+                    'ip': request.remote_addr
+                }, secrets={
+                    'data_key': data_key,
+                    'fingerprint_key': fingerprint_key,
+                    'source': job_queue.detach_stream(file.stream)
+                }, total=file_size, app=current_app._get_current_object(), payload=shares_export)
+                return _job_redirect(job)
+            
+            # 3. Encrypt the file, upload it and 4. create its File record
+            stored, duplicate = _store_file(
+                file.stream, file_size, record, data_key, fingerprint_key,
+                check_duplicates=encrypted_shares is None, uow=uow, key_generation=key_generation
             )
+            uow.commit()
+            if duplicate:
+                flash(f'{file.filename} is already stored in the active Key Set.', 'info')
+                return redirect(url_for('main.decrypt_file'))
             
-            audit_logger.AuditLogger.log('FILE_ENCRYPTED', user_identifier='Guest', details={'filename': file.filename, 'key_set_id': key_set['id']})
+            if encrypted_shares is None:
+                flash(f'{file.filename} was added to the active Key Set.', 'success')
+                return redirect(url_for('main.decrypt_file'))
             
             # Return shares download
-            shares_export = {
-                'key_set_id': key_set['id'],
-                'filename': file.filename,
-                'shares': encrypted_shares
-            }
-            
             mem = io.BytesIO()
             mem.write(json.dumps(shares_export, indent=2).encode('utf-8'))
             mem.seek(0)
@@ -188,9 +372,9 @@ def reconstruct_key():
                     share_data_list.extend(data['shares'])
                     key_set_id = data.get('key_set_id')
                 else:
-                    # Single share ?
+                    # Single share: bound shares carry their key_set_id
                     share_data_list.append(data)
-                    # We'd need key_set_id from somewhere
+                    key_set_id = key_set_id or data.get('key_set_id')
                     
             if not key_set_id:
                 # Try to infer or fail
@@ -207,10 +391,14 @@ def reconstruct_key():
             session['active_session_id'] = session_id
             session['active_key_set_id'] = key_set_id
             
-            # Set Session Expiry for UI Countdown (15 minutes from now)
+            # Set Session Expiry for UI Countdown (a reused session keeps its own expiry)
             session.permanent = True
-            expiry_time = datetime.now() + timedelta(minutes=15)
-            session['session_expiry'] = expiry_time.timestamp()
+            expiry_time = reconstruction_engine.ReconstructionEngine.get_session_expiry(session_id)
+            session['session_expiry'] = expiry_time.replace(tzinfo=timezone.utc).timestamp()
+            
+            rejected = reconstruction_engine.ReconstructionEngine.get_rejected_shares(session_id)
+            if rejected:
+                flash(f"Ignored corrupt shares: {', '.join(str(i) for i in rejected)}.", 'warning')
             
             flash('Key successfully reconstructed! You can now decrypt files.', 'success')
             return redirect(url_for('main.decrypt_file'))
@@ -225,10 +413,6 @@ def decrypt_file():
     # If we have an active session, show files for that key set
     session_id = session.get('active_session_id')
     key_set_id = session.get('active_key_set_id')
-    
-    files = []
-    if key_set_id:
-        files = SupabaseModels.list_files_for_keyset(key_set_id)
 
     if request.method == 'POST':
         file_id = request.form.get('file_id')
@@ -236,7 +420,7 @@ def decrypt_file():
             flash("No active reconstruction session.", 'warning')
             return redirect(url_for('main.reconstruct_key'))
             
-        file_record = SupabaseModels.get_file_record(file_id)
+        file_record = get_models().get_file_record(file_id)
         if not file_record:
             flash("File not found.", 'danger')
             return redirect(url_for('main.decrypt_file'))
@@ -248,18 +432,36 @@ def decrypt_file():
                 flash("Session expired.", 'warning')
                 return redirect(url_for('main.reconstruct_key'))
 
-            # 2. Download Encrypted File
-            resp = get_supabase().storage.from_("encrypted-files").download(file_record['storage_path'])
-            ciphertext = resp # Generic bytes from supabase-py download? 
-            # Note: supabase-py download returns bytes directly usually
-            
-            # 3. Decrypt
-            plaintext = file_crypto.decrypt_file(
-                ciphertext, 
-                aes_key, 
-                file_record['nonce'], 
-                file_record['auth_tag']
-            )
+            file_key = file_crypto.resolve_file_key(file_record, aes_key)
+            
+            if _run_in_background((file_record.get('part_count') or 0) * (file_record.get('chunk_size') or 0)):
+                # Decrypted by a background job into a container sealed under a
+                # key only this browser session keeps; the job page offers it
+                # for download
+                result_key = security_utils.generate_random_key(32)
+                job = job_queue.submit('decrypt', {
+                    'file_id': file_id,
+                    'ip': request.remote_addr
+                }, secrets={
+                    'file_key': file_key,
+                    'result_key': result_key
+                }, total=file_record.get('part_count') or 1, app=current_app._get_current_object())
+                return _job_redirect(job, result_key)
+            
+            if file_record.get('layout') == 'multipart':
+                # Streamed out as each part authenticates; logged only once
+                # the last one has, so a failed download is never recorded
+                def _logged(parts):
+                    yield from parts
+                    audit_logger.AuditLogger.log('FILE_DECRYPTED', user_identifier='Guest', details={'file_id': file_id})
+                return Response(
+                    stream_with_context(_logged(_plaintext_parts(file_record, file_key))),
+                    mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f"attachment; filename=\"decrypted_{file_record['original_filename']}\""}
+                )
+            
+            # Download and decrypt (unwrapping the file's data key in envelope mode)
+            plaintext = b''.join(_plaintext_parts(file_record, file_key))
             
             audit_logger.AuditLogger.log('FILE_DECRYPTED', user_identifier='Guest', details={'file_id': file_id})
             
@@ -273,19 +475,381 @@ def decrypt_file():
         except Exception as e:
             flash(f"Decryption error: {str(e)}", 'danger')
 
+    # Listed only when the page is rendered; a successful download never needs it
+    files = []
+    if key_set_id:
+        files = get_models().list_files_for_keyset(key_set_id)
+
     return render_template('decrypt_file.html', files=files)
 
+@bp.route('/files/<file_id>/ciphertext')
+def download_ciphertext(file_id):
+    """
+    Serves the raw encrypted blob of a file in the active key set, e.g. for
+    offline decryption. Local storage answers this with sendfile.
+    """
+    key_set_id = session.get('active_key_set_id')
+    file_record = get_models().get_file_record(file_id)
+    if not file_record or not key_set_id or file_record['key_set_id'] != key_set_id:
+        flash("File not found.", 'danger')
+        return redirect(url_for('main.decrypt_file'))
+
+    try:
+        storage = get_storage()
+        if file_record.get('layout') == 'multipart':
+            # Parts are concatenated; each is chunk_size + 16 tag bytes except the last
+            return Response(
+                (storage.get(p) for p in multipart_upload.object_paths(file_record)),
+                mimetype='application/octet-stream',
+                headers={'Content-Disposition': f"attachment; filename=\"{file_record['original_filename']}.enc\""}
+            )
+        if file_record.get('layout') == 'dispersed':
+            return Response(
+                dispersal.fetch(storage, file_record),
+                mimetype='application/octet-stream',
+                headers={'Content-Disposition': f"attachment; filename=\"{file_record['original_filename']}.enc\""}
+            )
+        return storage.send(file_record['storage_path'], f"{file_record['original_filename']}.enc")
+    except Exception as e:
+        flash(f"Download error: {str(e)}", 'danger')
+        return redirect(url_for('main.decrypt_file'))
+
+def _session_job(job_id: str) -> dict:
+    if job_id not in session.get('jobs', []):
+        return None
+    return job_queue.get(job_id)
+
+def _result_available(job: dict) -> bool:
+    # Answered from the jobs database and this session, in any worker
+    if job['status'] != job_queue.DONE or not (job['result'] or {}).get('download'):
+        return False
+    if job['kind'] == 'decrypt':
+        return job['id'] in session.get('job_keys', {}) and os.path.exists(job_queue.result_path(job['id']))
+    return job['payload'] is not None
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = _session_job(job_id)
+    if not job:
+        flash("Job not found.", 'danger')
+        return redirect(url_for('main.index'))
+    return render_template('job.html', job=job)
+
+@bp.route('/jobs/<job_id>/status')
+def job_status_json(job_id):
+    """Status and progress of a background job, for polling."""
+    job = _session_job(job_id)
+    if not job:
+        return current_app.response_class(json.dumps({'error': 'Job not found.'}), status=404, mimetype='application/json')
+    body = {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'total': job['total'],
+        'attempts': job['attempts'],
+        'error': job['error'],
+        'result': job['result'],
+        'result_url': None
+    }
+    if _result_available(job):
+        body['result_url'] = url_for('main.job_result', job_id=job_id)
+    return current_app.response_class(json.dumps(body, indent=2), mimetype='application/json')
+
+@bp.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """
+    Hands out a finished job's result once: the decrypted file, or the
+    shares of a new key set. The result is then discarded.
+    """
+    job = _session_job(job_id)
+    if not job or job['status'] != job_queue.DONE:
+        flash("The job has not finished.", 'warning')
+        return redirect(url_for('main.job_status', job_id=job_id) if job else url_for('main.index'))
+    if job['result'].get('download') and not _result_available(job):
+        flash("The job's result is no longer available.", 'warning')
+        return redirect(url_for('main.job_status', job_id=job_id))
+    
+    if job['kind'] == 'decrypt':
+        result_key = security_utils.decode_base64_to_bytes(session['job_keys'][job_id])
+        src = open(job_queue.result_path(job_id), 'rb')
+        
+        def _stream():
+            with src:
+                yield from sealed_file.iter_unseal(src, result_key)
+            # Only a complete download uses up the result
+            job_queue.discard(job_id)
+        
+        return Response(
+            _stream(),
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': f"attachment; filename=\"{job['result']['filename']}\""}
+        )
+    
+    shares_export = job['payload']
+    job_queue.discard(job_id)
+    if not shares_export:
+        flash(f"{job['result']['filename']} was added to the active Key Set.", 'success')
+        return redirect(url_for('main.decrypt_file'))
+    return send_file(
+        io.BytesIO(json.dumps(shares_export, indent=2).encode('utf-8')),
+        as_attachment=True,
+        download_name=f"secure_shares_{job['result']['filename']}.json",
+        mimetype='application/json'
+    )
+
+@job_queue.handler('encrypt')
+def _encrypt_job(job: job_queue.Job) -> dict:
+    source = job.secrets['source']
+    source.seek(0)
+    with get_models().unit_of_work() as uow:
+        if job.params.get('key_set'):
+            uow.insert('key_sets', job.params['key_set'])
+        stored, duplicate = _store_file(
+            source, job.params['file_size'], dict(job.params['record']), job.secrets['data_key'],
+            job.secrets['fingerprint_key'], job.params['check_duplicates'], uow, job=job, ip=job.params.get('ip'),
+            key_generation=job.params.get('key_generation', 0)
+        )
+    return {
+        'file_id': stored['id'],
+        'filename': job.params['record']['original_filename'],
+        'key_set_id': stored['key_set_id'],
+        'duplicate': duplicate,
+        # The shares of a new key set (the job's payload) are still to be handed out
+        'download': bool(job.params.get('key_set'))
+    }
+
+@job_queue.handler('decrypt')
+def _decrypt_job(job: job_queue.Job) -> dict:
+    file_record = get_models().get_file_record(job.params['file_id'])
+    if not file_record:
+        raise ValueError("File not found.")
+    
+    def _counted(parts):
+        for done, part in enumerate(parts, 1):
+            job.progress(done)
+            yield part
+    
+    # Sealed under a key only the client's session keeps, so no plaintext reaches disk
+    parts = _counted(_plaintext_parts(file_record, job.secrets['file_key']))
+    with open(job.path('result'), 'wb') as dst:
+        size = sealed_file.seal(job_queue.ChunkReader(parts), dst, job.secrets['result_key'])
+    job.secrets.pop('file_key')
+    
+    audit_logger.AuditLogger.log('FILE_DECRYPTED', user_identifier='Guest', ip=job.params.get('ip'),
+                                 details={'file_id': file_record['id']})
+    return {
+        'file_id': file_record['id'],
+        'filename': f"decrypted_{file_record['original_filename']}",
+        'size': size,
+        'download': True
+    }
+
+@bp.route('/rotate-key', methods=['POST'])
+def rotate_key():
+    """
+    Replaces the KEK of the active key set and issues new shares for it.
+    Only the wrapped data keys are rewritten; stored ciphertexts are untouched.
+    """
+    session_id = session.get('active_session_id')
+    key_set_id = session.get('active_key_set_id')
+    if not session_id:
+        flash("No active reconstruction session.", 'warning')
+        return redirect(url_for('main.reconstruct_key'))
+
+    try:
+        old_kek = reconstruction_engine.ReconstructionEngine.get_key_for_session(session_id)
+        if not old_kek:
+            flash("Session expired.", 'warning')
+            return redirect(url_for('main.reconstruct_key'))
+
+        key_set = get_models().get_key_set(key_set_id)
+        if not key_set:
+            flash("Key Set not found.", 'danger')
+            return redirect(url_for('main.decrypt_file'))
+
+        # A session reconstructed before a re-share or rotation must not rotate
+        current = key_set.get('share_generation') or 0
+        if reconstruction_engine.ReconstructionEngine.get_session_generation(session_id) != current:
+            flash("This Key Set was re-shared or rotated since it was reconstructed. Reconstruct it again.", 'warning')
+            return redirect(url_for('main.reconstruct_key'))
+
+        password = request.form['password']
+        n_shares = key_set['n_shares']
+        new_kek = security_utils.generate_random_key(32)
+        # New shares are a new split: the old ones must never be mixed in
+        generation = current + 1
+
+        files = get_models().list_files_for_keyset(key_set_id)
+        updates = key_manager.rewrap_file_keys(files, old_kek, new_kek)
+        encrypted_shares = key_manager.split_and_encrypt_key(
+            new_kek, n_shares, key_set['threshold'], [password] * n_shares, key_set_id=key_set_id, generation=generation
+        )
+
+        # Every data key is rewrapped in one commit: a partial rotation would
+        # leave files that neither the old nor the new shares can open. The
+        # commit fails if a file was added (its key still wrapped under the
+        # old KEK) or the set was re-shared or rotated meanwhile.
+        with get_models().unit_of_work() as uow:
+            for file_id, wrap_result in updates:
+                uow.update_file_wrapped_key(file_id, wrap_result['wrapped_key'], wrap_result['wrap_nonce'])
+            uow.expect_count('files', 'key_set_id', key_set_id, len(files))
+            uow.update_key_set_shares(key_set_id, n_shares, key_set['threshold'], share_generation=generation)
+            audit_logger.AuditLogger.log('KEY_ROTATED', user_identifier='Guest', uow=uow, details={'key_set_id': key_set_id, 'files_rewrapped': len(updates)})
+        reconstruction_engine.ReconstructionEngine.replace_session_key(session_id, new_kek, generation)
+
+        shares_export = {
+            'key_set_id': key_set_id,
+            'shares': encrypted_shares
+        }
+
+        mem = io.BytesIO()
+        mem.write(json.dumps(shares_export, indent=2).encode('utf-8'))
+        mem.seek(0)
+
+        return send_file(
+            mem,
+            as_attachment=True,
+            download_name=f"secure_shares_{key_set_id}_rotated.json",
+            mimetype='application/json'
+        )
+
+    except WriteConflict:
+        flash("The Key Set changed during the rotation, so nothing was rotated. Try again.", 'warning')
+    except Exception as e:
+        flash(f"Rotation error: {str(e)}", 'danger')
+
+    return redirect(url_for('main.decrypt_file'))
+
+@bp.route('/reshare-key', methods=['POST'])
+def reshare_key():
+    """Issues a fresh set of shares with a new N/K for the active key set."""
+    session_id = session.get('active_session_id')
+    if not session_id:
+        flash("No active reconstruction session.", 'warning')
+        return redirect(url_for('main.reconstruct_key'))
+
+    try:
+        n_shares = int(request.form['n_shares'])
+        threshold = int(request.form['threshold'])
+        password = request.form['password']
+
+        if threshold > n_shares or threshold < 2:
+            flash('Invalid threshold. Must be 1 < K <= N.', 'danger')
+            return redirect(url_for('main.decrypt_file'))
+
+        result = reconstruction_engine.ReconstructionEngine.reshare_session(
+            session_id, n_shares, threshold, [password] * n_shares
+        )
+
+        shares_export = {
+            'key_set_id': result['key_set_id'],
+            'shares': result['shares']
+        }
+
+        mem = io.BytesIO()
+        mem.write(json.dumps(shares_export, indent=2).encode('utf-8'))
+        mem.seek(0)
+
+        return send_file(
+            mem,
+            as_attachment=True,
+            download_name=f"secure_shares_{result['key_set_id']}_reshared.json",
+            mimetype='application/json'
+        )
+
+    except Exception as e:
+        flash(f"Re-share error: {str(e)}", 'danger')
+
+    return redirect(url_for('main.decrypt_file'))
+
+# Window of the /logs activity chart
+LOGS_STATS_DAYS = 30
+
+def _audit_rollups(hours: int) -> list:
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime('%Y-%m-%dT%H:00:00+00:00')
+    return get_models().list_audit_rollups(since)
+
 @bp.route('/logs')
 def logs():
-    # Fetch logs
-    # Fetch logs
-    logs = []
+    # Rows are rendered once and cached; only rows newer than the last view are fetched
+    rows = []
     try:
-        # Supabase select
-        response = get_supabase().table('audit_logs').select('*').order('timestamp', desc=True).limit(50).execute()
-        logs = response.data if response.data else []
+        rows = audit_logger.log_cache.rows(get_models().list_audit_logs, audit_logger.render_log_row)
     except Exception as e:
         print(f"Error fetching logs: {e}")
         flash("Unable to connect to audit log service.", "warning")
-        
-    return render_template('logs.html', logs=logs)
+
+    # Chart totals come from the hourly rollups rather than the rows on the page
+    stats = {}
+    try:
+        for rollup in _audit_rollups(LOGS_STATS_DAYS * 24):
+            label = format_operation(rollup['operation_type'])
+            stats[label] = stats.get(label, 0) + rollup['count']
+    except Exception as e:
+        print(f"Error fetching audit rollups: {e}")
+
+    return render_template('logs.html', rows=rows, stats=stats, stats_days=LOGS_STATS_DAYS)
+
+@bp.route('/logs/stats')
+def logs_stats():
+    """Per-operation, per-hour event counts for dashboards (?hours=, default 24)."""
+    hours = min(max(request.args.get('hours', 24, type=int), 1), LOGS_STATS_DAYS * 24 * 12)
+    rollups = _audit_rollups(hours)
+    totals = {}
+    for rollup in rollups:
+        totals[rollup['operation_type']] = totals.get(rollup['operation_type'], 0) + rollup['count']
+    body = {
+        'hours': hours,
+        'totals': totals,
+        'hourly': [{'hour': r['hour'], 'operation_type': r['operation_type'], 'count': r['count']} for r in rollups]
+    }
+    return current_app.response_class(json.dumps(body, indent=2), mimetype='application/json')
+
+@bp.route('/logs/export')
+def export_logs():
+    """
+    Streams audit logs as NDJSON (default) or CSV, oldest first.
+
+    Query parameters: format, operation_type (repeatable or comma-separated),
+    since, until (ISO-8601, until exclusive), key_set_id, ip.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in audit_export.FORMATS:
+        return Response(f"Unsupported format: {fmt}\n", status=400, mimetype='text/plain')
+    try:
+        filters = {
+            'operation_types': [op for value in request.args.getlist('operation_type') for op in value.split(',') if op] or None,
+            'since': audit_export.parse_timestamp(request.args['since']) if request.args.get('since') else None,
+            'until': audit_export.parse_timestamp(request.args['until']) if request.args.get('until') else None,
+            'key_set_id': request.args.get('key_set_id') or None,
+            'ip': request.args.get('ip') or None
+        }
+    except ValueError:
+        return Response("since and until must be ISO-8601 dates or timestamps.\n", status=400, mimetype='text/plain')
+
+    audit_logger.AuditLogger.log('AUDIT_EXPORTED', user_identifier='Guest',
+                                 details={'format': fmt, **{k: v for k, v in filters.items() if v}})
+    filename = f"audit_logs_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{fmt}"
+    return Response(
+        stream_with_context(audit_export.export(get_models(), filters, fmt)),
+        mimetype=audit_export.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    histograms = metrics.REGISTRY.snapshot()
+    if request.args.get('format') == 'json':
+        # Quick per-stage summary for humans; Prometheus should scrape the text format
+        summary = {
+            stage: {
+                'count': sum(hist[:-1]),
+                'sum': hist[-1],
+                'p50': metrics.quantile(hist, 0.5),
+                'p99': metrics.quantile(hist, 0.99)
+            }
+            for stage, hist in histograms.items()
+        }
+        return current_app.response_class(json.dumps(summary, indent=2), mimetype='application/json')
+    return Response(metrics.render_prometheus(histograms), mimetype='text/plain; version=0.0.4')
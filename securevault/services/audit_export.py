@@ -0,0 +1,81 @@
+import io
+import csv
+import json
+import datetime
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CSV_COLUMNS = ['id', 'timestamp', 'operation_type', 'user_identifier', 'ip', 'details']
+DEFAULT_PAGE_SIZE = 1000
+
+def parse_timestamp(value: str) -> str:
+    """
+    Normalises an ISO-8601 date or timestamp to the UTC form stored in
+    audit_logs, so it compares correctly as a filter bound.
+
+    Raises:
+        ValueError: If the value is not ISO-8601.
+    """
+    dt = datetime.datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.astimezone(datetime.timezone.utc).isoformat()
+
+def iter_pages(models, filters: dict, page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Yields pages of audit logs matching filters, oldest first.
+
+    Each page resumes after the (timestamp, id) of the previous one, so every
+    query is an index range scan and only one page is held in memory.
+
+    Args:
+        models: Metadata backend (see get_models).
+        filters (dict): Keyword filters for models.list_audit_logs_page.
+        page_size (int): Rows per query.
+    """
+    after = None
+    while True:
+        page = models.list_audit_logs_page(after=after, limit=page_size, **filters)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1]['timestamp'], page[-1]['id'])
+
+def ndjson_chunks(pages):
+    """One chunk of newline-delimited JSON per page."""
+    for page in pages:
+        yield ''.join(json.dumps(row, separators=(',', ':'), default=str) + '\n' for row in page)
+
+def csv_chunks(pages):
+    """A header chunk, then one CSV chunk per page; details are JSON-encoded."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    for page in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in page:
+            writer.writerow([
+                json.dumps(row.get(column) or {}, separators=(',', ':')) if column == 'details' else row.get(column)
+                for column in CSV_COLUMNS
+            ])
+        yield buffer.getvalue()
+
+def export(models, filters: dict, fmt: str = 'ndjson', page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Streams matching audit logs as NDJSON or CSV text chunks.
+
+    Args:
+        models: Metadata backend.
+        filters (dict): operation_types, since, until (exclusive), key_set_id, ip.
+        fmt (str): 'ndjson' or 'csv'.
+        page_size (int): Rows fetched and written per chunk.
+
+    Returns:
+        Generator of str chunks.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    pages = iter_pages(models, filters, page_size)
+    return csv_chunks(pages) if fmt == 'csv' else ndjson_chunks(pages)
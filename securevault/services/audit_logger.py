@@ -1,9 +1,117 @@
-from securevault.supabase_client import get_supabase
+from securevault.models import get_models
+import os
 import datetime
+import threading
+
+# Logged by `flask compact-audit-logs` once old rows have been archived and deleted
+COMPACTED = 'AUDIT_COMPACTED'
+
+class AuditLogCache:
+    """
+    The newest audit rows, rendered once and kept per process for /logs.
+
+    AuditLogger.log adds rows written by this process. A page view then asks
+    the database only for rows newer than the last sync (so rows written by
+    other workers still appear) and renders just those. A new COMPACTED row
+    in that delta means `flask compact-audit-logs` deleted rows, so the
+    cache is dropped and the page read again in full.
+
+    Args:
+        size (int): Rows to keep, i.e. the length of the /logs page.
+        overlap (float): Seconds re-read before the last sync, for rows whose
+            timestamp was taken just before a concurrent sync committed.
+    """
+
+    def __init__(self, size: int = 50, overlap: float = 5.0):
+        self.size = size
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._reset()
+
+    def _reset(self):
+        # A fetch started before a reset must not refill the cache
+        self._generation += 1
+        self._pid = os.getpid()
+        self._rows = {}  # id -> (sort key, rendered html)
+        self._synced = None
+
+    @staticmethod
+    def _sort_key(log: dict):
+        try:
+            return (datetime.datetime.fromisoformat(log['timestamp']), log['id'])
+        except (KeyError, TypeError, ValueError):
+            return (datetime.datetime.min.replace(tzinfo=datetime.timezone.utc), str(log.get('id')))
+
+    def _merge(self, logs: list, render):
+        for log in logs:
+            if log.get('id') not in self._rows:
+                self._rows[log.get('id')] = (self._sort_key(log), render(log))
+        if len(self._rows) > self.size:
+            newest = sorted(self._rows.items(), key=lambda item: item[1][0], reverse=True)[:self.size]
+            self._rows = dict(newest)
+
+    def add(self, log: dict, render):
+        """Renders and caches a row this process just wrote."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self._merge([log], render)
+
+    def rows(self, fetch, render) -> list:
+        """
+        Returns rendered rows, newest first.
+
+        The database is read and new rows rendered without holding the
+        lock, so concurrent page views do not queue behind one query.
+
+        Args:
+            fetch: fetch(limit, since) -> rows, as models.list_audit_logs.
+            render: render(row) -> html for one row.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            generation = self._generation
+            now = datetime.datetime.now(datetime.timezone.utc)
+            since = (self._synced - self.overlap).isoformat() if self._synced else None
+
+        logs = fetch(self.size, since)
+        rendered = {log.get('id'): render(log) for log in logs}
+
+        with self._lock:
+            compacted = bool(since) and any(
+                log.get('operation_type') == COMPACTED and log.get('id') not in self._rows for log in logs
+            )
+            if self._generation == generation:
+                if compacted:
+                    # Another process archived and deleted rows: read the page again
+                    self._reset()
+                else:
+                    self._merge(logs, lambda log: rendered[log.get('id')])
+                    # A slower fetch that started earlier must not move the sync point back
+                    if self._synced is None or now > self._synced:
+                        self._synced = now
+            if not compacted:
+                return [html for _, html in sorted(self._rows.values(), key=lambda row: row[0], reverse=True)]
+        return self.rows(fetch, render)
+
+    def clear(self):
+        """Drops everything, e.g. after rows were deleted."""
+        with self._lock:
+            self._reset()
+
+# Shared by AuditLogger.log and the /logs route
+log_cache = AuditLogCache()
+
+def render_log_row(log: dict) -> str:
+    """Renders one /logs table row (templates/_log_row.html). Needs an app context."""
+    from flask import render_template
+    return render_template('_log_row.html', log=log)
 
 class AuditLogger:
     @staticmethod
-    def log(operation_type: str, user_identifier: str = None, details: dict = None, ip: str = None):
+    def log(operation_type: str, user_identifier: str = None, details: dict = None, ip: str = None, uow=None):
         """
         Logs an operation to the audit_logs table.
         
@@ -12,6 +120,9 @@ class AuditLogger:
             user_identifier (str): Identifier for the user (optional).
             details (dict): Additional details about the operation.
             ip (str): IP address of the requester. If None, valid Flask request context is used.
+            uow (UnitOfWork): Batch the entry joins, so it is written with the
+                operation it records or not at all; by default it is written
+                on its own and a failure is only reported.
         """
         
         # Auto-detect IP if in Flask context and not provided
@@ -35,11 +146,16 @@ class AuditLogger:
             'user_identifier': user_identifier,
             'details': details or {},
             'ip': ip,
-            # 'timestamp' is handled by default now() in Postgres
+            # 'timestamp' is handled by default now() in Postgres (and by the SQLite backend)
         }
         
+        if uow is not None:
+            row = uow.insert_audit_log(data)
+            uow.on_commit(lambda: _cache_row(row))
+            return
+
         try:
-            get_supabase().table('audit_logs').insert(data).execute()
+            row = get_models().insert_audit_log(data)
         except Exception as e:
             # We don't want audit logging failure to crash the main app, 
             # but in a high-security context, we might want to alert.
@@ -47,3 +163,15 @@ class AuditLogger:
             import traceback
             print(f"AUDIT LOGGING FAILED: {str(e)}")
             traceback.print_exc()
+            return
+
+        _cache_row(row)
+
+def _cache_row(row):
+    # Render now, off the /logs request path; without an app context the
+    # next page view picks the row up from the database instead
+    if isinstance(row, dict):
+        try:
+            log_cache.add(row, render_log_row)
+        except RuntimeError:
+            pass
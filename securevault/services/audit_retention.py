@@ -0,0 +1,105 @@
+import gzip
+import json
+import hashlib
+import datetime
+import tempfile
+from securevault.services import audit_export
+
+ARCHIVE_PREFIX = 'audit-archive'
+# Segments larger than this spill from memory to a temporary file
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+def month_bounds(month: str) -> tuple:
+    """'YYYY-MM' -> (start, end) ISO timestamps in UTC, end exclusive."""
+    year, mon = (int(part) for part in month.split('-'))
+    start = datetime.datetime(year, mon, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+    return start.isoformat(), end.isoformat()
+
+def oldest_retained_month(retain_months: int, now: datetime.datetime = None) -> str:
+    """
+    The first month kept by a retention of retain_months, counting the
+    current month. Earlier months are compacted.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    index = now.year * 12 + now.month - 1 - (retain_months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def archive_month(models, storage, month: str, page_size: int = audit_export.DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Writes one month of audit logs to storage as a gzipped NDJSON segment and
+    records it in audit_archives. Rows are streamed page by page, so memory
+    use does not depend on the size of the month.
+
+    Args:
+        models: Metadata backend.
+        storage: Storage backend for the segment.
+        month (str): 'YYYY-MM'.
+        page_size (int): Rows read per query.
+
+    Returns:
+        dict: The audit_archives row.
+    """
+    since, until = month_bounds(month)
+    summary = {}
+    row_count = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        # mtime=0 keeps the segment byte-identical if a month is archived twice
+        with gzip.GzipFile(fileobj=spool, mode='wb', mtime=0) as segment:
+            for page in audit_export.iter_pages(models, {'since': since, 'until': until}, page_size):
+                for row in page:
+                    segment.write((json.dumps(row, separators=(',', ':'), default=str) + '\n').encode('utf-8'))
+                    summary[row['operation_type']] = summary.get(row['operation_type'], 0) + 1
+                row_count += len(page)
+
+        spool.seek(0)
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: spool.read(1024 * 1024), b''):
+            digest.update(chunk)
+        spool.seek(0)
+        path = f"{ARCHIVE_PREFIX}/{month}.ndjson.gz"
+        storage.put(path, spool)
+
+    return models.upsert_audit_archive({
+        'month': month,
+        'storage_path': path,
+        'sha256': digest.hexdigest(),
+        'row_count': row_count,
+        'summary': summary
+    })
+
+def compact(models, storage, retain_months: int, now: datetime.datetime = None,
+            page_size: int = audit_export.DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Archives and drops every audit_logs partition older than the retention
+    window, then makes sure upcoming partitions exist.
+
+    A partition is dropped only after its segment is stored and recorded, so
+    an interrupted run is safe to repeat: the month is archived again (to
+    the same path) and then dropped. Hourly counts in audit_rollups are kept.
+
+    Args:
+        models: Metadata backend.
+        storage: Storage backend for the segments.
+        retain_months (int): Months kept online, including the current one.
+        now (datetime): Reference time (defaults to now, UTC).
+        page_size (int): Rows read per query.
+
+    Returns:
+        dict: {'archived': [audit_archives rows], 'retained': [months]}
+    """
+    if retain_months < 1:
+        raise ValueError("retain_months must be at least 1.")
+    cutoff = oldest_retained_month(retain_months, now)
+    report = {'archived': [], 'retained': []}
+
+    for partition in models.list_audit_partitions():
+        month = partition['month']
+        if month >= cutoff:
+            report['retained'].append(month)
+            continue
+        report['archived'].append(archive_month(models, storage, month, page_size))
+        models.drop_audit_partition(month)
+
+    models.ensure_audit_partitions()
+    return report
@@ -0,0 +1,70 @@
+import hmac
+import hashlib
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# HKDF context of the fingerprint key; bump the version to re-key every index
+FINGERPRINT_INFO = b'securevault/content-fingerprint/v1'
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+# Fields a duplicate shares with the row that first stored its content: the
+# storage object, how it is laid out and the data key that encrypted it
+_SHARED_FIELDS = (
+    'storage_path', 'nonce', 'auth_tag', 'key_set_id', 'wrapped_key', 'wrap_nonce', 'layout',
+    'chunk_size', 'part_count', 'ciphertext_digest', 'cipher_suite', 'fragment_threshold',
+    'fragment_digests', 'content_fingerprint'
+)
+
+def fingerprint_key(kek: bytes, key_set_id: str) -> bytes:
+    """
+    Derives a key set's content-fingerprint key from its KEK.
+
+    Fingerprints are HMACs under this key, so the same document has
+    unrelated fingerprints in different key sets and nobody without the
+    KEK can test the index for a guessed document. Rotation changes the
+    KEK, so files stored before a rotation are not matched afterwards.
+    """
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=key_set_id.encode('utf-8'),
+        info=FINGERPRINT_INFO
+    ).derive(kek)
+
+class FingerprintingReader:
+    """Wraps a binary stream and HMACs everything read through it."""
+
+    def __init__(self, stream, key: bytes):
+        self.stream = stream
+        self._mac = hmac.new(key, digestmod=hashlib.sha256)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self._mac.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._mac.hexdigest()
+
+def fingerprint(stream, key: bytes, chunk_size: int = FINGERPRINT_CHUNK_SIZE) -> str:
+    """
+    Fingerprints a seekable stream from its start and rewinds it.
+
+    Returns:
+        str: Hex HMAC-SHA256 of the content.
+    """
+    stream.seek(0)
+    reader = FingerprintingReader(stream, key)
+    while reader.read(chunk_size):
+        pass
+    stream.seek(0)
+    return reader.hexdigest()
+
+def reuse(existing: dict, original_filename: str) -> dict:
+    """
+    Returns the create_file_record arguments of a duplicate of existing
+    stored under another name: the same storage object, nothing uploaded.
+    """
+    record = {field: existing.get(field) for field in _SHARED_FIELDS}
+    record['original_filename'] = original_filename
+    return record
@@ -0,0 +1,118 @@
+import struct
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from securevault.services import integrity
+from securevault.services.sss_manager import InformationDispersal
+from securevault.storage.router import fragment_path
+from securevault import tracing
+
+# Each fragment is self-describing, so a stray or mismatched one is caught
+# before decoding: MAGIC | N | K | fragment index | ciphertext length | payload
+MAGIC = b'IDA\x01'
+_HEADER = struct.Struct('>4sBBBQ')
+
+def fragment_paths(storage_path: str, n: int) -> list:
+    return [fragment_path(storage_path, i) for i in range(n)]
+
+def encode(ciphertext: bytes, n: int, k: int) -> list:
+    """Splits ciphertext into n headed fragments, any k of which recover it."""
+    payloads = InformationDispersal.split(ciphertext, n, k)
+    return [_HEADER.pack(MAGIC, n, k, i, len(ciphertext)) + payload for i, payload in enumerate(payloads)]
+
+def decode(fragments: dict, n: int, k: int) -> bytes:
+    """
+    Recovers the ciphertext from at least k fragments.
+
+    Args:
+        fragments (dict): Fragment index -> stored fragment bytes.
+        n (int), k (int): The file's dispersal parameters.
+
+    Raises:
+        ValueError: If fragments are missing, malformed or disagree.
+    """
+    payloads = {}
+    lengths = set()
+    for index, fragment in fragments.items():
+        if len(fragment) < _HEADER.size:
+            raise ValueError(f"Fragment {index} is truncated.")
+        magic, frag_n, frag_k, frag_index, length = _HEADER.unpack_from(fragment)
+        if magic != MAGIC or (frag_n, frag_k, frag_index) != (n, k, index):
+            raise ValueError(f"Fragment {index} does not belong to this file.")
+        lengths.add(length)
+        payloads[index] = fragment[_HEADER.size:]
+    if len(lengths) > 1:
+        raise ValueError("Fragments disagree on the ciphertext length.")
+    return InformationDispersal.combine(payloads, k)[:lengths.pop() if lengths else 0]
+
+def store(storage, storage_path: str, ciphertext: bytes, n: int, k: int, max_workers: int = 4) -> dict:
+    """
+    Disperses a ciphertext into n fragments and uploads them concurrently.
+
+    Returns:
+        dict: The layout fields for the `files` row. ciphertext_digest is the
+            Merkle root over fragment_digests, as for multipart files.
+    """
+    fragments = encode(ciphertext, n, k)
+    paths = fragment_paths(storage_path, n)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        put = tracing.propagate(storage.put)
+        for future in [pool.submit(put, path, fragment) for path, fragment in zip(paths, fragments)]:
+            future.result()
+    digests = [integrity.sha256_hex(f) for f in fragments]
+    return {
+        'layout': 'dispersed',
+        'part_count': n,
+        'fragment_threshold': k,
+        'fragment_digests': digests,
+        'ciphertext_digest': integrity.merkle_root(digests)
+    }
+
+def fetch(storage, file_record: dict, max_workers: int = None) -> bytes:
+    """
+    Downloads any k fragments of a dispersed file in parallel and decodes them.
+
+    k fetches run at once. Each fragment is checked against its recorded
+    digest as it arrives; one that fails to download or to match is
+    replaced by the next untried one, so up to n-k unavailable or corrupt
+    fragments (or targets) only cost a retry.
+
+    Returns:
+        bytes: The ciphertext.
+
+    Raises:
+        ValueError: If fewer than k fragments can be fetched.
+    """
+    n, k = file_record['part_count'], file_record['fragment_threshold']
+    paths = fragment_paths(file_record['storage_path'], n)
+    untried = list(range(n))
+    fragments = {}
+    failures = []
+
+    digests = file_record.get('fragment_digests')
+
+    def _get(index: int) -> bytes:
+        fragment = storage.get(paths[index])
+        # Files dispersed before digests were recorded rely on the headers alone
+        if digests and integrity.sha256_hex(fragment) != digests[index]:
+            raise ValueError("digest mismatch")
+        return fragment
+
+    with ThreadPoolExecutor(max_workers=max_workers or k) as pool:
+        get = tracing.propagate(_get)
+        pending = {pool.submit(get, i): i for i in untried[:k]}
+        del untried[:k]
+        while pending and len(fragments) < k:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    fragments[index] = future.result()
+                except Exception as e:
+                    failures.append(f"{index}: {e}")
+                    if untried:
+                        i = untried.pop(0)
+                        pending[pool.submit(get, i)] = i
+
+    if len(fragments) < k:
+        raise ValueError(f"Only {len(fragments)} of {n} fragments are available; {k} are needed "
+                         f"({'; '.join(failures)}).")
+    return decode(fragments, n, k)
@@ -1,26 +1,29 @@
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from securevault.services import security_utils
+from securevault.services import security_utils, cipher_suite
+from securevault.metrics import timed
 
-def encrypt_file(file_bytes: bytes, key: bytes) -> dict:
+@timed('encrypt_file')
+def encrypt_file(file_bytes: bytes, key: bytes, suite: str = None) -> dict:
     """
-    Encrypts a file using AES-GCM with the provided key.
+    Encrypts a file with the provided key.
     
     Args:
         file_bytes (bytes): The raw content of the file.
-        key (bytes): The AES-256 key.
+        key (bytes): The 256-bit key.
+        suite (str): AEAD to use (see cipher_suite); None means AES-256-GCM.
+            Callers pick cipher_suite.preferred() and record it with the file.
         
     Returns:
-        dict: A dictionary with 'ciphertext', 'nonce', and 'auth_tag' (implicitly in ciphertext for GCM).
+        dict: A dictionary with 'ciphertext', 'nonce', 'auth_tag' and 'cipher_suite'.
               However, for storage, we might want to separate them or keep them together.
               Standard GCM encrypt() returns concatenation of ciphertext + tag.
               We will split them for clarity in storage if needed, or just keep as blob.
               The prompt asked to store nonce and auth_tag separately in DB.
     """
-    aesgcm = AESGCM(key)
+    suite = cipher_suite.check(suite)
     nonce = security_utils.generate_salt(12)
     
-    # AESGCM.encrypt appends the auth tag to the end of the ciphertext
-    encrypted_data = aesgcm.encrypt(nonce, file_bytes, None)
+    # Both AEADs append the 16 byte auth tag to the end of the ciphertext
+    encrypted_data = cipher_suite.aead(key, suite).encrypt(nonce, file_bytes, None)
     
     # Extract ciphertext and tag
     # The tag is the last 16 bytes
@@ -30,18 +33,22 @@ def encrypt_file(file_bytes: bytes, key: bytes) -> dict:
     return {
         'nonce': security_utils.encode_bytes_to_base64(nonce),
         'ciphertext': ciphertext, # Keep as bytes for storage upload
-        'auth_tag': security_utils.encode_bytes_to_base64(tag)
+        'auth_tag': security_utils.encode_bytes_to_base64(tag),
+        'cipher_suite': suite
     }
 
-def decrypt_file(ciphertext: bytes, key: bytes, nonce_b64: str, auth_tag_b64: str) -> bytes:
+@timed('decrypt_file')
+def decrypt_file(ciphertext: bytes, key: bytes, nonce_b64: str, auth_tag_b64: str, suite: str = None) -> bytes:
     """
     Decrypts a file.
     
     Args:
         ciphertext (bytes): The raw encrypted bytes (excluding tag).
-        key (bytes): The AES key.
+        key (bytes): The file key.
         nonce_b64 (str): Base64 encoded nonce.
         auth_tag_b64 (str): Base64 encoded auth tag.
+        suite (str): Suite recorded with the file (None for AES-GCM files
+            written before suites were recorded).
         
     Returns:
         bytes: The decrypted file content.
@@ -49,8 +56,81 @@ def decrypt_file(ciphertext: bytes, key: bytes, nonce_b64: str, auth_tag_b64: st
     nonce = security_utils.decode_base64_to_bytes(nonce_b64)
     tag = security_utils.decode_base64_to_bytes(auth_tag_b64)
     
-    # Reconstruct the full 'data' expected by AESGCM.decrypt (ciphertext + tag)
+    # Reconstruct the full 'data' expected by decrypt (ciphertext + tag)
     encrypted_data = ciphertext + tag
     
-    aesgcm = AESGCM(key)
-    return aesgcm.decrypt(nonce, encrypted_data, None)
+    return cipher_suite.aead(key, suite).decrypt(nonce, encrypted_data, None)
+
+def generate_data_key() -> bytes:
+    """Generates a fresh per-file data encryption key (DEK)."""
+    return security_utils.generate_random_key(32)
+
+def wrap_data_key(data_key: bytes, kek: bytes, suite: str = None) -> dict:
+    """
+    Wraps a per-file data key under the key-set KEK.
+    
+    Args:
+        data_key (bytes): The per-file key that encrypted the file.
+        kek (bytes): The key-encryption key, i.e. the secret split by SSSManager.
+        suite (str): AEAD to wrap with; the file's own suite, so one
+            recorded value covers both. None means AES-256-GCM.
+        
+    Returns:
+        dict: 'wrapped_key' (ciphertext + tag) and 'wrap_nonce', both base64 encoded.
+    """
+    nonce = security_utils.generate_salt(12)
+    wrapped = cipher_suite.aead(kek, suite).encrypt(nonce, data_key, None)
+    return {
+        'wrapped_key': security_utils.encode_bytes_to_base64(wrapped),
+        'wrap_nonce': security_utils.encode_bytes_to_base64(nonce)
+    }
+
+def unwrap_data_key(wrapped_key_b64: str, wrap_nonce_b64: str, kek: bytes, suite: str = None) -> bytes:
+    """
+    Recovers a per-file data key wrapped by wrap_data_key.
+    
+    Raises:
+        InvalidTag: If the KEK does not match the one used for wrapping.
+    """
+    wrapped = security_utils.decode_base64_to_bytes(wrapped_key_b64)
+    nonce = security_utils.decode_base64_to_bytes(wrap_nonce_b64)
+    return cipher_suite.aead(kek, suite).decrypt(nonce, wrapped, None)
+
+def resolve_file_key(file_record: dict, session_key: bytes) -> bytes:
+    """
+    Returns the key that decrypts the given file.
+    
+    Envelope-mode files carry a wrapped data key which is unwrapped with the
+    reconstructed KEK. Older files were encrypted directly with the split key.
+    """
+    if file_record.get('wrapped_key'):
+        return unwrap_data_key(file_record['wrapped_key'], file_record['wrap_nonce'], session_key,
+                               file_record.get('cipher_suite'))
+    return session_key
+
+def _part_nonce(base_nonce: bytes, index: int) -> bytes:
+    # 8 random bytes per file followed by a 32-bit part counter
+    return base_nonce + index.to_bytes(4, 'big')
+
+def _part_aad(index: int, final: bool) -> bytes:
+    # Binds each part to its position and marks the last one, so parts cannot
+    # be reordered, dropped or truncated without failing authentication.
+    return index.to_bytes(4, 'big') + (b'\x01' if final else b'\x00')
+
+def generate_part_nonce_base() -> bytes:
+    """Random per-file prefix for the nonces of a multipart ciphertext."""
+    return security_utils.generate_salt(8)
+
+@timed('encrypt_part')
+def encrypt_part(data: bytes, key: bytes, base_nonce: bytes, index: int, final: bool, suite: str = None) -> bytes:
+    """
+    Encrypts one part of a multipart file. Returns ciphertext with its tag appended.
+    """
+    return cipher_suite.aead(key, suite).encrypt(_part_nonce(base_nonce, index), data, _part_aad(index, final))
+
+@timed('decrypt_part')
+def decrypt_part(encrypted: bytes, key: bytes, base_nonce: bytes, index: int, final: bool, suite: str = None) -> bytes:
+    """
+    Decrypts and authenticates one part produced by encrypt_part.
+    """
+    return cipher_suite.aead(key, suite).decrypt(_part_nonce(base_nonce, index), encrypted, _part_aad(index, final))
@@ -0,0 +1,425 @@
+import io
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import logging
+import datetime
+import threading
+import tempfile
+
+logger = logging.getLogger('securevault.jobs')
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Attempts per job; a retried encrypt job resumes its multipart upload
+MAX_ATTEMPTS = 3
+
+# Minimum seconds between progress writes of one job
+PROGRESS_INTERVAL = 0.5
+
+# Seconds a finished job's row, payload and staged result are kept
+RESULT_TTL = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT '{}',
+    progress INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    result TEXT,
+    payload TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_owner_status ON jobs (owner, status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at);
+"""
+
+# Columns added after the table was first created: (column, declaration)
+_ADDED_COLUMNS = [
+    ('payload', 'TEXT'),
+]
+
+# Job kind -> handler(job) returning the JSON-serializable result
+_HANDLERS = {}
+
+# Key material and open plaintext streams of this process's jobs. Never
+# written to the jobs database, so a job only runs in the process that
+# accepted it, as with reconstructed keys in reconstruction_engine. What a
+# finished job hands out is readable by every process: its payload is
+# persisted, and a staged result is sealed under a key the client holds.
+_SECRETS = {}
+
+_local = threading.local()
+_runner_lock = threading.Lock()
+_runner = {'pid': None, 'threads': [], 'wake': None}
+
+def handler(kind: str):
+    """Registers the function that runs jobs of a kind."""
+    def register(fn):
+        _HANDLERS[kind] = fn
+        return fn
+    return register
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def _owner() -> str:
+    # Host and pid of the process holding the job's secrets
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def jobs_dir() -> str:
+    return os.environ.get('JOBS_DIR', 'instance/jobs')
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's connection to the job database at JOBS_DB_PATH.
+    Jobs are local to a node, whichever metadata backend is configured.
+    """
+    path = os.environ.get('JOBS_DB_PATH', 'instance/jobs.db')
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid() or getattr(_local, 'path', None) != path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, declaration in _ADDED_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {declaration}")
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = path
+    return conn
+
+def _row(row) -> dict:
+    if row is None:
+        return None
+    data = dict(row)
+    for column in ('params', 'state', 'result', 'payload'):
+        if data[column] is not None:
+            data[column] = json.loads(data[column])
+    return data
+
+def detach_stream(stream):
+    """
+    Returns an independent handle on an uploaded file that outlives the
+    request, without copying it when the upload is already spooled to disk.
+    """
+    try:
+        handle = os.fdopen(os.dup(stream.fileno()), 'rb')
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        handle = tempfile.TemporaryFile()
+        stream.seek(0)
+        shutil.copyfileobj(stream, handle)
+    handle.seek(0)
+    return handle
+
+def submit(kind: str, params: dict, secrets: dict = None, total: int = None, app=None, payload=None) -> dict:
+    """
+    Queues a job for this process's worker pool.
+
+    Args:
+        kind (str): A registered handler.
+        params (dict): Non-secret, JSON-serializable parameters.
+        secrets (dict): Keys and streams the handler needs; memory only.
+        total (int): Units of work for progress reporting, if known.
+        app: Flask app the handler runs under; starts the pool if needed.
+        payload: JSON-serializable data handed out once the job is done,
+            e.g. password-encrypted shares. Persisted before the job runs,
+            so it must be safe at rest.
+
+    Returns:
+        dict: The job row.
+    """
+    if kind not in _HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = str(uuid.uuid4())
+    _SECRETS[job_id] = dict(secrets or {})
+    now = _now()
+    get_connection().execute(
+        "INSERT INTO jobs (id, kind, status, owner, params, payload, total, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, kind, QUEUED, _owner(), json.dumps(params),
+         json.dumps(payload) if payload is not None else None, total, now, now)
+    )
+    if app is not None:
+        start_workers(app)
+    if _runner['wake'] is not None:
+        _runner['wake'].set()
+    return get(job_id)
+
+def get(job_id: str) -> dict:
+    return _row(get_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+def secrets(job_id: str) -> dict:
+    """The in-memory secrets of a job, or None once they are gone."""
+    return _SECRETS.get(job_id)
+
+def result_path(job_id: str, name: str = 'result') -> str:
+    return os.path.join(jobs_dir(), job_id, name)
+
+def _drop_secrets(job_id: str):
+    secret = _SECRETS.pop(job_id, None) or {}
+    for value in secret.values():
+        if hasattr(value, 'close'):
+            value.close()
+
+def discard(job_id: str):
+    """
+    Forgets a job's secrets, payload and staged files. Works from any
+    process, except for the secrets, which only the owner holds.
+    """
+    _drop_secrets(job_id)
+    get_connection().execute("UPDATE jobs SET payload = NULL WHERE id = ?", (job_id,))
+    shutil.rmtree(os.path.join(jobs_dir(), job_id), ignore_errors=True)
+
+class Job:
+    """A claimed job as seen by its handler."""
+
+    def __init__(self, row: dict):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.params = row['params']
+        self.state = row['state']
+        self.attempts = row['attempts']
+        self.total = row['total']
+        self.secrets = _SECRETS.get(self.id, {})
+        self._last_progress = 0.0
+
+    def path(self, name: str) -> str:
+        """A file in the job's private staging directory."""
+        directory = os.path.join(jobs_dir(), self.id)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def progress(self, done: int, total: int = None, force: bool = False):
+        """Records units done; written at most every PROGRESS_INTERVAL seconds."""
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.total = total if total is not None else self.total
+        get_connection().execute(
+            "UPDATE jobs SET progress = ?, total = ?, updated_at = ? WHERE id = ?",
+            (done, self.total, _now(), self.id)
+        )
+
+    def checkpoint(self, **state):
+        """Persists resume state (e.g. a staging directory) for a retry."""
+        self.state.update(state)
+        get_connection().execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?", (json.dumps(self.state), _now(), self.id)
+        )
+
+class ProgressReader:
+    """Wraps a binary stream and reports the bytes read through it."""
+
+    def __init__(self, stream, job: Job):
+        self.stream = stream
+        self.job = job
+        self.done = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.done += len(data)
+        self.job.progress(self.done)
+        return data
+
+class ChunkReader:
+    """Turns an iterator of byte chunks into a readable stream."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def _claim() -> Job:
+    # Only this process holds the secrets of its own jobs
+    row = get_connection().execute(
+        "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+        "WHERE id = (SELECT id FROM jobs WHERE owner = ? AND status = ? ORDER BY created_at LIMIT 1) "
+        "RETURNING *",
+        (RUNNING, _now(), _owner(), QUEUED)
+    ).fetchone()
+    return Job(_row(row)) if row else None
+
+def _finish(job: Job, status: str, result=None, error: str = None):
+    get_connection().execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+        (status, json.dumps(result) if result is not None else None, error, _now(), job.id)
+    )
+
+def run_one() -> bool:
+    """
+    Claims and runs the next queued job of this process.
+
+    A failed job is queued again until it has made MAX_ATTEMPTS attempts.
+
+    Returns:
+        bool: Whether a job was run.
+    """
+    from securevault import metrics
+    job = _claim()
+    if job is None:
+        return False
+    start = time.perf_counter()
+    try:
+        if job.id not in _SECRETS:
+            raise RuntimeError("The job's keys were lost with the process that accepted it; submit it again.")
+        result = _HANDLERS[job.kind](job)
+    except Exception as e:
+        logger.warning("Job %s (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, e)
+        if job.attempts < MAX_ATTEMPTS and job.id in _SECRETS:
+            _finish(job, QUEUED, error=str(e))
+        else:
+            _finish(job, FAILED, error=str(e))
+            discard(job.id)
+    else:
+        job.progress(job.total or 0, force=True)
+        _finish(job, DONE, result=result)
+        # Nothing a finished job hands out depends on this process
+        _drop_secrets(job.id)
+    metrics.REGISTRY.observe(f"job.{job.kind}", time.perf_counter() - start)
+    return True
+
+def fail_orphans() -> int:
+    """
+    Fails unfinished jobs of processes on this host that no longer exist.
+
+    Their keys died with them, so they cannot be resumed; their staged
+    files are removed.
+
+    Returns:
+        int: Number of jobs failed.
+    """
+    conn = get_connection()
+    host = socket.gethostname()
+    rows = conn.execute(
+        "SELECT id, owner FROM jobs WHERE status IN (?, ?) AND owner LIKE ?", (QUEUED, RUNNING, f"{host}:%")
+    ).fetchall()
+    failed = 0
+    for row in rows:
+        pid = int(row['owner'].rsplit(':', 1)[1])
+        if pid == os.getpid() or _alive(pid):
+            continue
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+            (FAILED, "Interrupted by a restart; submit it again.", _now(), row['id'], QUEUED, RUNNING)
+        )
+        shutil.rmtree(os.path.join(jobs_dir(), row['id']), ignore_errors=True)
+        failed += 1
+    return failed
+
+def prune(max_age: float = RESULT_TTL) -> int:
+    """
+    Deletes finished jobs last updated more than max_age seconds ago, with
+    any payload or staged result nobody downloaded.
+
+    Returns:
+        int: Number of jobs deleted.
+    """
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=max_age)).isoformat()
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff)
+    ).fetchall()
+    for row in rows:
+        shutil.rmtree(os.path.join(jobs_dir(), row['id']), ignore_errors=True)
+        conn.execute("DELETE FROM jobs WHERE id = ?", (row['id'],))
+    return len(rows)
+
+def staging_dirs() -> set:
+    """Upload staging directories checkpointed by unfinished jobs, which resume them."""
+    rows = get_connection().execute(
+        "SELECT state FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+    ).fetchall()
+    return {json.loads(row['state']).get('staging_dir') for row in rows} - {None}
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def drain(timeout: float) -> int:
+    """
+    Waits up to timeout seconds for this process's unfinished jobs, e.g.
+    before a gunicorn worker exits, since no other process can run them.
+
+    Returns:
+        int: Jobs still unfinished.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        (pending,) = get_connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE owner = ? AND status IN (?, ?)", (_owner(), QUEUED, RUNNING)
+        ).fetchone()
+        if not pending or _runner['pid'] != os.getpid() or time.monotonic() >= deadline:
+            return pending
+        time.sleep(0.5)
+
+def start_workers(app):
+    """
+    Starts this process's job worker threads (JOB_WORKERS) once.
+
+    Called lazily on the first submit, so it runs in each gunicorn worker
+    after the fork rather than in the preloaded master.
+    """
+    with _runner_lock:
+        if _runner['pid'] == os.getpid():
+            return
+        _runner.update(pid=os.getpid(), threads=[], wake=threading.Event())
+        with app.app_context():
+            orphans = fail_orphans()
+            pruned = prune()
+        if orphans:
+            logger.info("Failed %d job(s) left behind by exited processes", orphans)
+        if pruned:
+            logger.info("Deleted %d finished job(s) older than %ds", pruned, RESULT_TTL)
+        for i in range(app.config.get('JOB_WORKERS', 2)):
+            thread = threading.Thread(target=_work, args=(app, _runner['wake']), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            _runner['threads'].append(thread)
+
+def _work(app, wake: threading.Event):
+    while True:
+        try:
+            with app.app_context():
+                ran = run_one()
+        except Exception:
+            logger.exception("Job worker error")
+            ran = False
+        if not ran:
+            wake.wait(timeout=1.0)
+            wake.clear()
@@ -1,40 +1,141 @@
 from securevault.services import security_utils
 from securevault.services import sss_manager
 from securevault.services import share_crypto
+from securevault.services import file_crypto
+from securevault.services import cipher_suite
 
-def generate_and_split_key(n: int, k: int, passwords: list) -> dict:
+def split_and_encrypt_key(key: bytes, n: int, k: int, passwords: list, key_set_id: str = None,
+                          generation: int = 0) -> list:
+    """
+    Splits a key into N shares and encrypts each share with its password,
+    using the cipher suite preferred on this host.
+
+    Args:
+        key (bytes): The secret to split (the key-set KEK).
+        n (int): Total shares.
+        k (int): Threshold.
+        passwords (list): List of N passwords, one for each share.
+        key_set_id (str): Key set the shares are bound to (see share_crypto).
+        generation (int): The key set's share generation for this split.
+
+    Returns:
+        list: Encrypted share dicts, each tagged with its 'share_index'.
+    """
+    if len(passwords) != n:
+        raise ValueError("Number of passwords must match number of shares (N).")
+
+    shares = sss_manager.SSSManager.split_secret(key, n, k)
+    suite = cipher_suite.preferred()
+
+    encrypted_shares = []
+    for i, share in enumerate(shares):
+        enc_share = share_crypto.encrypt_share(share, passwords[i], key_set_id=key_set_id, suite=suite, generation=generation)
+        enc_share['share_index'] = i + 1
+        encrypted_shares.append(enc_share)
+    return encrypted_shares
+
+def generate_and_split_key(n: int, k: int, passwords: list, key_set_id: str = None) -> dict:
     """
     Generates a new AES key, splits it into shares, and encrypts each share.
-    
+
     Args:
         n (int): Total shares.
         k (int): Threshold.
         passwords (list): List of N passwords, one for each share.
-        
+        key_set_id (str): Key set the shares are bound to (see share_crypto).
+
     Returns:
         dict: containing the encrypted shares and metadata.
               Does NOT return the raw AES key.
     """
     if len(passwords) != n:
         raise ValueError("Number of passwords must match number of shares (N).")
-        
+
     # 1. Generate AES Key
     aes_key = security_utils.generate_random_key(32) # 256 bits
-    
-    # 2. Split Key
-    shares = sss_manager.SSSManager.split_secret(aes_key, n, k)
-    
-    # 3. Encrypt each share
-    encrypted_shares = []
-    for i, share in enumerate(shares):
-        enc_share = share_crypto.encrypt_share(share, passwords[i])
-        enc_share['share_index'] = i + 1
-        encrypted_shares.append(enc_share)
-        
+
+    # 2. Split Key and 3. Encrypt each share
+    encrypted_shares = split_and_encrypt_key(aes_key, n, k, passwords, key_set_id=key_set_id)
+
     # We consciously discard 'aes_key' here by not returning it and letting it go out of scope.
-    
+
     return {
         'n': n,
         'k': k,
         'encrypted_shares': encrypted_shares
     }
+
+def recover_key(share_files_data: list, passwords: list, key_set_id: str, threshold: int = None,
+                generation: int = None) -> tuple:
+    """
+    Recovers a key set's KEK from encrypted shares, without touching the database.
+
+    Structural and key-set binding checks run before any PBKDF2 work, so
+    foreign, malformed or duplicated shares are rejected immediately. With
+    more shares than the threshold, the redundancy is used to locate and drop
+    corrupt shares instead of failing: those that fail to decrypt, and those
+    that decrypt but disagree with the rest.
+
+    Args:
+        share_files_data (list): Encrypted share dicts.
+        passwords (list): One password per share.
+        key_set_id (str): The key set the shares must be bound to.
+        threshold (int): K, if known; enables robust combination.
+        generation (int): The key set's current share generation, if known.
+
+    Returns:
+        tuple: (key bytes, sorted indices of rejected shares).
+
+    Raises:
+        ValueError: If the shares are invalid, cannot be decrypted or cannot be combined.
+    """
+    if len(share_files_data) != len(passwords):
+        raise ValueError("Count of shares and passwords must match.")
+
+    keep = share_crypto.check_share_bindings(share_files_data, key_set_id, generation)
+
+    # A share that fails authentication (corrupt file or wrong password) is
+    # dropped like a corrupt share, as long as K others remain
+    decrypted_shares = []
+    undecryptable = []
+    for i in keep:
+        try:
+            # decrypt_share returns the "index-hexdata" string
+            decrypted_shares.append(share_crypto.decrypt_share(share_files_data[i], passwords[i]))
+        except Exception:
+            undecryptable.append(share_files_data[i].get('share_index', i + 1))
+    if undecryptable and (not threshold or len(decrypted_shares) < threshold):
+        raise ValueError("Failed to decrypt one or more shares. Check passwords.")
+
+    try:
+        if threshold and len(decrypted_shares) > threshold:
+            key, rejected = sss_manager.SSSManager.combine_shares_robust(decrypted_shares, threshold)
+        else:
+            key, rejected = sss_manager.SSSManager.combine_shares(decrypted_shares), []
+    except Exception:
+        raise ValueError("Shares could not be combined. Are they from the same key set?")
+    return key, sorted(set(rejected) | set(undecryptable))
+
+def rewrap_file_keys(file_records: list, old_kek: bytes, new_kek: bytes) -> list:
+    """
+    Re-wraps the data keys of a key set's files under a new KEK.
+
+    Only the small wrapped keys change; the stored ciphertexts are untouched.
+    Files encrypted before envelope mode used the old KEK directly as their
+    file key, so that key is adopted as their data key and wrapped as well.
+
+    Args:
+        file_records (list): Rows from the `files` table for one key set.
+        old_kek (bytes): The currently reconstructed KEK.
+        new_kek (bytes): The KEK replacing it.
+
+    Returns:
+        list: (file_id, wrap_result) tuples ready to be persisted.
+    """
+    updates = []
+    for record in file_records:
+        data_key = file_crypto.resolve_file_key(record, old_kek)
+        # Keep the file's recorded suite, which covers its wrapped key too
+        suite = cipher_suite.check(record.get('cipher_suite'))
+        updates.append((record['id'], file_crypto.wrap_data_key(data_key, new_kek, suite)))
+    return updates
@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from securevault.services import file_crypto, security_utils, integrity, cipher_suite
+from securevault.storage.router import fragment_path
+from securevault import tracing
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MANIFEST_NAME = 'manifest.json'
+
+def part_path(storage_path: str, index: int) -> str:
+    """Object name of one encrypted part of a multipart file."""
+    return f"{storage_path}.parts/{index:06d}"
+
+def object_paths(file_record: dict) -> list:
+    """All storage objects holding a file's ciphertext."""
+    if file_record.get('layout') == 'multipart':
+        return [part_path(file_record['storage_path'], i) for i in range(file_record['part_count'])]
+    if file_record.get('layout') == 'dispersed':
+        return [fragment_path(file_record['storage_path'], i) for i in range(file_record['part_count'])]
+    return [file_record['storage_path']]
+
+class MultipartUpload:
+    """
+    Chunked, resumable upload of a large encrypted file.
+
+    The plaintext is cut into fixed-size parts that are encrypted
+    independently (see file_crypto.encrypt_part). Each encrypted part is
+    spooled to a staging directory and uploaded by a bounded thread pool as
+    soon as it is ready. A manifest in the staging directory records which
+    parts the storage backend has committed. A failed part is retried on its
+    own, and an interrupted upload can be resumed from the manifest without
+    redoing any encryption.
+    """
+
+    def __init__(self, storage, staging_dir: str, manifest: dict, max_workers: int = 4, max_retries: int = 3):
+        self.storage = storage
+        self.staging_dir = staging_dir
+        self.manifest = manifest
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, storage, staging_root: str, storage_path: str, record: dict = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, key_generation: int = 0, **kwargs) -> 'MultipartUpload':
+        """
+        Creates a new staging directory and manifest.
+
+        Args:
+            storage: StorageBackend receiving the parts.
+            staging_root: Directory holding in-progress uploads.
+            storage_path: Logical path of the file; parts are stored beneath it.
+            record: Non-secret metadata for the `files` row, kept in the
+                manifest so a resumed upload can still create it.
+            chunk_size: Plaintext bytes per part.
+            key_generation: Share generation of the key set whose KEK wraps
+                the data key in record, so a resume can tell if it was rotated.
+        """
+        upload_id = str(uuid.uuid4())
+        staging_dir = os.path.join(staging_root, upload_id)
+        os.makedirs(staging_dir, mode=0o700)
+        manifest = {
+            'upload_id': upload_id,
+            'storage_path': storage_path,
+            'chunk_size': chunk_size,
+            'base_nonce': security_utils.encode_bytes_to_base64(file_crypto.generate_part_nonce_base()),
+            'part_count': None,
+            'committed': [],
+            'digests': {},
+            'record': record or {},
+            'key_generation': key_generation
+        }
+        upload = cls(storage, staging_dir, manifest, **kwargs)
+        upload._save_manifest()
+        return upload
+
+    @classmethod
+    def resume(cls, storage, staging_dir: str, **kwargs) -> 'MultipartUpload':
+        """Re-opens an interrupted upload from its staging directory."""
+        with open(os.path.join(staging_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        if manifest['part_count'] is None:
+            # Encryption never finished, so the plaintext must be supplied again
+            raise ValueError("Upload was interrupted before all parts were encrypted.")
+        return cls(storage, staging_dir, manifest, **kwargs)
+
+    def _save_manifest(self):
+        tmp_path = os.path.join(self.staging_dir, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, os.path.join(self.staging_dir, MANIFEST_NAME))
+
+    def _spool_path(self, index: int) -> str:
+        return os.path.join(self.staging_dir, f"part-{index:06d}")
+
+    def _upload_part(self, index: int):
+        with open(self._spool_path(index), 'rb') as f:
+            data = f.read()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.storage.put(part_path(self.manifest['storage_path'], index), data)
+                break
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+        with self._lock:
+            self.manifest['committed'].append(index)
+            self.manifest.setdefault('digests', {})[str(index)] = integrity.sha256_hex(data)
+            self._save_manifest()
+        os.unlink(self._spool_path(index))
+
+    def encrypt_and_upload(self, src, key: bytes, suite: str = None) -> dict:
+        """
+        Encrypts a binary stream part by part and uploads the parts concurrently.
+
+        At most max_workers parts are waiting or in flight at once, so
+        memory and staging use stay bounded regardless of file size. Once a
+        part fails for good no further parts are encrypted; the upload can
+        only be resumed if every part had already been encrypted.
+
+        Args:
+            src: Readable binary stream of plaintext.
+            key (bytes): The file's data key.
+            suite (str): AEAD for every part (see cipher_suite); None means
+                AES-256-GCM. Returned in the layout so it is recorded.
+
+        Returns:
+            dict: The layout fields for the `files` row.
+        """
+        chunk_size = self.manifest['chunk_size']
+        base_nonce = security_utils.decode_base64_to_bytes(self.manifest['base_nonce'])
+        suite = cipher_suite.check(suite)
+        with self._lock:
+            self.manifest['cipher_suite'] = suite
+            self._save_manifest()
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+        futures = []
+        failed = []
+
+        def settle(future):
+            if not future.cancelled() and future.exception() is not None:
+                failed.append(future.exception())
+            slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            index = 0
+            chunk = src.read(chunk_size)
+            while True:
+                slots.acquire()
+                if failed:
+                    # A part ran out of retries; stop encrypting the rest.
+                    # Committed parts stay recorded for resume()
+                    slots.release()
+                    pool.shutdown(cancel_futures=True)
+                    raise failed[0]
+
+                next_chunk = src.read(chunk_size)
+                final = not next_chunk
+                encrypted = file_crypto.encrypt_part(chunk, key, base_nonce, index, final, suite)
+                with open(self._spool_path(index), 'wb') as f:
+                    f.write(encrypted)
+
+                future = pool.submit(tracing.propagate(self._upload_part), index)
+                future.add_done_callback(settle)
+                futures.append(future)
+
+                index += 1
+                if final:
+                    break
+                chunk = next_chunk
+
+            with self._lock:
+                self.manifest['part_count'] = index
+                self._save_manifest()
+
+        # Surface the first failure; committed parts stay recorded for resume()
+        for future in futures:
+            future.result()
+        return self.finish()
+
+    def upload_remaining(self) -> dict:
+        """Uploads every staged part the manifest has not yet committed."""
+        pending = sorted(set(range(self.manifest['part_count'])) - set(self.manifest['committed']))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            upload_part = tracing.propagate(self._upload_part)
+            for future in [pool.submit(upload_part, i) for i in pending]:
+                future.result()
+        return self.finish()
+
+    def finish(self) -> dict:
+        """Removes the staging directory once every part is committed."""
+        if len(set(self.manifest['committed'])) != self.manifest['part_count']:
+            raise ValueError("Not all parts have been uploaded.")
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        return {
+            'layout': 'multipart',
+            'nonce': self.manifest['base_nonce'],
+            'auth_tag': '',
+            'chunk_size': self.manifest['chunk_size'],
+            'part_count': self.manifest['part_count'],
+            'ciphertext_digest': self._merkle_root(),
+            'cipher_suite': self.manifest.get('cipher_suite')
+        }
+
+    def discard(self):
+        """Deletes the parts uploaded so far and the staging directory."""
+        for index in self.manifest['committed']:
+            try:
+                self.storage.delete(part_path(self.manifest['storage_path'], index))
+            except Exception as e:
+                print(f"Deleting part {index} of {self.manifest['storage_path']} failed: {e}")
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def _merkle_root(self) -> str:
+        digests = self.manifest.setdefault('digests', {})
+        leaves = [digests.get(str(i)) for i in range(self.manifest['part_count'])]
+        # Manifests written before digests were recorded cannot vouch for every part
+        if None in leaves:
+            return None
+        return integrity.merkle_root(leaves)
+
+def resume_pending_uploads(storage, staging_root: str, create_record=None, is_current=None, skip=(),
+                           min_age: float = 0, **kwargs) -> dict:
+    """
+    Finishes every interrupted upload under staging_root and removes the
+    abandoned ones (see `flask resume-uploads`).
+
+    An upload is abandoned if it stopped before every part was encrypted,
+    since the plaintext is gone, or if is_current rejects it. Its uploaded
+    parts and staging directory are deleted.
+
+    Args:
+        storage: StorageBackend receiving the parts.
+        staging_root: Directory holding in-progress uploads.
+        create_record: Optional callable invoked with the manifest's record
+            merged with the layout fields, e.g. a models create_file_record.
+        is_current: Optional callable taking a manifest; False if its record
+            could no longer be decrypted, e.g. because its key set was never
+            committed or its KEK has been rotated since.
+        skip: Staging directories another process will resume, e.g. those
+            of queued background jobs.
+        min_age: Seconds since an upload last made progress before it is
+            touched, so uploads still running are left alone.
+
+    Returns:
+        dict: Storage paths that were 'completed' and 'removed'.
+    """
+    report = {'completed': [], 'removed': []}
+    if not os.path.isdir(staging_root):
+        return report
+    skip = {os.path.abspath(d) for d in skip}
+    now = time.time()
+    for name in sorted(os.listdir(staging_root)):
+        staging_dir = os.path.join(staging_root, name)
+        manifest_path = os.path.join(staging_dir, MANIFEST_NAME)
+        if os.path.abspath(staging_dir) in skip:
+            continue
+        try:
+            last_progress = os.path.getmtime(manifest_path if os.path.exists(manifest_path) else staging_dir)
+        except OSError:
+            continue
+        if now - last_progress < min_age:
+            continue
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            # Interrupted before the manifest was written, so nothing was uploaded
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            continue
+        upload = MultipartUpload(storage, staging_dir, manifest, **kwargs)
+        if manifest['part_count'] is None or (is_current and not is_current(manifest)):
+            upload.discard()
+            report['removed'].append(manifest['storage_path'])
+            continue
+        layout = upload.upload_remaining()
+        if create_record:
+            create_record(**dict(manifest['record'], **layout))
+        report['completed'].append(manifest['storage_path'])
+    return report
+
+def download_and_decrypt(storage, storage_path: str, key: bytes, nonce_b64: str, part_count: int,
+                         max_workers: int = 4, suite: str = None):
+    """
+    Yields the plaintext of a multipart file part by part.
+
+    Parts are fetched concurrently, a bounded window ahead of the part
+    currently being decrypted. Each part is authenticated before it is
+    yielded.
+    """
+    base_nonce = security_utils.decode_base64_to_bytes(nonce_b64)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        window = {}
+        for index in range(min(max_workers, part_count)):
+            window[index] = pool.submit(storage.get, part_path(storage_path, index))
+        for index in range(part_count):
+            ahead = index + max_workers
+            if ahead < part_count:
+                window[ahead] = pool.submit(storage.get, part_path(storage_path, ahead))
+            encrypted = window.pop(index).result()
+            yield file_crypto.decrypt_part(encrypted, key, base_nonce, index, index == part_count - 1, suite)
@@ -1,14 +1,50 @@
-from securevault.services import share_crypto, sss_manager
-from securevault.models_supabase import SupabaseModels
+from securevault.services import key_manager, multipart_upload
+from securevault.models import get_models
+from securevault.storage import get_storage
 from securevault.services.audit_logger import AuditLogger
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
 
 # In-memory storage for active reconstructed keys.
-# Dict key: session_id, Value: {'key': bytes, 'expires': datetime}
+# Dict key: session_id, Value: {'key': bytes, 'expires': datetime, 'key_set_id': str, 'rejected_shares': list,
+# 'generation': share generation of the key set, 'submission': fingerprint of the shares and passwords that produced it}
 # In a multi-worker production env, this would need a Redis or Memcached with encryption.
 # For this demo, process memory is acceptable as per "Hold AES key ONLY in server memory".
 _ACTIVE_SESSIONS_MEMORY = {}
 
+# Submission fingerprint -> session_id of the live session it produced, so a
+# repeated submission (double submit, second tab) skips the N PBKDF2 runs
+_LIVE_SUBMISSIONS = {}
+
+# Fingerprints are keyed per process: they never leave memory and are
+# useless for testing password guesses offline
+_SUBMISSION_SECRET = os.urandom(32)
+
+# Striped by fingerprint, so concurrent identical submissions run the KDFs
+# once while unrelated ones never wait on each other
+_SUBMISSION_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _submission_fingerprint(key_set_id: str, share_files_data: list, passwords: list) -> str:
+    # Every share field and its password count, but not the upload order
+    pairs = sorted(json.dumps([share, password], sort_keys=True) for share, password in zip(share_files_data, passwords))
+    return hmac.new(_SUBMISSION_SECRET, json.dumps([key_set_id, pairs]).encode('utf-8'), hashlib.sha256).hexdigest()
+
+# Stale ACTIVE rows are expired in bulk at most this often per process, off
+# the common path; `flask prune-sessions` does the same on demand
+PRUNE_INTERVAL = 300
+_next_prune = time.monotonic() + PRUNE_INTERVAL
+
+def _forget_submission(session_id: str):
+    session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
+    if session and _LIVE_SUBMISSIONS.get(session.get('submission')) == session_id:
+        del _LIVE_SUBMISSIONS[session['submission']]
+
 class ReconstructionEngine:
     
     @staticmethod
@@ -21,43 +57,95 @@ class ReconstructionEngine:
             share_files_data: List of dicts (parsed JSON from uploaded share files).
             passwords: List of passwords corresponding to the shares.
             
+        Idempotent: resubmitting the same shares and passwords while the
+        session they produced is live returns that session after one HMAC,
+        instead of re-running every PBKDF2 derivation.
+
         Returns:
             str: Session ID if successful.
         """
-        if len(share_files_data) != len(passwords):
-            raise ValueError("Count of shares and passwords must match.")
-            
-        decrypted_shares = []
-        
-        try:
-            for i, share_data in enumerate(share_files_data):
-                # decrypt_share returns the "index-hexdata" string
-                s = share_crypto.decrypt_share(share_data, passwords[i])
-                decrypted_shares.append(s)
-        except Exception as e:
-            AuditLogger.log('KEY_RECONSTRUCTION_FAILED', details={'error': str(e), 'key_set_id': key_set_id})
-            raise ValueError("Failed to decrypt one or more shares. Check passwords.")
+        submission = _submission_fingerprint(key_set_id, share_files_data, passwords)
+        with _SUBMISSION_LOCKS[int(submission[:2], 16) % len(_SUBMISSION_LOCKS)]:
+            session_id = ReconstructionEngine.get_live_session(submission)
+            if session_id:
+                AuditLogger.log('KEY_RECONSTRUCTION_REUSED', details={'key_set_id': key_set_id, 'session_id': session_id})
+                return session_id
+            return ReconstructionEngine._reconstruct(key_set_id, share_files_data, passwords, submission)
+
+    @staticmethod
+    def get_live_session(submission: str) -> str:
+        """The unexpired session produced by a submission fingerprint, if any."""
+        session_id = _LIVE_SUBMISSIONS.get(submission)
+        if session_id is None:
+            return None
+        session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
+        # Constant-time, as the fingerprint covers the passwords
+        if not session or not hmac.compare_digest(session.get('submission', ''), submission):
+            _LIVE_SUBMISSIONS.pop(submission, None)
+            return None
+        if ReconstructionEngine.get_key_for_session(session_id) is None:
+            return None
+        return session_id
+
+    @staticmethod
+    def _reconstruct(key_set_id: str, share_files_data: list, passwords: list, submission: str) -> str:
+        key_set = get_models().get_key_set(key_set_id)
+        threshold = key_set['threshold'] if key_set else None
+        generation = (key_set.get('share_generation') or 0) if key_set else None
 
         try:
-            # Combine shares
-            aes_key = sss_manager.SSSManager.combine_shares(decrypted_shares)
-        except Exception as e:
-            AuditLogger.log('KEY_RECONSTRUCTION_FAILED', details={'error': 'Combination failed', 'key_set_id': key_set_id})
-            raise ValueError("Shares could not be combined. Are they from the same key set?")
+            aes_key, rejected_shares = key_manager.recover_key(
+                share_files_data, passwords, key_set_id, threshold, generation=generation
+            )
+        except ValueError as e:
+            AuditLogger.log('KEY_RECONSTRUCTION_FAILED', details={'error': str(e), 'key_set_id': key_set_id})
+            raise
 
         # Create session record in DB
+        global _next_prune
+        if time.monotonic() >= _next_prune:
+            _next_prune = time.monotonic() + PRUNE_INTERVAL
+            ReconstructionEngine.cleanup_expired_sessions()
         expiry = datetime.datetime.utcnow() + datetime.timedelta(minutes=15)
-        session_record = SupabaseModels.create_reconstruction_session(key_set_id, expiry.isoformat())
+        session_record = get_models().create_reconstruction_session(key_set_id, expiry.isoformat())
         
         # Store key in memory
         _ACTIVE_SESSIONS_MEMORY[session_record['id']] = {
             'key': aes_key,
-            'expires': expiry
+            'expires': expiry,
+            'key_set_id': key_set_id,
+            'rejected_shares': rejected_shares,
+            'generation': generation or 0,
+            'submission': submission
         }
+        _LIVE_SUBMISSIONS[submission] = session_record['id']
         
-        AuditLogger.log('KEY_RECONSTRUCTED', details={'key_set_id': key_set_id, 'session_id': session_record['id']})
+        details = {'key_set_id': key_set_id, 'session_id': session_record['id']}
+        if rejected_shares:
+            details['rejected_shares'] = rejected_shares
+        AuditLogger.log('KEY_RECONSTRUCTED', details=details)
+        ReconstructionEngine.prefetch_key_set(key_set_id)
         return session_record['id']
 
+    @staticmethod
+    def prefetch_key_set(key_set_id: str):
+        """
+        Warms the local ciphertext cache with every file of a freshly
+        reconstructed key set, so the first decrypt does not wait on remote
+        storage. Listing and fetching both run in the background.
+        """
+        storage = get_storage()
+        if not storage.caches_reads:
+            return None
+
+        def _prefetch():
+            paths = []
+            for record in get_models().list_files_for_keyset(key_set_id):
+                paths.extend(multipart_upload.object_paths(record))
+            storage.prefetch(paths)
+
+        return storage.submit(_prefetch)
+
     @staticmethod
     def get_key_for_session(session_id: str) -> bytes:
         session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
@@ -66,22 +154,130 @@ class ReconstructionEngine:
         
         if datetime.datetime.utcnow() > session['expires']:
             # Expired
+            _forget_submission(session_id)
             del _ACTIVE_SESSIONS_MEMORY[session_id]
-            SupabaseModels.update_session_status(session_id, 'EXPIRED')
+            get_models().update_session_status(session_id, 'EXPIRED')
             return None
             
         return session['key']
 
+    @staticmethod
+    def get_rejected_shares(session_id: str) -> list:
+        """Share indices that were identified as corrupt and dropped during reconstruction."""
+        session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
+        return session.get('rejected_shares', []) if session else []
+
+    @staticmethod
+    def get_session_expiry(session_id: str) -> datetime.datetime:
+        """UTC expiry of a live session, or None."""
+        session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
+        return session['expires'] if session else None
+
+    @staticmethod
+    def get_session_generation(session_id: str) -> int:
+        """Share generation of the key held for a live session, or None."""
+        session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
+        return session.get('generation', 0) if session else None
+
+    @staticmethod
+    def replace_session_key(session_id: str, new_key: bytes, generation: int = None):
+        """Swaps the key held for a live session, e.g. after a KEK rotation."""
+        session = _ACTIVE_SESSIONS_MEMORY.get(session_id)
+        if not session:
+            raise ValueError("No active reconstruction session.")
+        # The old shares no longer recover this key, so they must not resolve to it
+        _forget_submission(session_id)
+        session['key'] = new_key
+        if generation is not None:
+            session['generation'] = generation
+
+    @staticmethod
+    def reshare_session(session_id: str, n: int, k: int, passwords: list) -> dict:
+        """
+        Issues a fresh split of a reconstructed key with a new N/K.
+        
+        The key itself does not change, so stored files and wrapped data keys
+        stay valid; only the shares and the key_sets row are replaced. The new
+        shares carry the next share generation, so the app rejects the old
+        ones from then on. Holders of K old shares can still combine them
+        offline into the same key, though: re-sharing does not revoke them,
+        only a rotation (/rotate-key) does.
+        
+        Args:
+            session_id: An active reconstruction session.
+            n: New total shares.
+            k: New threshold.
+            passwords: List of N passwords for the new shares.
+            
+        Returns:
+            dict: 'key_set_id', 'n', 'k' and the new 'shares'.
+        """
+        key = ReconstructionEngine.get_key_for_session(session_id)
+        if not key:
+            raise ValueError("No active reconstruction session.")
+        session = _ACTIVE_SESSIONS_MEMORY[session_id]
+        key_set_id = session['key_set_id']
+        generation = session.get('generation', 0) + 1
+        
+        encrypted_shares = key_manager.split_and_encrypt_key(
+            key, n, k, passwords, key_set_id=key_set_id, generation=generation
+        )
+        if not get_models().update_key_set_shares(key_set_id, n, k, generation):
+            raise ValueError("The key set was re-shared or rotated meanwhile; reconstruct it again.")
+        session['generation'] = generation
+        # The shares that opened this session are now stale
+        _forget_submission(session_id)
+        
+        AuditLogger.log('KEY_RESHARED', details={'key_set_id': key_set_id, 'n_shares': n, 'threshold': k})
+        return {
+            'key_set_id': key_set_id,
+            'n': n,
+            'k': k,
+            'shares': encrypted_shares
+        }
+
+    @staticmethod
+    def reshare_batch(requests: list, max_workers: int = 4) -> list:
+        """
+        Re-shares many key sets concurrently.
+        
+        Args:
+            requests: List of dicts with 'session_id', 'n', 'k' and 'passwords'.
+            max_workers: Size of the worker pool.
+            
+        Returns:
+            list: One result per request, in order. Failed entries carry an
+                  'error' message instead of shares so one bad session does not
+                  abort the batch.
+        """
+        def _reshare(req):
+            try:
+                return ReconstructionEngine.reshare_session(req['session_id'], req['n'], req['k'], req['passwords'])
+            except Exception as e:
+                return {'session_id': req['session_id'], 'error': str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(_reshare, requests))
+
     @staticmethod
     def end_session(session_id: str):
         if session_id in _ACTIVE_SESSIONS_MEMORY:
+            _forget_submission(session_id)
             del _ACTIVE_SESSIONS_MEMORY[session_id]
-            SupabaseModels.update_session_status(session_id, 'USED')
+            get_models().update_session_status(session_id, 'USED')
 
     @staticmethod
-    def cleanup_expired_sessions():
-        # Helper to periodically clean memory
+    def cleanup_expired_sessions() -> int:
+        """
+        Drops expired keys from memory and marks every stale ACTIVE row,
+        from any worker, EXPIRED in one statement.
+
+        Returns:
+            int: Number of rows expired.
+        """
         now = datetime.datetime.utcnow()
         for sid in list(_ACTIVE_SESSIONS_MEMORY.keys()):
             if now > _ACTIVE_SESSIONS_MEMORY[sid]['expires']:
+                _forget_submission(sid)
                 del _ACTIVE_SESSIONS_MEMORY[sid]
+        return get_models().expire_stale_sessions(now.isoformat())
@@ -0,0 +1,109 @@
+import json
+import struct
+from securevault.services import file_crypto, security_utils, cipher_suite
+
+# Self-contained container written by the offline CLI:
+#   MAGIC | u32 header length | JSON header | (u32 part length | sealed part)*
+# Parts use the multipart format (file_crypto.encrypt_part), so the file is
+# processed in bounded memory and truncation or reordering fails to decrypt.
+MAGIC = b'SVLT\x01'
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+_LEN = struct.Struct('>I')
+
+def seal(src, dst, kek: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Encrypts a binary stream into a sealed container.
+
+    A fresh data key encrypts the content and is stored wrapped under kek in
+    the header, as in envelope mode for stored files. The host's preferred
+    cipher suite is used and recorded in the header.
+
+    Args:
+        src: Readable binary stream of plaintext.
+        dst: Writable binary stream for the container.
+        kek (bytes): Key-set KEK.
+        chunk_size (int): Plaintext bytes per part.
+
+    Returns:
+        int: Plaintext bytes processed.
+    """
+    suite = cipher_suite.preferred()
+    data_key = file_crypto.generate_data_key()
+    wrap_result = file_crypto.wrap_data_key(data_key, kek, suite)
+    base_nonce = file_crypto.generate_part_nonce_base()
+    header = json.dumps({
+        'version': 1,
+        'wrapped_key': wrap_result['wrapped_key'],
+        'wrap_nonce': wrap_result['wrap_nonce'],
+        'nonce': security_utils.encode_bytes_to_base64(base_nonce),
+        'chunk_size': chunk_size,
+        'cipher_suite': suite
+    }).encode('utf-8')
+    dst.write(MAGIC + _LEN.pack(len(header)) + header)
+
+    total = 0
+    index = 0
+    chunk = src.read(chunk_size)
+    while True:
+        next_chunk = src.read(chunk_size)
+        final = not next_chunk
+        sealed = file_crypto.encrypt_part(chunk, data_key, base_nonce, index, final, suite)
+        dst.write(_LEN.pack(len(sealed)) + sealed)
+        total += len(chunk)
+        index += 1
+        if final:
+            return total
+        chunk = next_chunk
+
+def _read_exact(src, n: int) -> bytes:
+    data = src.read(n)
+    if len(data) != n:
+        raise ValueError("Sealed file is truncated.")
+    return data
+
+def iter_unseal(src, kek: bytes):
+    """
+    Yields the plaintext of a sealed container part by part, each part
+    authenticated before it is yielded.
+
+    Raises:
+        ValueError: If the container is malformed or truncated.
+        InvalidTag: If the key is wrong or the content was tampered with.
+    """
+    if src.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a sealed file.")
+    (header_length,) = _LEN.unpack(_read_exact(src, _LEN.size))
+    header = json.loads(_read_exact(src, header_length))
+    suite = cipher_suite.check(header.get('cipher_suite'))
+    data_key = file_crypto.unwrap_data_key(header['wrapped_key'], header['wrap_nonce'], kek, suite)
+    base_nonce = security_utils.decode_base64_to_bytes(header['nonce'])
+
+    index = 0
+    prefix = _read_exact(src, _LEN.size)
+    while True:
+        sealed = _read_exact(src, _LEN.unpack(prefix)[0])
+        # The part is final when nothing follows it
+        prefix = src.read(_LEN.size)
+        yield file_crypto.decrypt_part(sealed, data_key, base_nonce, index, not prefix, suite)
+        index += 1
+        if not prefix:
+            return
+        if len(prefix) != _LEN.size:
+            raise ValueError("Sealed file is truncated.")
+
+def unseal(src, dst, kek: bytes) -> int:
+    """
+    Decrypts a sealed container into dst, authenticating every part.
+
+    Returns:
+        int: Plaintext bytes written.
+
+    Raises:
+        ValueError: If the container is malformed or truncated.
+        InvalidTag: If the key is wrong or the content was tampered with.
+    """
+    total = 0
+    for plaintext in iter_unseal(src, kek):
+        dst.write(plaintext)
+        total += len(plaintext)
+    return total
@@ -3,11 +3,13 @@ import base64
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
+from securevault.metrics import timed
 
 def generate_salt(length=16):
     """Generates a random salt of specified length."""
     return os.urandom(length)
 
+@timed('derive_key')
 def derive_key(password: str, salt: bytes, iterations=100_000, length=32) -> bytes:
     """
     Derives a secure key from a password using PBKDF2-HMAC-SHA256.
@@ -1,53 +1,113 @@
 import json
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from securevault.services import security_utils
+import binascii
+from securevault.services import security_utils, cipher_suite
 
-def encrypt_share(share: str, password: str) -> dict:
+# Sanity bounds for untrusted share files, checked before any KDF work
+MIN_KDF_ITERATIONS = 10_000
+MAX_KDF_ITERATIONS = 10_000_000
+
+def _binding_aad(key_set_id: str, share_index: int, share_length: int, field_bits: int = 8,
+                 generation: int = 0) -> bytes:
+    """
+    Canonical associated data binding a wrapped share to its key set and to
+    the split (generation) it came from. The values are not secret, but the
+    AEAD authenticates them so they cannot be edited without the decryption
+    failing. Default values are left out, so older shares keep their AAD.
+    """
+    binding = {
+        'key_set_id': key_set_id,
+        'share_index': share_index,
+        'share_length': share_length
+    }
+    if field_bits != 8:
+        binding['field_bits'] = field_bits
+    if generation:
+        binding['generation'] = generation
+    return json.dumps(binding, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def _share_plaintext_length(share_index: int, share_length: int, field_bits: int = 8) -> int:
+    """Length of the share string: '[16:]index-hexdata'."""
+    prefix = 0 if field_bits == 8 else len(str(field_bits)) + 1
+    return prefix + len(str(share_index)) + 1 + 2 * share_length
+
+def encrypt_share(share: str, password: str, key_set_id: str = None, suite: str = None, generation: int = 0) -> dict:
     """
     Encrypts a single share using a key derived from the password.
-    
+
     Args:
         share (str): The share string to encrypt.
         password (str): User provided password.
-        
+        key_set_id (str): Optional key set the share belongs to. When given, the
+            key set, share index and share length are embedded in the result and
+            authenticated as associated data.
+        suite (str): AEAD to use (see cipher_suite); None means AES-256-GCM.
+            Recorded in the result.
+        generation (int): Split of the key set the share belongs to (the
+            key_sets share_generation); bound like key_set_id.
+
     Returns:
         dict: A dictionary containing the encrypted share and metadata.
     """
     # 1. Generate a fresh salt
     salt = security_utils.generate_salt()
-    
+
     # 2. Derive key from password
     key = security_utils.derive_key(password, salt)
-    
-    # 3. Encrypt the share using AES-GCM
-    aesgcm = AESGCM(key)
-    nonce = security_utils.generate_salt(12) # 96-bit nonce for GCM
-    
+
+    # 3. Encrypt the share with the AEAD suite
+    suite = cipher_suite.check(suite)
+    aead = cipher_suite.aead(key, suite)
+    nonce = security_utils.generate_salt(12) # 96-bit nonce, as both suites use
+
     # Encode share to bytes
     share_bytes = share.encode('utf-8')
-    
-    ciphertext = aesgcm.encrypt(nonce, share_bytes, None)
-    
+
+    binding = None
+    aad = None
+    if key_set_id is not None:
+        field_bits = 8
+        body = share
+        if ':' in share:
+            bits_str, body = share.split(':')
+            field_bits = int(bits_str)
+        idx_str, data_hex = body.split('-')
+        binding = {
+            'key_set_id': key_set_id,
+            'share_index': int(idx_str),
+            'share_length': len(data_hex) // 2
+        }
+        if field_bits != 8:
+            binding['field_bits'] = field_bits
+        if generation:
+            binding['generation'] = generation
+        aad = _binding_aad(**binding)
+
+    ciphertext = aead.encrypt(nonce, share_bytes, aad)
+
     # 4. Construct the return dictionary
-    return {
+    result = {
         'salt': security_utils.encode_bytes_to_base64(salt),
         'nonce': security_utils.encode_bytes_to_base64(nonce),
         'ciphertext': security_utils.encode_bytes_to_base64(ciphertext),
         'kdf_iterations': 100000, # Hardcoded for now, or fetch from config
-        'kdf_algorithm': 'SHA256'
+        'kdf_algorithm': 'SHA256',
+        'cipher_suite': suite
     }
+    if binding:
+        result.update(binding)
+    return result
 
 def decrypt_share(encrypted_share_data: dict, password: str) -> str:
     """
     Decrypts a share using the provided password.
-    
+
     Args:
         encrypted_share_data (dict): The dictionary returned by encrypt_share.
         password (str): The password used for encryption.
-        
+
     Returns:
         str: The original share string.
-        
+
     Raises:
         InvalidTag: If decryption fails (wrong password or tampering).
     """
@@ -55,14 +115,114 @@ def decrypt_share(encrypted_share_data: dict, password: str) -> str:
     nonce = security_utils.decode_base64_to_bytes(encrypted_share_data['nonce'])
     ciphertext = security_utils.decode_base64_to_bytes(encrypted_share_data['ciphertext'])
     iterations = encrypted_share_data.get('kdf_iterations', 100000)
-    
+
+    aad = None
+    if 'key_set_id' in encrypted_share_data:
+        aad = _binding_aad(
+            encrypted_share_data['key_set_id'],
+            encrypted_share_data['share_index'],
+            encrypted_share_data['share_length'],
+            encrypted_share_data.get('field_bits', 8),
+            encrypted_share_data.get('generation', 0)
+        )
+
     # Derive the same key
     key = security_utils.derive_key(password, salt, iterations=iterations)
-    
-    aesgcm = AESGCM(key)
+
+    # Shares written before suites were recorded are AES-GCM
+    aead = cipher_suite.aead(key, encrypted_share_data.get('cipher_suite'))
     try:
-        plaintext_bytes = aesgcm.decrypt(nonce, ciphertext, None)
+        plaintext_bytes = aead.decrypt(nonce, ciphertext, aad)
         return plaintext_bytes.decode('utf-8')
     except Exception:
         # Re-raise as a generic error or handle specifically
         raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+
+def _check_structure(share_data: dict, position: int) -> bytes:
+    """Validates the non-secret fields of one share file and returns its ciphertext."""
+    if not isinstance(share_data, dict):
+        raise ValueError(f"Share {position + 1} is not a share object.")
+    try:
+        salt = security_utils.decode_base64_to_bytes(share_data['salt'])
+        nonce = security_utils.decode_base64_to_bytes(share_data['nonce'])
+        ciphertext = security_utils.decode_base64_to_bytes(share_data['ciphertext'])
+    except (KeyError, TypeError, binascii.Error):
+        raise ValueError(f"Share {position + 1} is malformed.")
+
+    iterations = share_data.get('kdf_iterations', 100000)
+    if len(salt) < 16 or len(nonce) != 12 or len(ciphertext) <= 16:
+        raise ValueError(f"Share {position + 1} is malformed.")
+    if not isinstance(iterations, int) or not MIN_KDF_ITERATIONS <= iterations <= MAX_KDF_ITERATIONS:
+        raise ValueError(f"Share {position + 1} has unsupported KDF parameters.")
+    if share_data.get('cipher_suite', cipher_suite.LEGACY_SUITE) not in cipher_suite.SUITES:
+        raise ValueError(f"Share {position + 1} uses an unsupported cipher suite.")
+    return ciphertext
+
+def check_share_bindings(share_files_data: list, key_set_id: str, generation: int = None) -> list:
+    """
+    Validates and de-duplicates uploaded shares before any KDF work.
+
+    Shares carrying a key-set binding must name key_set_id, come from one
+    split of it, agree on the share length, and have a ciphertext whose size
+    matches the bound index and length. Exact duplicates are dropped; two
+    different shares claiming the same index are rejected. Shares of
+    different splits would combine, without error, into a wrong key.
+
+    Args:
+        share_files_data (list): Encrypted share dicts as uploaded.
+        key_set_id (str): The key set being reconstructed.
+        generation (int): The key set's current share generation, if known;
+            shares of an earlier split (re-shared or rotated since) are rejected.
+
+    Returns:
+        list: Positions (into share_files_data) of the shares to keep.
+
+    Raises:
+        ValueError: On malformed, foreign, mismatched or conflicting shares.
+    """
+    keep = []
+    seen_ciphertexts = set()
+    seen_indices = {}
+    share_length = None
+    split = None
+
+    for position, share_data in enumerate(share_files_data):
+        ciphertext = _check_structure(share_data, position)
+        if share_data['ciphertext'] in seen_ciphertexts:
+            continue
+        seen_ciphertexts.add(share_data['ciphertext'])
+
+        if 'key_set_id' in share_data:
+            if share_data['key_set_id'] != key_set_id:
+                raise ValueError(f"Share {position + 1} belongs to a different key set.")
+            index = share_data.get('share_index')
+            length = share_data.get('share_length')
+            field_bits = share_data.get('field_bits', 8)
+            if not isinstance(index, int) or not isinstance(length, int) or index < 1 or length < 1:
+                raise ValueError(f"Share {position + 1} is malformed.")
+            if field_bits not in (8, 16):
+                raise ValueError(f"Share {position + 1} is malformed.")
+            share_generation = share_data.get('generation', 0)
+            if not isinstance(share_generation, int) or share_generation < 0:
+                raise ValueError(f"Share {position + 1} is malformed.")
+            if generation is not None and share_generation != generation:
+                raise ValueError(f"Share {position + 1} is from an earlier split of this key set; "
+                                 "it was re-shared or rotated since.")
+            if split is None:
+                split = share_generation
+            elif share_generation != split:
+                raise ValueError(f"Share {position + 1} is from a different split of this key set than the others.")
+            if share_length is None:
+                share_length = (length, field_bits)
+            elif (length, field_bits) != share_length:
+                raise ValueError(f"Share {position + 1} has a different share length.")
+            # Plaintext is the share string, sealed with a 16 byte tag (either suite)
+            if len(ciphertext) != _share_plaintext_length(index, length, field_bits) + 16:
+                raise ValueError(f"Share {position + 1} does not match its declared length.")
+            if index in seen_indices:
+                raise ValueError(f"Shares {seen_indices[index] + 1} and {position + 1} both claim index {index}.")
+            seen_indices[index] = position
+
+        keep.append(position)
+
+    return keep
@@ -1,24 +1,59 @@
 import os
-import random
-import functools
+from securevault.metrics import timed
+
+class _GaloisField:
+    """
+    Log/antilog table arithmetic over GF(2^bits).
+    The exp table is doubled so products never need a modulo.
+    """
+
+    def __init__(self, bits: int, poly: int):
+        self.bits = bits
+        self.size = 1 << bits
+        self.order = self.size - 1
+        self.log = [0] * self.size
+        self.exp = [0] * (2 * self.order)
+        x = 1
+        for i in range(self.order):
+            self.exp[i] = x
+            self.log[x] = i
+            x <<= 1
+            if x & self.size:
+                x ^= poly
+        for i in range(self.order, 2 * self.order):
+            self.exp[i] = self.exp[i - self.order]
+
+    def mul(self, a, b):
+        if a == 0 or b == 0:
+            return 0
+        return self.exp[self.log[a] + self.log[b]]
+
+    def div(self, a, b):
+        if b == 0:
+            raise ZeroDivisionError
+        if a == 0:
+            return 0
+        return self.exp[self.log[a] - self.log[b] + self.order]
 
 # GF(2^8) field arithmetic
-# Irreducible polynomial: x^8 + x^4 + x^3 + x + 1 (0x11B)
+# Reducing polynomial: x^8 + x^4 + x^3 + x^2 + 1 (0x11D)
 _R = 0x11D
-_LOG = [0] * 256
-_EXP = [0] * 256
+_GF8 = _GaloisField(8, _R)
+_LOG = _GF8.log
+_EXP = _GF8.exp
 
-def _init_tables():
-    x = 1
-    for i in range(255):
-        _EXP[i] = x
-        _LOG[x] = i
-        x <<= 1
-        if x & 0x100:
-            x ^= _R
-    _EXP[255] = _EXP[0] # Cyclic
+# GF(2^16) field arithmetic, used once N exceeds 255 shares
+# Reducing polynomial: x^16 + x^12 + x^3 + x + 1 (0x1100B)
+_R16 = 0x1100B
+_GF16 = _GaloisField(16, _R16)
 
-_init_tables()
+_FIELDS = {8: _GF8, 16: _GF16}
+
+# _MUL_TABLES[a] maps every byte b to a*b in GF(2^8), so a whole vector of
+# bytes can be multiplied by a scalar with bytes.translate().
+_MUL_TABLES = [bytes(256)] + [
+    bytes([0] + [_EXP[_LOG[a] + _LOG[b]] for b in range(1, 256)]) for a in range(1, 256)
+]
 
 def _add(a, b):
     return a ^ b
@@ -27,130 +62,416 @@ def _sub(a, b):
     return a ^ b
 
 def _mul(a, b):
-    if a == 0 or b == 0:
-        return 0
-    return _EXP[(_LOG[a] + _LOG[b]) % 255]
+    return _GF8.mul(a, b)
 
 def _div(a, b):
-    if b == 0:
-        raise ZeroDivisionError
-    if a == 0:
-        return 0
-    return _EXP[(_LOG[a] - _LOG[b] + 255) % 255]
+    return _GF8.div(a, b)
 
-class SSSManager:
+def _xor_bytes(a: bytes, b: bytes) -> bytes:
+    """XORs two equal-length byte strings (vector addition in GF(2^8))."""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+def _poly_eval(poly, x, gf=_GF8):
+    """Evaluates a polynomial (lowest degree first) at x."""
+    y = 0
+    for coeff in reversed(poly):
+        y = gf.mul(y, x) ^ coeff
+    return y
+
+def _poly_divmod(num, den, gf=_GF8):
     """
-    Shamir's Secret Sharing over GF(2^8).
-    Secrets are bytes. Shares are 'index-hexvalue'.
+    Divides polynomials (lowest degree first) over the given field.
+    Returns (quotient, remainder).
     """
+    num = list(num)
+    while len(den) > 1 and den[-1] == 0:
+        den = den[:-1]
+    if len(num) < len(den):
+        return [0], num
+    quot = [0] * (len(num) - len(den) + 1)
+    lead = den[-1]
+    for i in range(len(quot) - 1, -1, -1):
+        coeff = gf.div(num[i + len(den) - 1], lead)
+        quot[i] = coeff
+        if coeff:
+            for j, d in enumerate(den):
+                num[i + j] ^= gf.mul(coeff, d)
+    return quot, num[:len(den) - 1]
 
-    @staticmethod
-    def _eval_poly(poly, x):
-        """Evaluates polynomial at x using Horner's method."""
-        y = 0
-        for coeff in reversed(poly):
-            y = _mul(y, x) ^ coeff
-        return y
+def _solve_linear(rows, rhs, gf=_GF8):
+    """
+    Solves rows * v = rhs over the given field by Gaussian elimination.
+    Free variables are set to zero. Returns None if the system is inconsistent.
+    """
+    n_cols = len(rows[0])
+    m = [list(r) + [b] for r, b in zip(rows, rhs)]
+    pivots = []
+    r = 0
+    for c in range(n_cols):
+        pivot = next((i for i in range(r, len(m)) if m[i][c]), None)
+        if pivot is None:
+            continue
+        m[r], m[pivot] = m[pivot], m[r]
+        inv = gf.div(1, m[r][c])
+        m[r] = [gf.mul(v, inv) for v in m[r]]
+        for i in range(len(m)):
+            if i != r and m[i][c]:
+                f = m[i][c]
+                m[i] = [a ^ gf.mul(f, b) for a, b in zip(m[i], m[r])]
+        pivots.append(c)
+        r += 1
+        if r == len(m):
+            break
+    # Any remaining all-zero row with a non-zero right-hand side is a contradiction
+    for i in range(r, len(m)):
+        if m[i][-1]:
+            return None
+    solution = [0] * n_cols
+    for i, c in enumerate(pivots):
+        solution[c] = m[i][-1]
+    return solution
 
-    @staticmethod
-    def _lagrange_interpolate(x, x_s, y_s):
-        """
-        Computes the value of the polynomial passing through (x_s[i], y_s[i]) at x.
-        """
-        k = len(x_s)
-        y = 0
-        for i in range(k):
-            # Compute Li(x)
-            numerator = 1
-            denominator = 1
-            for j in range(k):
-                if i == j:
-                    continue
-                numerator = _mul(numerator, _sub(x, x_s[j]))
-                denominator = _mul(denominator, _sub(x_s[i], x_s[j]))
-            
-            term = _mul(y_s[i], _div(numerator, denominator))
-            y = _add(y, term)
-        return y
+def _berlekamp_welch(x_s, y_s, k, gf=_GF8):
+    """
+    Decodes one symbol position of a Reed-Solomon codeword.
+
+    Finds the polynomial P of degree < k that agrees with all but at most
+    (m-k)/2 of the points. Returns (P, error_positions) or None when more
+    points are wrong than can be corrected.
+    """
+    m = len(x_s)
+    e = (m - k) // 2
+    # Unknowns: Q_0..Q_{e+k-1}, then E_0..E_{e-1} (E is monic of degree e)
+    rows = []
+    rhs = []
+    for x, y in zip(x_s, y_s):
+        x_pows = [1]
+        for _ in range(e + k - 1):
+            x_pows.append(gf.mul(x_pows[-1], x))
+        x_e = gf.mul(x_pows[e - 1], x) if e else 1
+        rows.append(x_pows[:e + k] + [gf.mul(y, xp) for xp in x_pows[:e]])
+        rhs.append(gf.mul(y, x_e))
+    solution = _solve_linear(rows, rhs, gf)
+    if solution is None:
+        return None
+    q = solution[:e + k]
+    err_locator = solution[e + k:] + [1]
+    poly, remainder = _poly_divmod(q, err_locator, gf)
+    if any(remainder) or any(poly[k:]):
+        return None
+    poly = (poly + [0] * k)[:k]
+    errors = [i for i in range(m) if _poly_eval(poly, x_s[i], gf) != y_s[i]]
+    if len(errors) > e:
+        return None
+    return poly, errors
+
+def _lagrange_weights_at_zero(x_s, gf=_GF8):
+    """
+    Precomputes the Lagrange basis weights w_i = prod_{j!=i} x_j / (x_j - x_i).
+    The secret is then sum(w_i * y_i) for every symbol position, so the
+    O(k^2) work is paid once instead of once per secret byte.
+    """
+    log, order = gf.log, gf.order
+    if len(set(x_s)) != len(x_s):
+        raise ValueError("Duplicate share indices")
+    log_x = [log[x] for x in x_s]
+    log_prod = sum(log_x)
+    weights = []
+    for i, xi in enumerate(x_s):
+        num = log_prod - log_x[i]
+        den = sum(log[xj ^ xi] for j, xj in enumerate(x_s) if j != i)
+        weights.append(gf.exp[(num - den) % order])
+    return weights
+
+def _bytes_to_symbols(data: bytes, bits: int) -> list:
+    if bits == 8:
+        return list(data)
+    return [int.from_bytes(data[i:i + 2], 'big') for i in range(0, len(data), 2)]
+
+def _symbols_to_bytes(symbols: list, bits: int) -> bytes:
+    if bits == 8:
+        return bytes(symbols)
+    return b''.join(s.to_bytes(2, 'big') for s in symbols)
+
+class SSSManager:
+    """
+    Shamir's Secret Sharing over GF(2^8), or GF(2^16) for more than 255 shares.
+    Secrets are bytes. Shares are 'index-hexvalue' ('16:index-hexvalue' in GF(2^16)).
+    """
 
     @staticmethod
-    def split_secret(secret_bytes: bytes, n: int, k: int) -> list:
+    @timed('split_secret')
+    def split_secret(secret_bytes: bytes, n: int, k: int, field_bits: int = None) -> list:
         """
         Splits a secret into n shares, k needed to reconstruct.
+
+        Args:
+            secret_bytes (bytes): The secret.
+            n (int): Total shares.
+            k (int): Threshold.
+            field_bits (int): 8 or 16. Defaults to GF(2^8) up to 255 shares and
+                GF(2^16) (even-length secrets, up to 65535 shares) beyond that.
         """
         if k > n:
             raise ValueError("Threshold (k) cannot be greater than shares (n)")
         if k < 2:
             raise ValueError("Threshold (k) must be at least 2")
+        if field_bits is None:
+            field_bits = 8 if n <= _GF8.order else 16
+        if field_bits not in _FIELDS:
+            raise ValueError("Field must be GF(2^8) or GF(2^16)")
+        if n > _FIELDS[field_bits].order:
+            raise ValueError(f"At most {_FIELDS[field_bits].order} shares are supported")
 
-        # Create a random polynomial for each byte of the secret
-        # poly[0] = secret byte
-        # poly[1..k-1] = random coefficients
-        
-        # We process the secret byte-by-byte (or conceptually so).
-        # Actually, let's form k-1 random byte arrays of the same length as secret.
-        
+        if field_bits == 8:
+            return SSSManager._split_gf8(secret_bytes, n, k)
+        return SSSManager._split_gf16(secret_bytes, n, k)
+
+    @staticmethod
+    def _split_gf8(secret_bytes: bytes, n: int, k: int) -> list:
+        # Coefficients: (k-1) random byte vectors of the secret's length, plus
+        # the constant term which is the secret itself. Every byte position is
+        # an independent polynomial, so all positions are evaluated together:
+        # Horner's method on whole vectors, multiplying by x via translate().
         secret_len = len(secret_bytes)
-        # Coefficients: a matrix of (k-1) x secret_len
-        # plus the constant term which is the secret itself.
-        
-        # coeffs[i][byte_idx] is the coefficient for x^i at that byte position
-        coeffs = [[random.randint(0, 255) for _ in range(secret_len)] for _ in range(k - 1)]
-        
+        coeffs = [os.urandom(secret_len) for _ in range(k - 1)]
+        lower_terms = coeffs[-2::-1] + [bytes(secret_bytes)]
+
         shares = []
         for x in range(1, n + 1):
-            # Evaluate polynomial at x for each byte
-            share_val = bytearray(secret_len)
-            for i in range(secret_len):
-                # P(x) = secret + c1*x + c2*x^2 + ...
-                val = secret_bytes[i]
-                x_pow = x
-                for j in range(k - 1):
-                    term = _mul(coeffs[j][i], x_pow)
-                    val = _add(val, term)
-                    x_pow = _mul(x_pow, x)
-                share_val[i] = val
-            
+            table = _MUL_TABLES[x]
+            share_val = coeffs[-1]
+            for c in lower_terms:
+                share_val = _xor_bytes(share_val.translate(table), c)
+
             # Format: "index-hexdata"
             shares.append(f"{x}-{share_val.hex()}")
-            
+
         return shares
 
     @staticmethod
-    def combine_shares(shares_strings: list) -> bytes:
-        """
-        Reconstructs the secret from shares.
-        """
+    def _split_gf16(secret_bytes: bytes, n: int, k: int) -> list:
+        if len(secret_bytes) % 2:
+            raise ValueError("GF(2^16) sharing requires an even-length secret")
+        gf = _GF16
+        log, exp = gf.log, gf.exp
+        secret = _bytes_to_symbols(secret_bytes, 16)
+        width = len(secret)
+        coeffs = [_bytes_to_symbols(os.urandom(2 * width), 16) for _ in range(k - 1)]
+        lower_terms = coeffs[-2::-1] + [secret]
+
+        # Batched multipoint evaluation: log(x) is looked up once per share
+        # and every symbol position is advanced together at each Horner step.
+        shares = []
+        for x in range(1, n + 1):
+            log_x = log[x]
+            acc = coeffs[-1]
+            for c in lower_terms:
+                acc = [(exp[log[a] + log_x] if a else 0) ^ b for a, b in zip(acc, c)]
+            shares.append(f"16:{x}-{_symbols_to_bytes(acc, 16).hex()}")
+        return shares
+
+    @staticmethod
+    def _parse_shares(shares_strings: list) -> tuple:
+        """Parses share strings into (field_bits, [(x, y_bytes), ...])."""
         if not shares_strings:
             raise ValueError("No shares provided")
-            
-        # Parse shares
+
+        fields = set()
         try:
             points = []
             for s in shares_strings:
+                bits = 8
+                if ':' in s:
+                    bits_str, s = s.split(':')
+                    bits = int(bits_str)
                 idx_str, data_hex = s.split('-')
                 x = int(idx_str)
                 y_bytes = bytes.fromhex(data_hex)
+                if bits not in _FIELDS or not 0 < x <= _FIELDS[bits].order:
+                    raise ValueError
+                fields.add(bits)
                 points.append((x, y_bytes))
         except ValueError:
              raise ValueError("Invalid share format")
 
-        k = len(points)
+        if len(fields) != 1:
+            raise ValueError("Shares use different fields")
+
         secret_len = len(points[0][1])
-        
+
         # Validate lengths
         for _, y in points:
             if len(y) != secret_len:
                 raise ValueError("Shares have inconsistent lengths")
-        
+        return fields.pop(), points
+
+    @staticmethod
+    @timed('combine_shares')
+    def combine_shares(shares_strings: list) -> bytes:
+        """
+        Reconstructs the secret from shares.
+        """
+        bits, points = SSSManager._parse_shares(shares_strings)
+        x_s = [p[0] for p in points]
+        weights = _lagrange_weights_at_zero(x_s, _FIELDS[bits])
+
+        # Interpolate every byte position at x=0 at once: secret = sum(w_i * y_i)
+        if bits == 8:
+            secret = bytes(len(points[0][1]))
+            for w, (_, y) in zip(weights, points):
+                secret = _xor_bytes(secret, y.translate(_MUL_TABLES[w]))
+            return secret
+
+        log, exp = _GF16.log, _GF16.exp
+        acc = [0] * (len(points[0][1]) // 2)
+        for w, (_, y) in zip(weights, points):
+            log_w = log[w]
+            acc = [a ^ (exp[log[s] + log_w] if s else 0) for a, s in zip(acc, _bytes_to_symbols(y, 16))]
+        return _symbols_to_bytes(acc, 16)
+
+    @staticmethod
+    @timed('combine_shares_robust')
+    def combine_shares_robust(shares_strings: list, k: int) -> tuple:
+        """
+        Reconstructs the secret while locating corrupt or foreign shares.
+
+        Treats the shares as a Reed-Solomon codeword and decodes each symbol
+        position with Berlekamp-Welch. With m shares, up to (m-k)/2 bad shares
+        are identified and dropped in one polynomial-time pass.
+
+        Args:
+            shares_strings (list): At least k 'index-hexvalue' shares.
+            k (int): The threshold the shares were split with.
+
+        Returns:
+            tuple: (secret bytes, sorted list of bad share indices).
+
+        Raises:
+            ValueError: If too many shares are corrupt to correct.
+        """
+        bits, points = SSSManager._parse_shares(shares_strings)
+        if len(points) < k:
+            raise ValueError("Not enough shares to reconstruct the secret")
+        gf = _FIELDS[bits]
+
         x_s = [p[0] for p in points]
-        y_s_list = [p[1] for p in points]
-        
-        secret = bytearray(secret_len)
-        
-        # Interpolate for each byte position at x=0
-        for i in range(secret_len):
-            y_s = [y[i] for y in y_s_list]
-            secret[i] = SSSManager._lagrange_interpolate(0, x_s, y_s)
-            
-        return bytes(secret)
+        y_s_list = [_bytes_to_symbols(p[1], bits) for p in points]
+
+        secret = []
+        bad_positions = set()
+        for i in range(len(y_s_list[0])):
+            decoded = _berlekamp_welch(x_s, [y[i] for y in y_s_list], k, gf)
+            if decoded is None:
+                raise ValueError("Too many corrupt shares to correct")
+            poly, errors = decoded
+            secret.append(poly[0])
+            bad_positions.update(errors)
+
+        # Errors are per share, so every symbol position must agree on the budget
+        if len(bad_positions) > (len(points) - k) // 2:
+            raise ValueError("Too many corrupt shares to correct")
+
+        return _symbols_to_bytes(secret, bits), sorted(x_s[p] for p in bad_positions)
+
+def _invert_matrix(rows, gf=_GF8):
+    """Inverts a square matrix over the given field by Gauss-Jordan elimination."""
+    size = len(rows)
+    m = [list(r) + [1 if i == j else 0 for j in range(size)] for i, r in enumerate(rows)]
+    for c in range(size):
+        pivot = next((i for i in range(c, size) if m[i][c]), None)
+        if pivot is None:
+            raise ValueError("Matrix is singular")
+        m[c], m[pivot] = m[pivot], m[c]
+        inv = gf.div(1, m[c][c])
+        m[c] = [gf.mul(v, inv) for v in m[c]]
+        for i in range(size):
+            if i != c and m[i][c]:
+                f = m[i][c]
+                m[i] = [a ^ gf.mul(f, b) for a, b in zip(m[i], m[c])]
+    return [r[size:] for r in m]
+
+class InformationDispersal:
+    """
+    Rabin's information dispersal over GF(2^8): data is cut into k stripes
+    that become the coefficients of a polynomial, and fragment x is its value
+    at x for every byte position. Any k of the n fragments determine the
+    polynomial again, and each fragment is 1/k of the data, so n fragments
+    cost n/k of the data instead of n full copies.
+
+    Unlike SSSManager there is no random coefficient, so fragments are not
+    secret on their own: disperse ciphertext, not plaintext (Krawczyk's
+    secret sharing made short).
+    """
+
+    @staticmethod
+    @timed('ida_split')
+    def split(data: bytes, n: int, k: int) -> list:
+        """
+        Encodes data into n fragments, any k of which recover it.
+
+        Args:
+            data (bytes): Content to disperse (zero-padded to a multiple of k).
+            n (int): Fragments to produce, at most 255.
+            k (int): Fragments needed to recover.
+
+        Returns:
+            list: n byte strings of ceil(len(data) / k) bytes; fragment i
+                is the evaluation at x = i + 1.
+        """
+        if not 1 <= k <= n <= 255:
+            raise ValueError("Dispersal needs 1 <= K <= N <= 255.")
+        width = -(-len(data) // k) if data else 0
+        padded = bytes(data) + bytes(width * k - len(data))
+        stripes = [padded[j * width:(j + 1) * width] for j in range(k)]
+
+        # Horner's method on whole stripes, as in _split_gf8
+        fragments = []
+        for x in range(1, n + 1):
+            table = _MUL_TABLES[x]
+            value = stripes[-1]
+            for stripe in stripes[-2::-1]:
+                value = _xor_bytes(value.translate(table), stripe)
+            fragments.append(value)
+        return fragments
+
+    @staticmethod
+    @timed('ida_combine')
+    def combine(fragments: dict, k: int) -> bytes:
+        """
+        Recovers the padded data from any k fragments.
+
+        Args:
+            fragments (dict): Fragment index (0-based, as returned by split)
+                to fragment bytes; extra fragments beyond k are ignored.
+            k (int): The k the data was split with.
+
+        Returns:
+            bytes: The k stripes joined, including any zero padding.
+        """
+        if len(fragments) < k:
+            raise ValueError(f"Need {k} fragments to recover, got {len(fragments)}.")
+        chosen = sorted(fragments.items())[:k]
+        width = len(chosen[0][1])
+        if any(len(f) != width for _, f in chosen):
+            raise ValueError("Fragments have inconsistent lengths")
+
+        # Invert the Vandermonde matrix of the chosen points once; every
+        # stripe is then a fixed linear combination of the fragments
+        x_s = [index + 1 for index, _ in chosen]
+        vandermonde = []
+        for x in x_s:
+            row = [1]
+            for _ in range(k - 1):
+                row.append(_GF8.mul(row[-1], x))
+            vandermonde.append(row)
+        inverse = _invert_matrix(vandermonde)
+
+        stripes = []
+        for j in range(k):
+            stripe = bytes(width)
+            for coeff, (_, fragment) in zip(inverse[j], chosen):
+                if coeff:
+                    stripe = _xor_bytes(stripe, fragment.translate(_MUL_TABLES[coeff]))
+            stripes.append(stripe)
+        return b''.join(stripes)
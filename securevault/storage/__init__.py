@@ -0,0 +1,53 @@
+import os
+from securevault.storage.base import StorageBackend
+from securevault.metrics import Instrumented
+
+# Singleton pattern through module-level variable, as in supabase_client
+_storage: StorageBackend = None
+
+def _backend_from_spec(spec: str) -> StorageBackend:
+    # 'local:/path' or 'supabase:bucket'
+    kind, _, location = spec.strip().partition(':')
+    if kind == "local" and location:
+        from securevault.storage.local_backend import LocalStorage
+        return LocalStorage(location)
+    if kind == "supabase" and location:
+        from securevault.storage.supabase_backend import SupabaseStorage
+        return SupabaseStorage(location)
+    raise ValueError(f"Invalid storage target: {spec!r}")
+
+def get_storage() -> StorageBackend:
+    """
+    Returns the configured ciphertext storage backend.
+    STORAGE_BACKEND selects 'supabase' (default) or 'local' (LOCAL_STORAGE_ROOT).
+    DISPERSAL_TARGETS (comma-separated 'local:/path' or 'supabase:bucket')
+    spreads dispersal fragments across those targets (see router).
+    Setting CIPHERTEXT_CACHE_DIR puts an on-disk LRU cache in front of it.
+    Every call is timed under 'storage.<method>' (see metrics).
+    """
+    global _storage
+    if _storage is None:
+        backend = os.environ.get("STORAGE_BACKEND", "supabase")
+        if backend == "supabase":
+            from securevault.storage.supabase_backend import SupabaseStorage
+            _storage = SupabaseStorage()
+        elif backend == "local":
+            from securevault.storage.local_backend import LocalStorage
+            _storage = LocalStorage(os.environ.get("LOCAL_STORAGE_ROOT", "instance/storage"))
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+        targets = os.environ.get("DISPERSAL_TARGETS")
+        if targets:
+            from securevault.storage.router import FragmentRouter
+            _storage = FragmentRouter(_storage, [_backend_from_spec(t) for t in targets.split(',') if t.strip()])
+
+        cache_dir = os.environ.get("CIPHERTEXT_CACHE_DIR")
+        if cache_dir:
+            from securevault.storage.cache import CiphertextCache, CachedStorage
+            max_bytes = int(os.environ.get("CIPHERTEXT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+            _storage = CachedStorage(_storage, CiphertextCache(cache_dir, max_bytes))
+
+        _storage = Instrumented(_storage, 'storage')
+
+    return _storage
@@ -0,0 +1,56 @@
+import io
+from flask import Response
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+class StorageBackend:
+    """
+    Interface for the blob store holding encrypted files.
+    Paths are logical object names such as 'encrypted/<key_set_id>/<name>.enc'.
+    Only ciphertext is ever handed to a backend.
+    """
+
+    # True for backends that keep local copies worth warming (see cache.CachedStorage)
+    caches_reads = False
+
+    def put(self, path: str, data) -> None:
+        """Stores bytes or a binary file-like object under path."""
+        raise NotImplementedError
+
+    def get(self, path: str) -> bytes:
+        """Returns the full object."""
+        raise NotImplementedError
+
+    def stream(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Yields the object in chunks without holding it all in memory."""
+        raise NotImplementedError
+
+    def get_range(self, path: str, start: int, end: int) -> bytes:
+        """Returns bytes [start, end) of the object."""
+        raise NotImplementedError
+
+    def delete(self, path: str) -> None:
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def send(self, path: str, download_name: str) -> Response:
+        """Builds a Flask download response for the raw object."""
+        return Response(
+            self.stream(path),
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+        )
+
+def as_bytes(data) -> bytes:
+    """Normalises put() input to bytes."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    return data.read()
+
+def as_stream(data):
+    """Normalises put() input to a binary file-like object."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(data))
+    return data
@@ -0,0 +1,299 @@
+import os
+import fcntl
+import hashlib
+import tempfile
+import threading
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from securevault.storage.base import StorageBackend, DEFAULT_CHUNK_SIZE, as_bytes
+
+_DIGEST_SIZE = 32
+
+class CiphertextCache:
+    """
+    Size-bounded, on-disk LRU cache of ciphertext blobs keyed by storage path.
+
+    Only ciphertext is ever cached, so a copy on local disk exposes nothing
+    that storage did not already hold. Every entry is prefixed with the
+    SHA-256 of its content and checked on read; a corrupt entry is dropped
+    and reported as a miss. Recency is kept in memory and mirrored to file
+    mtimes so the order survives restarts.
+
+    Several processes (e.g. gunicorn workers) may share one directory. The
+    total size is kept in a usage file updated under a lock on the
+    directory, and eviction re-reads the directory, so together they stay
+    within max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # cache file -> size, oldest first as this process saw them
+        self._lock_path = os.path.join(self.root, '.lock')
+        self._usage_path = os.path.join(self.root, '.usage')
+        os.makedirs(self.root, exist_ok=True)
+        self._load()
+
+    def _scan(self) -> list:
+        # (mtime, cache file, size) of every entry on disk, oldest first
+        found = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.blob'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+        return sorted(found)
+
+    def _load(self):
+        with self._shared():
+            found = self._scan()
+            for _, path, size in found:
+                self._entries[path] = size
+            self._write_usage(sum(size for _, _, size in found))
+
+    @contextlib.contextmanager
+    def _shared(self):
+        """Holds this process's lock and the directory lock shared with other processes."""
+        with self._lock, open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Released when the file is closed
+            yield
+
+    def _read_usage(self) -> int:
+        try:
+            with open(self._usage_path) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return sum(size for _, _, size in self._scan())
+
+    def _write_usage(self, usage: int):
+        with open(self._usage_path, 'w') as f:
+            f.write(str(max(0, usage)))
+
+    def _file(self, storage_path: str) -> str:
+        digest = hashlib.sha256(storage_path.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + '.blob')
+
+    def _forget(self, path: str):
+        # Called with the directory lock held
+        self._entries.pop(path, None)
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        self._write_usage(self._read_usage() - size)
+
+    def _evict(self) -> int:
+        """
+        Drops the least recently used entries of every process until the
+        directory is within budget. Called with the directory lock held.
+
+        Returns:
+            int: Bytes left in the directory.
+        """
+        rank = {path: i for i, path in enumerate(self._entries)}
+        # mtimes are coarse; this process's own recency order breaks ties
+        found = sorted(self._scan(), key=lambda e: (e[0], rank.get(e[1], -1)))
+        usage = sum(size for _, _, size in found)
+        for _, path, size in found:
+            if usage <= self.max_bytes:
+                break
+            self._entries.pop(path, None)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            usage -= size
+        return usage
+
+    def _touch(self, path: str):
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was read
+            pass
+
+    def get(self, storage_path: str) -> bytes:
+        """Returns the cached blob, or None on a miss or failed integrity check."""
+        path = self._file(storage_path)
+        try:
+            with open(path, 'rb') as f:
+                stored = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        digest, data = stored[:_DIGEST_SIZE], stored[_DIGEST_SIZE:]
+        if hashlib.sha256(data).digest() != digest:
+            with self._shared():
+                self._forget(path)
+            return None
+        self._touch(path)
+        return data
+
+    def open_blob(self, storage_path: str):
+        """
+        Returns the cached blob as an open file positioned at its content,
+        checked in one streaming pass, or None on a miss or failed check.
+        """
+        path = self._file(storage_path)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        digest = f.read(_DIGEST_SIZE)
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(DEFAULT_CHUNK_SIZE), b''):
+            h.update(chunk)
+        if h.digest() != digest:
+            f.close()
+            with self._shared():
+                self._forget(path)
+            return None
+        f.seek(_DIGEST_SIZE)
+        self._touch(path)
+        return f
+
+    def put(self, storage_path: str, data: bytes):
+        """Stores a blob, evicting least recently used entries to stay in budget."""
+        entry_size = len(data) + _DIGEST_SIZE
+        if entry_size > self.max_bytes:
+            return
+        path = self._file(storage_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(hashlib.sha256(data).digest())
+                f.write(data)
+        except BaseException:
+            # e.g. a full disk; leave no partial file behind
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._shared():
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self._entries.pop(path, None)
+            self._entries[path] = entry_size
+            usage = self._read_usage() - replaced + entry_size
+            if usage > self.max_bytes:
+                usage = self._evict()
+            self._write_usage(usage)
+
+    def discard(self, storage_path: str):
+        with self._shared():
+            self._forget(self._file(storage_path))
+
+    def contains(self, storage_path: str) -> bool:
+        return os.path.exists(self._file(storage_path))
+
+    @property
+    def size(self) -> int:
+        """Bytes cached in the directory, by every process sharing it."""
+        with self._shared():
+            return self._read_usage()
+
+class CachedStorage(StorageBackend):
+    """
+    Read-through, write-through cache in front of another storage backend.
+    """
+
+    caches_reads = True
+
+    def __init__(self, backend: StorageBackend, cache: CiphertextCache, prefetch_workers: int = 2):
+        self.backend = backend
+        self.cache = cache
+        self.prefetch_workers = prefetch_workers
+        self._pool = None
+        self._pool_pid = None
+
+    def put(self, path: str, data) -> None:
+        data = as_bytes(data)
+        self.backend.put(path, data)
+        self._fill(path, data)
+
+    def get(self, path: str) -> bytes:
+        data = self.cache.get(path)
+        if data is None:
+            data = self.backend.get(path)
+            self._fill(path, data)
+        return data
+
+    def _fill(self, path: str, data: bytes):
+        # Best effort: the backend holds the object, so a failed cache write
+        # must not fail the read or write that triggered it
+        try:
+            self.cache.put(path, data)
+        except Exception as e:
+            print(f"Caching {path} failed: {e}")
+
+    def stream(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        # A hit is read from the cached file, never held in memory whole
+        f = self.cache.open_blob(path)
+        if f is None:
+            yield from self.backend.stream(path, chunk_size)
+            return
+        with f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+
+    def get_range(self, path: str, start: int, end: int) -> bytes:
+        f = self.cache.open_blob(path)
+        if f is None:
+            return self.backend.get_range(path, start, end)
+        with f:
+            return os.pread(f.fileno(), max(0, end - start), _DIGEST_SIZE + start)
+
+    def delete(self, path: str) -> None:
+        self.cache.discard(path)
+        self.backend.delete(path)
+
+    def exists(self, path: str) -> bool:
+        return self.cache.contains(path) or self.backend.exists(path)
+
+    def send(self, path: str, download_name: str):
+        return self.backend.send(path, download_name)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Thread pools do not survive fork; each worker process builds its own
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.prefetch_workers, thread_name_prefix='prefetch')
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _warm(self, path: str):
+        if not self.cache.contains(path):
+            try:
+                self.cache.put(path, self.backend.get(path))
+            except Exception as e:
+                print(f"Prefetch of {path} failed: {e}")
+
+    def prefetch(self, paths: list):
+        """Warms the cache with the given objects in the background."""
+        pool = self._executor()
+        return [pool.submit(self._warm, p) for p in paths]
+
+    def submit(self, fn, *args):
+        """Runs fn on the prefetch pool, e.g. to resolve paths before prefetching."""
+        return self._executor().submit(fn, *args)
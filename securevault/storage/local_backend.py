@@ -0,0 +1,88 @@
+import os
+import hashlib
+import tempfile
+from flask import send_file
+from securevault.storage.base import StorageBackend, DEFAULT_CHUNK_SIZE, as_stream
+
+class LocalStorage(StorageBackend):
+    """
+    Filesystem backend for on-prem nodes, tests and benchmarks.
+
+    Objects live under root/objects/<h[0:2]>/<h[2:4]>/<h>, where h is the
+    SHA-256 of the logical path, so no directory grows unbounded. Writes go
+    to a temporary file in root/tmp and are renamed into place only once
+    complete, so readers never see a partial object.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._objects = os.path.join(self.root, 'objects')
+        self._tmp = os.path.join(self.root, 'tmp')
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def local_path(self, path: str) -> str:
+        """Physical location of a logical object path."""
+        digest = hashlib.sha256(path.encode('utf-8')).hexdigest()
+        return os.path.join(self._objects, digest[:2], digest[2:4], digest)
+
+    def put(self, path: str, data) -> None:
+        target = self.local_path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        src = as_stream(data)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = src.read(DEFAULT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            # Atomic commit: the object appears fully written or not at all
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _open(self, path: str):
+        try:
+            return open(self.local_path(path), 'rb')
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Object not found: {path}")
+
+    def get(self, path: str) -> bytes:
+        with self._open(path) as f:
+            return f.read()
+
+    def stream(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        with self._open(path) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def get_range(self, path: str, start: int, end: int) -> bytes:
+        with self._open(path) as f:
+            return os.pread(f.fileno(), max(0, end - start), start)
+
+    def delete(self, path: str) -> None:
+        try:
+            os.unlink(self.local_path(path))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self.local_path(path))
+
+    def send(self, path: str, download_name: str):
+        # Sending by filename lets the WSGI server use wsgi.file_wrapper, which
+        # gunicorn serves with os.sendfile() straight from the page cache.
+        target = self.local_path(path)
+        if not os.path.exists(target):
+            raise FileNotFoundError(f"Object not found: {path}")
+        return send_file(target, as_attachment=True, download_name=download_name,
+                         mimetype='application/octet-stream', conditional=True)
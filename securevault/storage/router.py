@@ -0,0 +1,51 @@
+import re
+from securevault.storage.base import StorageBackend, DEFAULT_CHUNK_SIZE
+
+# Object name of dispersal fragment i: '<storage_path>.ida/<i:03d>'
+_FRAGMENT = re.compile(r'\.ida/(\d{3})$')
+
+def fragment_path(storage_path: str, index: int) -> str:
+    """Object name of one information-dispersal fragment of a file."""
+    return f"{storage_path}.ida/{index:03d}"
+
+class FragmentRouter(StorageBackend):
+    """
+    Spreads dispersal fragments over several storage targets.
+
+    Fragment i of a file goes to targets[i % len(targets)], so with at least
+    N targets every fragment of a file lands on a different one and any N-K
+    of them can be lost. Every other object stays on the primary backend.
+    """
+
+    def __init__(self, primary: StorageBackend, targets: list):
+        if not targets:
+            raise ValueError("FragmentRouter needs at least one target.")
+        self.primary = primary
+        self.targets = list(targets)
+
+    def _backend(self, path: str) -> StorageBackend:
+        match = _FRAGMENT.search(path)
+        if match is None:
+            return self.primary
+        return self.targets[int(match.group(1)) % len(self.targets)]
+
+    def put(self, path: str, data) -> None:
+        self._backend(path).put(path, data)
+
+    def get(self, path: str) -> bytes:
+        return self._backend(path).get(path)
+
+    def stream(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        return self._backend(path).stream(path, chunk_size)
+
+    def get_range(self, path: str, start: int, end: int) -> bytes:
+        return self._backend(path).get_range(path, start, end)
+
+    def delete(self, path: str) -> None:
+        self._backend(path).delete(path)
+
+    def exists(self, path: str) -> bool:
+        return self._backend(path).exists(path)
+
+    def send(self, path: str, download_name: str):
+        return self._backend(path).send(path, download_name)
@@ -0,0 +1,49 @@
+from securevault.supabase_client import get_supabase
+from securevault.storage.base import StorageBackend, DEFAULT_CHUNK_SIZE, as_stream
+
+# Signed URLs only need to outlive a single streamed or ranged download
+_SIGNED_URL_TTL = 300
+
+class SupabaseStorage(StorageBackend):
+    """Adapter over a Supabase Storage bucket."""
+
+    def __init__(self, bucket: str = "encrypted-files"):
+        self.bucket = bucket
+
+    def _bucket(self):
+        return get_supabase().storage.from_(self.bucket)
+
+    def _signed_url(self, path: str) -> str:
+        return self._bucket().create_signed_url(path, _SIGNED_URL_TTL)['signedURL']
+
+    def put(self, path: str, data) -> None:
+        # Wrap bytes in BytesIO for reliable upload
+        self._bucket().upload(
+            path=path,
+            file=as_stream(data),
+            file_options={"content-type": "application/octet-stream"}
+        )
+
+    def get(self, path: str) -> bytes:
+        # supabase-py download returns bytes directly
+        return self._bucket().download(path)
+
+    def stream(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        import requests
+        with requests.get(self._signed_url(path), stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            yield from resp.iter_content(chunk_size=chunk_size)
+
+    def get_range(self, path: str, start: int, end: int) -> bytes:
+        import requests
+        resp = requests.get(self._signed_url(path), headers={'Range': f'bytes={start}-{end - 1}'}, timeout=60)
+        resp.raise_for_status()
+        # A server that ignores Range answers 200 with the whole object
+        return resp.content if resp.status_code == 206 else resp.content[start:end]
+
+    def delete(self, path: str) -> None:
+        self._bucket().remove([path])
+
+    def exists(self, path: str) -> bool:
+        folder, _, name = path.rpartition('/')
+        return any(item.get('name') == name for item in self._bucket().list(folder, {'search': name}))
@@ -1,11 +1,23 @@
 import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Initialize Supabase client
-# Singleton pattern through module-level variable
-_supabase: Client = None
+# Singleton pattern through module-level variable. The client is created on
+# first use, so importing the app does not load the supabase/httpx stack, and
+# it is dropped in forked children: its connection pool must not be shared
+# between processes.
+_supabase: 'Client' = None
+
+def _reset_after_fork():
+    global _supabase
+    _supabase = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
-def get_supabase() -> Client:
+def get_supabase() -> 'Client':
     """
     Returns the initialized Supabase client.
     Initializes it if it hasn't been already.
@@ -18,6 +30,7 @@ def get_supabase() -> Client:
         if not url or not key:
             raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in env.")
             
+        from supabase import create_client
         _supabase = create_client(url, key)
         
     return _supabase
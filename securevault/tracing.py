@@ -0,0 +1,130 @@
+import threading
+import contextvars
+from collections import Counter
+
+# Calls of one backend method per request above which the request is
+# reported as a likely N+1 pattern
+N_PLUS_ONE_THRESHOLD = 5
+
+_current = contextvars.ContextVar('securevault_trace', default=None)
+
+# Lists receiving every finished request trace (see call_budget)
+_observers = []
+
+class Trace:
+    """
+    Backend round trips made while serving one request.
+
+    Filled in by metrics.Instrumented, i.e. by every get_models() and
+    get_storage() call made on the request thread or on a worker thread
+    started with propagate().
+    """
+
+    def __init__(self, endpoint: str = None):
+        self.endpoint = endpoint
+        self.calls = Counter()     # 'db.get_key_set' -> count
+        self.kind_calls = Counter()  # 'db' / 'storage' -> count
+        self.kind_seconds = Counter()
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, nbytes: int = 0):
+        kind = stage.split('.', 1)[0]
+        with self._lock:
+            self.calls[stage] += 1
+            self.kind_calls[kind] += 1
+            self.kind_seconds[kind] += seconds
+            self.bytes += nbytes
+
+    def repeated_calls(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> dict:
+        """Methods called more than threshold times, the usual N+1 signature."""
+        return {stage: count for stage, count in self.calls.items() if count > threshold}
+
+    def headers(self) -> dict:
+        return {
+            'X-Backend-DB-Calls': str(self.kind_calls['db']),
+            'X-Backend-DB-Time-Ms': f"{self.kind_seconds['db'] * 1000:.1f}",
+            'X-Backend-Storage-Calls': str(self.kind_calls['storage']),
+            'X-Backend-Storage-Time-Ms': f"{self.kind_seconds['storage'] * 1000:.1f}",
+            'X-Backend-Bytes': str(self.bytes)
+        }
+
+def current() -> Trace:
+    return _current.get()
+
+def payload_size(*values) -> int:
+    """Bytes moved by a backend call: byte-like arguments and results."""
+    return sum(len(v) for v in values if isinstance(v, (bytes, bytearray, memoryview)))
+
+def propagate(fn):
+    """
+    Binds fn to a copy of the caller's context, so calls made from a worker
+    thread are still counted against the request that started it.
+    """
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return ctx.copy().run(fn, *args, **kwargs)
+    return run
+
+class call_budget:
+    """
+    Test helper: fails when the requests made inside the block exceed a
+    declared number of backend round trips.
+
+        with call_budget(db=3, storage=1):
+            client.post('/decrypt-file', data={'file_id': fid})
+    """
+
+    def __init__(self, db: int = None, storage: int = None):
+        self.limits = {'db': db, 'storage': storage}
+        self.traces = []
+
+    def __enter__(self):
+        _observers.append(self.traces)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _observers.remove(self.traces)
+        if exc_type is not None:
+            return False
+        for trace in self.traces:
+            for kind, limit in self.limits.items():
+                if limit is not None and trace.kind_calls[kind] > limit:
+                    raise AssertionError(
+                        f"{trace.endpoint} made {trace.kind_calls[kind]} {kind} calls (budget {limit}): "
+                        f"{dict(trace.calls)}"
+                    )
+        return False
+
+def init_app(app):
+    """
+    Opens a trace for every request. When the app runs in debug mode (or
+    TRACE_HEADERS is set) the totals are added to the response headers.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_trace():
+        g.trace_token = _current.set(Trace(request.endpoint))
+
+    @app.after_request
+    def _attach_trace(response):
+        trace = current()
+        if trace is not None and (app.debug or app.config.get('TRACE_HEADERS')):
+            response.headers.update(trace.headers())
+        return response
+
+    @app.teardown_request
+    def _finish_trace(exc):
+        token = g.pop('trace_token', None)
+        if token is None:
+            return
+        trace = current()
+        _current.reset(token)
+        repeated = trace.repeated_calls()
+        if repeated:
+            app.logger.warning("Possible N+1 in %s: %s", trace.endpoint, repeated)
+        for observer in _observers:
+            observer.append(trace)
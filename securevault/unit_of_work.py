@@ -0,0 +1,148 @@
+import time
+import uuid
+from securevault import metrics, tracing
+
+# Tables a unit of work may write
+TABLES = ('key_sets', 'files', 'reconstruction_sessions', 'audit_logs')
+
+class WriteConflict(ValueError):
+    """A guarded write found its rows changed, so nothing was committed."""
+
+class UnitOfWork:
+    """
+    Collects a request's metadata writes and applies them together: all of
+    them in one round trip, or none of them.
+
+        with get_models().unit_of_work() as uow:
+            key_set = uow.create_key_set(3, 2, 'label')
+            uow.create_file_record(..., key_set_id=key_set['id'])
+            uow.insert_audit_log({...})
+
+    Rows get their ids when queued, so later writes can reference earlier
+    ones, and are completed in place (timestamps, defaults) by the commit.
+    Leaving the block commits; an exception inside it discards everything
+    queued. Guards (update's expect, expect_count) make the whole commit
+    fail with WriteConflict if what was read has changed since. Backends
+    implement _flush(ops), which must be atomic; the commit is timed and
+    traced as one 'db.flush' call.
+    """
+
+    def __init__(self):
+        self.ops = []
+        self._rows = []
+        self._callbacks = []
+
+    def insert(self, table: str, row: dict) -> dict:
+        """Queues an insert and returns the row, completed by the commit."""
+        _check_table(table)
+        row = dict(row)
+        row.setdefault('id', str(uuid.uuid4()))
+        self.ops.append({'op': 'insert', 'table': table, 'row': row})
+        self._rows.append(row)
+        return row
+
+    def update(self, table: str, row_id: str, values: dict, expect: dict = None):
+        """
+        Queues an update of some columns of one row, by id. With expect
+        (column -> value), the commit fails unless the row still has them.
+        """
+        _check_table(table)
+        op = {'op': 'update', 'table': table, 'id': row_id, 'values': dict(values)}
+        if expect:
+            op['expect'] = dict(expect)
+        self.ops.append(op)
+        self._rows.append(None)
+
+    def expect_count(self, table: str, column: str, value, count: int):
+        """Fails the commit unless exactly count rows of table have column = value."""
+        _check_table(table)
+        self.ops.append({'op': 'count', 'table': table, 'column': column, 'value': value, 'count': count})
+        self._rows.append(None)
+
+    def on_commit(self, callback):
+        """Runs callback() once the writes are committed, e.g. to update a cache."""
+        self._callbacks.append(callback)
+
+    # Same signatures as the backends' single-row writes
+
+    def create_key_set(self, n_shares: int, threshold: int, label: str = None) -> dict:
+        return self.insert('key_sets', {'n_shares': n_shares, 'threshold': threshold, 'label': label})
+
+    def create_file_record(self, original_filename: str, storage_path: str, nonce: str, auth_tag: str,
+                           key_set_id: str, layout: str = 'single', **fields) -> dict:
+        return self.insert('files', dict(
+            fields, original_filename=original_filename, storage_path=storage_path, nonce=nonce,
+            auth_tag=auth_tag, key_set_id=key_set_id, layout=layout
+        ))
+
+    def create_reconstruction_session(self, key_set_id: str, expires_at: str) -> dict:
+        return self.insert('reconstruction_sessions', {'key_set_id': key_set_id, 'expires_at': expires_at, 'status': 'ACTIVE'})
+
+    def insert_audit_log(self, data: dict) -> dict:
+        return self.insert('audit_logs', dict(data, details=data.get('details') or {}))
+
+    def update_key_set_shares(self, key_set_id: str, n_shares: int, threshold: int, share_generation: int = None):
+        values = {'n_shares': n_shares, 'threshold': threshold}
+        expect = None
+        if share_generation is not None:
+            # Only from the generation before, as in the backends' update_key_set_shares
+            values['share_generation'] = share_generation
+            expect = {'share_generation': share_generation - 1}
+        self.update('key_sets', key_set_id, values, expect=expect)
+
+    def update_file_wrapped_key(self, file_id: str, wrapped_key: str, wrap_nonce: str):
+        self.update('files', file_id, {'wrapped_key': wrapped_key, 'wrap_nonce': wrap_nonce})
+
+    def update_session_status(self, session_id: str, status: str):
+        self.update('reconstruction_sessions', session_id, {'status': status})
+
+    def commit(self):
+        """Applies every queued write atomically, then runs the on_commit callbacks."""
+        ops, rows, callbacks = self.ops, self._rows, self._callbacks
+        self.ops, self._rows, self._callbacks = [], [], []
+        if ops:
+            start = time.perf_counter()
+            try:
+                stored = self._flush(ops)
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.REGISTRY.observe('db.flush', elapsed)
+                trace = tracing.current()
+                if trace is not None:
+                    trace.record('db.flush', elapsed)
+            for row, result in zip(rows, stored or []):
+                if row is not None and result:
+                    row.update(result)
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        """Discards everything queued."""
+        self.ops, self._rows, self._callbacks = [], [], []
+
+    def _flush(self, ops: list) -> list:
+        """
+        Applies ops in one transaction.
+
+        Returns:
+            list: Per op, the stored row of an insert (None for other ops),
+                or None if the queued rows are already complete.
+
+        Raises:
+            WriteConflict: If a guard does not hold; nothing is applied.
+        """
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+def _check_table(table: str):
+    if table not in TABLES:
+        raise ValueError(f"{table} is not written through a unit of work")
@@ -1,42 +1,69 @@
 import json
 from datetime import datetime
 
+# Built once at import rather than on every call, since the filters run per log row
+_OPERATION_NAMES = {
+    'KEY_GENERATION': 'Key Generation',
+    'FILE_ENCRYPTED': 'File Encrypted',
+    'FILE_DEDUPLICATED': 'File Deduplicated',
+    'FILE_DECRYPTED': 'File Decrypted',
+    'KEY_RECONSTRUCTED': 'Key Reconstructed',
+    'KEY_RECONSTRUCTION_FAILED': 'Key Reconstruction Failed',
+    'KEY_RECONSTRUCTION_REUSED': 'Key Reconstruction Reused',
+    'KEY_RECONSTRUCTION': 'Key Reconstruction', # In case of slight variations
+    'KEY_ROTATED': 'Key Rotated',
+    'KEY_RESHARED': 'Key Re-shared',
+    'INTEGRITY_SCRUB': 'Integrity Scrub',
+    'AUDIT_EXPORTED': 'Audit Log Exported',
+    'AUDIT_COMPACTED': 'Audit Log Compacted',
+    'SHARE_GENERATION': 'Share Generation'
+}
+
+_OPERATION_COLORS = {
+    'KEY_GENERATION': 'success',
+    'FILE_ENCRYPTED': 'primary',
+    'FILE_DEDUPLICATED': 'primary',
+    'FILE_DECRYPTED': 'info',
+    'KEY_RECONSTRUCTED': 'warning',
+    'KEY_RECONSTRUCTION_FAILED': 'danger',
+    'KEY_RECONSTRUCTION_REUSED': 'warning',
+    'KEY_ROTATED': 'warning',
+    'KEY_RESHARED': 'secondary',
+    'INTEGRITY_SCRUB': 'dark',
+    'AUDIT_EXPORTED': 'dark',
+    'AUDIT_COMPACTED': 'dark',
+    'SHARE_GENERATION': 'secondary'
+}
+
+_OPERATION_ICONS = {
+    'KEY_GENERATION': 'fa-key',
+    'FILE_ENCRYPTED': 'fa-lock',
+    'FILE_DEDUPLICATED': 'fa-clone',
+    'FILE_DECRYPTED': 'fa-unlock',
+    'KEY_RECONSTRUCTED': 'fa-puzzle-piece',
+    'KEY_RECONSTRUCTION_FAILED': 'fa-exclamation-triangle',
+    'KEY_RECONSTRUCTION_REUSED': 'fa-puzzle-piece',
+    'KEY_ROTATED': 'fa-rotate',
+    'KEY_RESHARED': 'fa-share-nodes',
+    'INTEGRITY_SCRUB': 'fa-shield-halved',
+    'AUDIT_EXPORTED': 'fa-file-export',
+    'AUDIT_COMPACTED': 'fa-box-archive',
+    'SHARE_GENERATION': 'fa-share-alt'
+}
+
+_PRIORITY_KEYS = ['label', 'filename', 'original_filename']
+
 def format_operation(op_code):
     """Converts operation codes to human-readable text."""
-    mapping = {
-        'KEY_GENERATION': 'Key Generation',
-        'FILE_ENCRYPTED': 'File Encrypted',
-        'FILE_DECRYPTED': 'File Decrypted',
-        'KEY_RECONSTRUCTED': 'Key Reconstructed',
-        'KEY_RECONSTRUCTION_FAILED': 'Key Reconstruction Failed',
-        'KEY_RECONSTRUCTION': 'Key Reconstruction', # In case of slight variations
-        'SHARE_GENERATION': 'Share Generation'
-    }
-    return mapping.get(op_code, op_code.replace('_', ' ').title())
+    return _OPERATION_NAMES.get(op_code) or op_code.replace('_', ' ').title()
 
 def operation_color(op_code):
     """Maps operation codes to Bootstrap colors."""
-    colors = {
-        'KEY_GENERATION': 'success',
-        'FILE_ENCRYPTED': 'primary',
-        'FILE_DECRYPTED': 'info',
-        'KEY_RECONSTRUCTED': 'warning',
-        'KEY_RECONSTRUCTION_FAILED': 'danger',
-        'SHARE_GENERATION': 'secondary'
-    }
-    return colors.get(op_code, 'secondary')
+    return _OPERATION_COLORS.get(op_code, 'secondary')
 
 def operation_icon(op_code):
     """Maps operation codes to FontAwesome icons."""
-    icons = {
-        'KEY_GENERATION': 'fa-key',
-        'FILE_ENCRYPTED': 'fa-lock',
-        'FILE_DECRYPTED': 'fa-unlock',
-        'KEY_RECONSTRUCTED': 'fa-puzzle-piece',
-        'KEY_RECONSTRUCTION_FAILED': 'fa-exclamation-triangle',
-        'SHARE_GENERATION': 'fa-share-alt'
-    }
-    return icons.get(op_code, 'fa-circle-info')
+    return _OPERATION_ICONS.get(op_code, 'fa-circle-info')
 
 def format_details(details):
     """Formats the details dictionary into a readable string."""
@@ -62,8 +89,7 @@ def format_details(details):
 
             # Pre-sort to put Label/Filename first
             # Custom order: Label, Filename, Original Filename, then others
-            priority_keys = ['label', 'filename', 'original_filename']
-            sorted_keys = sorted(details.keys(), key=lambda k: priority_keys.index(k) if k in priority_keys else 99)
+            sorted_keys = sorted(details.keys(), key=lambda k: _PRIORITY_KEYS.index(k) if k in _PRIORITY_KEYS else 99)
 
             for k in sorted_keys:
                 if k in keys_to_hide:
@@ -0,0 +1,64 @@
+import os
+import gzip
+import json
+import hashlib
+import datetime
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault.models_sqlite import SQLiteModels
+from securevault.services import audit_retention
+from securevault.storage.local_backend import LocalStorage
+
+NOW = datetime.datetime(2025, 6, 15, tzinfo=datetime.timezone.utc)
+
+class TestAuditRetention(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db')})
+        self.env.start()
+        self.storage = LocalStorage(os.path.join(self.tmp.name, 'blobs'))
+        for month, count in (('2025-01', 3), ('2025-03', 2), ('2025-06', 4)):
+            for i in range(count):
+                SQLiteModels.insert_audit_log({
+                    'operation_type': 'FILE_ENCRYPTED' if i % 2 else 'KEY_GENERATION',
+                    'details': {'n': i},
+                    'timestamp': f"{month}-1{i}T08:00:00+00:00"
+                })
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_oldest_retained_month(self):
+        self.assertEqual(audit_retention.oldest_retained_month(1, NOW), '2025-06')
+        self.assertEqual(audit_retention.oldest_retained_month(6, NOW), '2025-01')
+        self.assertEqual(audit_retention.oldest_retained_month(7, NOW), '2024-12')
+        self.assertEqual(audit_retention.month_bounds('2024-12')[1], '2025-01-01T00:00:00+00:00')
+
+    def test_partitions(self):
+        self.assertEqual(SQLiteModels.list_audit_partitions(), [
+            {'month': '2025-01', 'row_count': 3}, {'month': '2025-03', 'row_count': 2}, {'month': '2025-06', 'row_count': 4}
+        ])
+
+    def test_compact_archives_then_drops_old_months(self):
+        report = audit_retention.compact(SQLiteModels, self.storage, retain_months=3, now=NOW, page_size=2)
+        self.assertEqual([a['month'] for a in report['archived']], ['2025-01', '2025-03'])
+        self.assertEqual(report['retained'], ['2025-06'])
+        self.assertEqual([p['month'] for p in SQLiteModels.list_audit_partitions()], ['2025-06'])
+
+        archive = SQLiteModels.list_audit_archives()[0]
+        self.assertEqual((archive['row_count'], archive['summary']), (3, {'KEY_GENERATION': 2, 'FILE_ENCRYPTED': 1}))
+        segment = self.storage.get(archive['storage_path'])
+        self.assertEqual(hashlib.sha256(segment).hexdigest(), archive['sha256'])
+        rows = [json.loads(line) for line in gzip.decompress(segment).splitlines()]
+        self.assertEqual([r['details']['n'] for r in rows], [0, 1, 2])
+
+        # Hourly counts survive compaction
+        self.assertEqual(sum(r['count'] for r in SQLiteModels.list_audit_rollups()), 9)
+
+        # Nothing left to do on a second run
+        self.assertEqual(audit_retention.compact(SQLiteModels, self.storage, 3, now=NOW)['archived'], [])
+
+if __name__ == '__main__':
+    unittest.main()
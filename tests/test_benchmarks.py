@@ -0,0 +1,26 @@
+import unittest
+from benchmarks import suite
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_measure_reports_per_call_statistics(self):
+        case = suite.Case('noop', lambda: (lambda: None), nbytes=1024)
+        result = suite.measure(case, repeats=3, min_time=0.001)
+        self.assertEqual(result['repeats'], 3)
+        self.assertGreater(result['loops'], 1)
+        self.assertGreater(result['mb_per_s'], 0)
+
+    def test_compare_flags_only_slowdowns_beyond_threshold(self):
+        baseline = {'results': {'a': {'median_s': 1.0}, 'b': {'median_s': 1.0}, 'c': {'median_s': 1.0}}}
+        current = {'results': {'a': {'median_s': 1.05}, 'b': {'median_s': 1.5}, 'c': {'median_s': 0.5},
+                               'new': {'median_s': 9.0}}}
+        regressions = suite.compare(current, baseline, threshold=0.10)
+        self.assertEqual([r[0] for r in regressions], ['b'])
+        self.assertAlmostEqual(regressions[0][3], 1.5)
+
+    def test_large_files_use_the_multipart_path(self):
+        names = [c.name for c in suite.all_cases(max_size=4 * suite.GB)]
+        self.assertIn('file.encrypt[bytes=4294967296]', names)
+        self.assertNotIn('file.encrypt[bytes=4294967296]', [c.name for c in suite.all_cases()])
+
+if __name__ == '__main__':
+    unittest.main()
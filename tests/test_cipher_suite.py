@@ -0,0 +1,75 @@
+import os
+import unittest
+from unittest.mock import patch
+from cryptography.exceptions import InvalidTag
+from securevault.services import cipher_suite, file_crypto, share_crypto, key_manager, sealed_file
+
+CHACHA = cipher_suite.CHACHA20_POLY1305
+
+class TestCipherSuite(unittest.TestCase):
+    def setUp(self):
+        cipher_suite._preferred = None
+
+    def tearDown(self):
+        cipher_suite._preferred = None
+
+    def test_preferred_is_pinned_or_benchmarked(self):
+        with patch.dict(os.environ, {'CIPHER_SUITE': 'chacha20-poly1305'}):
+            self.assertEqual(cipher_suite.preferred(), CHACHA)
+        cipher_suite._preferred = None
+        with patch.dict(os.environ, {'CIPHER_SUITE': 'auto'}), \
+                patch.object(cipher_suite, 'benchmark', return_value={'AES-256-GCM': 1.0, CHACHA: 3.0}):
+            self.assertEqual(cipher_suite.preferred(), CHACHA)
+        cipher_suite._preferred = None
+        with patch.dict(os.environ, {'CIPHER_SUITE': 'DES'}):
+            with self.assertRaises(ValueError):
+                cipher_suite.preferred()
+
+    def test_benchmark_reports_every_suite(self):
+        results = cipher_suite.benchmark(size=1024, rounds=1, calls=1)
+        self.assertEqual(set(results), set(cipher_suite.SUITES))
+
+    def test_file_follows_recorded_suite(self):
+        key = file_crypto.generate_data_key()
+        enc = file_crypto.encrypt_file(b'data', key, CHACHA)
+        self.assertEqual(enc['cipher_suite'], CHACHA)
+        self.assertEqual(file_crypto.decrypt_file(enc['ciphertext'], key, enc['nonce'], enc['auth_tag'], CHACHA), b'data')
+        with self.assertRaises(InvalidTag):
+            file_crypto.decrypt_file(enc['ciphertext'], key, enc['nonce'], enc['auth_tag'])
+
+        kek = file_crypto.generate_data_key()
+        record = dict(file_crypto.wrap_data_key(key, kek, CHACHA), cipher_suite=CHACHA)
+        self.assertEqual(file_crypto.resolve_file_key(record, kek), key)
+        # Rotation keeps the file's suite for the new wrap
+        new_kek = file_crypto.generate_data_key()
+        (_, wrap), = key_manager.rewrap_file_keys([dict(record, id='f')], kek, new_kek)
+        self.assertEqual(file_crypto.resolve_file_key(dict(wrap, cipher_suite=CHACHA), new_kek), key)
+
+    def test_shares_record_suite_and_legacy_shares_still_open(self):
+        with patch.dict(os.environ, {'CIPHER_SUITE': CHACHA}):
+            shares = key_manager.split_and_encrypt_key(b'k' * 32, 3, 2, ['pw'] * 3, key_set_id='ks')
+        self.assertEqual({s['cipher_suite'] for s in shares}, {CHACHA})
+        self.assertEqual(key_manager.recover_key(shares[:2], ['pw'] * 2, 'ks')[0], b'k' * 32)
+
+        legacy = share_crypto.encrypt_share('1-abcd', 'pw', key_set_id='ks')
+        del legacy['cipher_suite']
+        self.assertEqual(share_crypto.decrypt_share(legacy, 'pw'), '1-abcd')
+
+        with self.assertRaises(ValueError):
+            share_crypto.check_share_bindings([dict(shares[0], cipher_suite='ROT13')], 'ks')
+
+    def test_sealed_file_records_suite(self):
+        import io
+        kek = file_crypto.generate_data_key()
+        sealed = io.BytesIO()
+        with patch.dict(os.environ, {'CIPHER_SUITE': CHACHA}):
+            sealed_file.seal(io.BytesIO(b'x' * 100), sealed, kek, chunk_size=40)
+        self.assertIn(CHACHA.encode(), sealed.getvalue()[:300])
+        cipher_suite._preferred = None
+        out = io.BytesIO()
+        with patch.dict(os.environ, {'CIPHER_SUITE': 'AES-256-GCM'}):
+            sealed_file.unseal(io.BytesIO(sealed.getvalue()), out, kek)
+        self.assertEqual(out.getvalue(), b'x' * 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault import cli
+from securevault.services import sealed_file
+
+class TestSealedFile(unittest.TestCase):
+    def setUp(self):
+        self.key = os.urandom(32)
+        self.data = os.urandom(10_000)
+
+    def _seal(self, data, chunk_size=1024):
+        out = io.BytesIO()
+        sealed_file.seal(io.BytesIO(data), out, self.key, chunk_size)
+        return out.getvalue()
+
+    def test_roundtrip_including_empty_input(self):
+        for data in (self.data, b''):
+            out = io.BytesIO()
+            self.assertEqual(sealed_file.unseal(io.BytesIO(self._seal(data)), out, self.key), len(data))
+            self.assertEqual(out.getvalue(), data)
+
+    def test_truncation_and_wrong_key_fail(self):
+        sealed = self._seal(self.data)
+        # Cutting off the final part leaves a stream that ends on a non-final part
+        last_part = 4 + (len(self.data) % 1024) + 16
+        with self.assertRaises(Exception):
+            sealed_file.unseal(io.BytesIO(sealed[:-last_part]), io.BytesIO(), self.key)
+        with self.assertRaises(Exception):
+            sealed_file.unseal(io.BytesIO(sealed), io.BytesIO(), os.urandom(32))
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {'SECUREVAULT_PASSWORD': 'pw'})
+        self.env.start()
+        self.src = os.path.join(self.tmp.name, 'src')
+        os.makedirs(os.path.join(self.src, 'nested'))
+        self.files = {'a.txt': b'alpha', os.path.join('nested', 'b.bin'): os.urandom(50_000)}
+        for rel, data in self.files.items():
+            with open(os.path.join(self.src, rel), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _path(self, *parts):
+        return os.path.join(self.tmp.name, *parts)
+
+    def test_encrypt_then_decrypt_directory_tree(self):
+        self.assertEqual(cli.main(['encrypt', self.src, self._path('enc'), '-n', '3', '-k', '2', '-j', '2',
+                                   '--chunk-size', '4096']), 0)
+        bundle = json.load(open(self._path('enc', 'keyset.json')))
+        self.assertEqual(len(bundle['shares']), 3)
+        self.assertTrue(os.path.exists(self._path('enc', 'nested', 'b.bin.svlt')))
+
+        # Any K shares are enough
+        bundle['shares'] = bundle['shares'][1:]
+        with open(self._path('two.json'), 'w') as f:
+            json.dump(bundle, f)
+        self.assertEqual(cli.main(['decrypt', self._path('enc'), self._path('out'), '--shares', self._path('two.json'), '-j', '1']), 0)
+        for rel, data in self.files.items():
+            with open(self._path('out', rel), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_keygen_and_reconstruct_in_bulk(self):
+        self.assertEqual(cli.main(['keygen', '--count', '2', '-n', '3', '-k', '2', '--out', self._path('ks'), '-j', '2']), 0)
+        bundles = [self._path('ks', name) for name in os.listdir(self._path('ks'))]
+        self.assertEqual(len(bundles), 2)
+        self.assertEqual(cli.main(['reconstruct', *bundles, '--key-out', self._path('keys'), '-j', '2']), 0)
+        keys = os.listdir(self._path('keys'))
+        self.assertEqual(len(keys), 2)
+        self.assertEqual(os.stat(self._path('keys', keys[0])).st_mode & 0o777, 0o600)
+
+    def test_wrong_password_is_reported(self):
+        cli.main(['encrypt', self.src, self._path('enc'), '-n', '3', '-k', '2', '-j', '1'])
+        with patch.dict(os.environ, {'SECUREVAULT_PASSWORD': 'wrong'}):
+            self.assertEqual(cli.main(['decrypt', self._path('enc'), self._path('out'),
+                                       '--shares', self._path('enc', 'keyset.json')]), 2)
+        self.assertFalse(os.path.exists(self._path('out')))
+
+    def test_failed_encryption_leaves_no_partial_output(self):
+        def seal(src, dst, key, chunk_size):
+            dst.write(b'partial')
+            raise OSError("disk full")
+
+        dst = self._path('enc', 'a.txt.svlt')
+        with patch('securevault.cli.sealed_file.seal', side_effect=seal):
+            with self.assertRaises(OSError):
+                cli._encrypt_task(os.path.join(self.src, 'a.txt'), dst, 4096)
+        self.assertEqual(os.listdir(self._path('enc')), [])
+
+if __name__ == '__main__':
+    unittest.main()
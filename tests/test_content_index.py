@@ -0,0 +1,112 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault.models_sqlite import SQLiteModels
+from securevault.services import content_index
+from securevault.storage.local_backend import LocalStorage
+
+class TestFingerprints(unittest.TestCase):
+    def test_keyed_per_key_set(self):
+        kek = os.urandom(32)
+        key_a = content_index.fingerprint_key(kek, 'set-a')
+        self.assertEqual(key_a, content_index.fingerprint_key(kek, 'set-a'))
+        self.assertNotEqual(key_a, content_index.fingerprint_key(kek, 'set-b'))
+        self.assertNotEqual(key_a, content_index.fingerprint_key(os.urandom(32), 'set-a'))
+
+    def test_streaming_and_upfront_fingerprints_agree(self):
+        key = os.urandom(32)
+        data = os.urandom(3000)
+        stream = io.BytesIO(data)
+        self.assertEqual(content_index.fingerprint(stream, key, chunk_size=1000), content_index.fingerprint(io.BytesIO(data), key))
+        self.assertEqual(stream.tell(), 0)
+
+        reader = content_index.FingerprintingReader(io.BytesIO(data), key)
+        while reader.read(700):
+            pass
+        self.assertEqual(reader.hexdigest(), content_index.fingerprint(stream, key))
+
+class TestDuplicateUploads(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'METADATA_BACKEND': 'sqlite',
+            'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db'),
+        })
+        self.env.start()
+        self.storage = LocalStorage(os.path.join(self.tmp.name, 'blobs'))
+        self.patcher = patch('securevault.routes.get_storage', return_value=self.storage)
+        self.patcher.start()
+
+        import securevault
+        self.app = securevault.create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _new_key_set(self, content, name):
+        response = self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(content), name),
+            'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+        }, content_type='multipart/form-data')
+        export = json.loads(response.data)
+        self.key_set_id = export['key_set_id']
+        bundle = json.dumps({'key_set_id': self.key_set_id, 'shares': export['shares'][:2]}).encode()
+        self.client.post('/reconstruct-key', data={
+            'shares': [(io.BytesIO(bundle), 'shares.json')], 'password': 'pw'
+        }, content_type='multipart/form-data')
+
+    def _upload(self, content, name):
+        return self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(content), name), 'key_set_id': self.key_set_id
+        }, content_type='multipart/form-data')
+
+    def test_duplicates_reuse_the_stored_object(self):
+        content = os.urandom(2000)
+        self._new_key_set(content, 'a.txt')
+        original = SQLiteModels.list_files_for_keyset(self.key_set_id)[0]
+        self.assertIsNotNone(original['content_fingerprint'])
+
+        with patch.object(self.storage, 'put', wraps=self.storage.put) as put:
+            # Same name and content: nothing uploaded, no new row
+            self._upload(content, 'a.txt')
+            self.assertEqual(len(SQLiteModels.list_files_for_keyset(self.key_set_id)), 1)
+
+            # Same content under a new name: a row pointing at the same object
+            self._upload(content, 'copy.txt')
+            self.assertEqual(put.call_count, 0)
+
+            # New content is encrypted and uploaded as usual
+            self._upload(b'something else', 'b.txt')
+            self.assertEqual(put.call_count, 1)
+
+        files = {f['original_filename']: f for f in SQLiteModels.list_files_for_keyset(self.key_set_id)}
+        self.assertEqual(sorted(files), ['a.txt', 'b.txt', 'copy.txt'])
+        self.assertEqual(files['copy.txt']['storage_path'], original['storage_path'])
+        self.assertNotEqual(files['b.txt']['content_fingerprint'], original['content_fingerprint'])
+
+        response = self.client.post('/decrypt-file', data={'file_id': files['copy.txt']['id']})
+        self.assertEqual(response.data, content)
+        self.assertEqual(
+            [log['operation_type'] for log in SQLiteModels.list_audit_logs(10)].count('FILE_DEDUPLICATED'), 2
+        )
+
+    def test_same_name_different_content_are_separate_objects(self):
+        first, second = os.urandom(2000), os.urandom(2000)
+        self._new_key_set(first, 'report.txt')
+        self._upload(second, 'report.txt')
+
+        files = SQLiteModels.list_files_for_keyset(self.key_set_id)
+        self.assertEqual(len(files), 2)
+        self.assertNotEqual(files[0]['storage_path'], files[1]['storage_path'])
+        contents = [self.client.post('/decrypt-file', data={'file_id': f['id']}).data for f in files]
+        self.assertEqual(sorted(contents), sorted([first, second]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from itertools import combinations
+from unittest.mock import patch
+from securevault.models_sqlite import SQLiteModels
+from securevault.services import dispersal, integrity
+from securevault.services.sss_manager import InformationDispersal
+from securevault.storage.local_backend import LocalStorage
+from securevault.storage.router import FragmentRouter, fragment_path
+
+class TestInformationDispersal(unittest.TestCase):
+    def test_any_k_fragments_recover_the_data(self):
+        data = os.urandom(1001)
+        fragments = InformationDispersal.split(data, 5, 3)
+        self.assertEqual({len(f) for f in fragments}, {334})
+        for subset in combinations(range(5), 3):
+            recovered = InformationDispersal.combine({i: fragments[i] for i in subset}, 3)
+            self.assertEqual(recovered[:len(data)], data)
+
+    def test_too_few_fragments_or_bad_parameters(self):
+        fragments = InformationDispersal.split(b'secret', 4, 3)
+        with self.assertRaises(ValueError):
+            InformationDispersal.combine({0: fragments[0], 1: fragments[1]}, 3)
+        with self.assertRaises(ValueError):
+            InformationDispersal.split(b'secret', 2, 3)
+
+    def test_headers_reject_foreign_fragments(self):
+        ciphertext = os.urandom(100)
+        fragments = dispersal.encode(ciphertext, 4, 2)
+        self.assertEqual(dispersal.decode({1: fragments[1], 3: fragments[3]}, 4, 2), ciphertext)
+        # A fragment stored under the wrong index
+        with self.assertRaises(ValueError):
+            dispersal.decode({0: fragments[1], 3: fragments[3]}, 4, 2)
+        # A fragment of another file with different parameters
+        with self.assertRaises(ValueError):
+            dispersal.decode({0: dispersal.encode(ciphertext, 5, 2)[0], 3: fragments[3]}, 4, 2)
+
+class TestDispersedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.targets = [LocalStorage(os.path.join(self.tmp.name, f"target{i}")) for i in range(5)]
+        self.primary = LocalStorage(os.path.join(self.tmp.name, 'primary'))
+        self.storage = FragmentRouter(self.primary, self.targets)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fragments_land_on_separate_targets(self):
+        layout = dispersal.store(self.storage, 'encrypted/ks/f.enc', b'x' * 500, 5, 3)
+        self.assertEqual((layout['layout'], layout['part_count'], layout['fragment_threshold']), ('dispersed', 5, 3))
+        for i, target in enumerate(self.targets):
+            self.assertTrue(target.exists(fragment_path('encrypted/ks/f.enc', i)))
+            self.assertFalse(target.exists(fragment_path('encrypted/ks/f.enc', (i + 1) % 5)))
+        self.storage.put('encrypted/ks/other.enc', b'plain')
+        self.assertTrue(self.primary.exists('encrypted/ks/other.enc'))
+
+    def test_fetch_survives_n_minus_k_lost_targets(self):
+        ciphertext = os.urandom(4096)
+        record = dict(dispersal.store(self.storage, 'encrypted/ks/f.enc', ciphertext, 5, 3), storage_path='encrypted/ks/f.enc')
+        self.targets[0].delete(fragment_path('encrypted/ks/f.enc', 0))
+        self.targets[2].delete(fragment_path('encrypted/ks/f.enc', 2))
+        self.assertEqual(dispersal.fetch(self.storage, record), ciphertext)
+
+        self.targets[4].delete(fragment_path('encrypted/ks/f.enc', 4))
+        with self.assertRaises(ValueError):
+            dispersal.fetch(self.storage, record)
+
+    def test_fetch_replaces_fragments_that_fail_their_digest(self):
+        ciphertext = os.urandom(4096)
+        record = dict(dispersal.store(self.storage, 'encrypted/ks/f.enc', ciphertext, 5, 3), storage_path='encrypted/ks/f.enc')
+        self.assertEqual(len(record['fragment_digests']), 5)
+        # Bit rot in the payload keeps the header valid, so only the digest catches it
+        for i in (0, 1):
+            path = fragment_path('encrypted/ks/f.enc', i)
+            fragment = self.targets[i].get(path)
+            self.targets[i].put(path, fragment[:-1] + bytes([fragment[-1] ^ 1]))
+        self.assertEqual(dispersal.fetch(self.storage, record), ciphertext)
+
+        self.targets[2].delete(fragment_path('encrypted/ks/f.enc', 2))
+        with self.assertRaisesRegex(ValueError, 'digest mismatch'):
+            dispersal.fetch(self.storage, record)
+
+class TestDispersalRoutes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'METADATA_BACKEND': 'sqlite',
+            'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db'),
+        })
+        self.env.start()
+        self.targets = [LocalStorage(os.path.join(self.tmp.name, f"target{i}")) for i in range(3)]
+        self.storage = FragmentRouter(LocalStorage(os.path.join(self.tmp.name, 'blobs')), self.targets)
+        self.patcher = patch('securevault.routes.get_storage', return_value=self.storage)
+        self.patcher.start()
+
+        import securevault
+        self.app = securevault.create_app()
+        self.app.config.update(TESTING=True, DISPERSAL_N=3, DISPERSAL_K=2)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_roundtrip_with_a_lost_target(self):
+        content = os.urandom(2000)
+        response = self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(content), 'doc.txt'),
+            'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+        }, content_type='multipart/form-data')
+        export = json.loads(response.data)
+        record = SQLiteModels.list_files_for_keyset(export['key_set_id'])[0]
+        self.assertEqual((record['layout'], record['part_count'], record['fragment_threshold']), ('dispersed', 3, 2))
+        self.assertEqual(len(record['fragment_digests']), 3)
+        self.assertEqual(integrity.scrub(self.storage, SQLiteModels)['checked'], 1)
+
+        bundle = json.dumps({'key_set_id': export['key_set_id'], 'shares': export['shares'][:2]}).encode()
+        self.client.post('/reconstruct-key', data={
+            'shares': [(io.BytesIO(bundle), 'shares.json')], 'password': 'pw'
+        }, content_type='multipart/form-data')
+
+        self.targets[1].delete(fragment_path(record['storage_path'], 1))
+        response = self.client.post('/decrypt-file', data={'file_id': record['id']})
+        self.assertEqual(response.data, content)
+        # The scrubber still reports the lost fragment
+        self.assertEqual(integrity.scrub(self.storage, SQLiteModels)['missing'], [record['id']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -41,5 +41,41 @@ class TestFileCrypto(unittest.TestCase):
                 enc_result['auth_tag']
             )
 
+    def test_wrap_unwrap_data_key(self):
+        data_key = file_crypto.generate_data_key()
+        kek = os.urandom(32)
+        
+        wrapped = file_crypto.wrap_data_key(data_key, kek)
+        self.assertIn('wrapped_key', wrapped)
+        self.assertIn('wrap_nonce', wrapped)
+        
+        unwrapped = file_crypto.unwrap_data_key(wrapped['wrapped_key'], wrapped['wrap_nonce'], kek)
+        self.assertEqual(unwrapped, data_key)
+        
+        with self.assertRaises(Exception):
+            file_crypto.unwrap_data_key(wrapped['wrapped_key'], wrapped['wrap_nonce'], os.urandom(32))
+
+    def test_rewrap_keeps_ciphertext_decryptable(self):
+        from securevault.services import key_manager
+        old_kek = os.urandom(32)
+        new_kek = os.urandom(32)
+        
+        # One envelope-mode file and one legacy file encrypted directly with the KEK
+        data_key = file_crypto.generate_data_key()
+        envelope_enc = file_crypto.encrypt_file(b"envelope", data_key)
+        envelope_record = dict(id='f1', nonce=envelope_enc['nonce'], auth_tag=envelope_enc['auth_tag'],
+                               **file_crypto.wrap_data_key(data_key, old_kek))
+        legacy_enc = file_crypto.encrypt_file(b"legacy", old_kek)
+        legacy_record = dict(id='f2', nonce=legacy_enc['nonce'], auth_tag=legacy_enc['auth_tag'])
+        
+        updates = dict(key_manager.rewrap_file_keys([envelope_record, legacy_record], old_kek, new_kek))
+        envelope_record.update(updates['f1'])
+        legacy_record.update(updates['f2'])
+        
+        for record, enc, expected in ((envelope_record, envelope_enc, b"envelope"), (legacy_record, legacy_enc, b"legacy")):
+            key = file_crypto.resolve_file_key(record, new_kek)
+            plaintext = file_crypto.decrypt_file(enc['ciphertext'], key, record['nonce'], record['auth_tag'])
+            self.assertEqual(plaintext, expected)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault.models_sqlite import SQLiteModels
+from securevault.services import integrity, multipart_upload
+from securevault.metrics import Instrumented
+from securevault.storage.cache import CachedStorage, CiphertextCache
+from securevault.storage.local_backend import LocalStorage
+
+class TestMerkleRoot(unittest.TestCase):
+    def test_root_commits_to_content_and_order(self):
+        leaves = [integrity.sha256_hex(bytes([i]) * 10) for i in range(5)]
+        root = integrity.merkle_root(leaves)
+        self.assertEqual(root, integrity.merkle_root(list(leaves)))
+        self.assertNotEqual(root, integrity.merkle_root(leaves[::-1]))
+        self.assertNotEqual(root, integrity.merkle_root(leaves[:4]))
+        # A single part is not confused with the plain digest of that part
+        self.assertNotEqual(integrity.merkle_root(leaves[:1]), leaves[0])
+
+class TestScrubber(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db')})
+        self.env.start()
+        self.storage = LocalStorage(os.path.join(self.tmp.name, 'blobs'))
+        self.key_set = SQLiteModels.create_key_set(3, 2)
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _single(self, name, data, digest=True):
+        path = f"encrypted/ks/{name}"
+        self.storage.put(path, data)
+        return SQLiteModels.create_file_record(
+            name, path, 'n', 't', self.key_set['id'],
+            ciphertext_digest=integrity.sha256_hex(data) if digest else None
+        )
+
+    def test_detects_corrupt_and_missing_blobs(self):
+        good = self._single('good', b'A' * 1000)
+        bad = self._single('bad', b'B' * 1000)
+        gone = self._single('gone', b'C' * 1000)
+        self.storage.put(bad['storage_path'], b'B' * 999 + b'X')
+        self.storage.delete(gone['storage_path'])
+
+        report = integrity.scrub(self.storage, SQLiteModels, max_workers=2, page_size=2)
+        self.assertEqual(report['checked'], 1)
+        self.assertEqual(report['corrupt'], [bad['id']])
+        self.assertEqual(report['missing'], [gone['id']])
+        self.assertNotIn(good['id'], report['corrupt'] + report['missing'])
+
+    def test_cache_does_not_hide_corrupt_objects(self):
+        record = self._single('cached', b'A' * 1000)
+        cached = CachedStorage(self.storage, CiphertextCache(os.path.join(self.tmp.name, 'cache'), 1 << 20))
+        cached.get(record['storage_path'])
+        self.storage.put(record['storage_path'], b'A' * 999 + b'X')
+        self.assertEqual(cached.get(record['storage_path']), b'A' * 1000)
+
+        report = integrity.scrub(Instrumented(cached, 'storage'), SQLiteModels)
+        self.assertEqual(report['corrupt'], [record['id']])
+
+    def test_legacy_files_are_skipped_or_backfilled(self):
+        legacy = self._single('legacy', b'L' * 10, digest=False)
+        self.assertEqual(integrity.scrub(self.storage, SQLiteModels)['skipped'], 1)
+
+        report = integrity.scrub(self.storage, SQLiteModels, backfill=True)
+        self.assertEqual(report['backfilled'], 1)
+        self.assertEqual(SQLiteModels.get_file_record(legacy['id'])['ciphertext_digest'], integrity.sha256_hex(b'L' * 10))
+        self.assertEqual(integrity.scrub(self.storage, SQLiteModels)['checked'], 1)
+
+    def test_multipart_digest_recorded_at_upload(self):
+        upload = multipart_upload.MultipartUpload.start(
+            self.storage, os.path.join(self.tmp.name, 'staging'), 'encrypted/ks/big.enc', chunk_size=1024
+        )
+        layout = upload.encrypt_and_upload(io.BytesIO(os.urandom(5000)), os.urandom(32))
+        record = SQLiteModels.create_file_record(
+            'big', 'encrypted/ks/big.enc', layout['nonce'], '', self.key_set['id'],
+            layout='multipart', chunk_size=layout['chunk_size'], part_count=layout['part_count'],
+            ciphertext_digest=layout['ciphertext_digest']
+        )
+        self.assertEqual(integrity.compute_digest(self.storage, record), layout['ciphertext_digest'])
+
+        # Swapping two parts keeps every part valid but breaks the root
+        p1, p2 = multipart_upload.part_path('encrypted/ks/big.enc', 1), multipart_upload.part_path('encrypted/ks/big.enc', 2)
+        d1, d2 = self.storage.get(p1), self.storage.get(p2)
+        self.storage.put(p1, d2)
+        self.storage.put(p2, d1)
+        self.assertEqual(integrity.scrub(self.storage, SQLiteModels)['corrupt'], [record['id']])
+
+    def test_rate_limiter_paces_reads(self):
+        limiter = integrity.RateLimiter(bytes_per_sec=1000)
+        with patch('securevault.services.integrity.time.sleep') as sleep:
+            limiter.consume(1000)
+            limiter.consume(500)
+        self.assertTrue(sleep.called)
+        self.assertGreater(sleep.call_args[0][0], 0.4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault.models_sqlite import SQLiteModels
+from securevault.services import job_queue, file_crypto
+from test_multipart_upload import FlakyStorage
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'JOBS_DB_PATH': os.path.join(self.tmp.name, 'jobs.db'),
+            'JOBS_DIR': os.path.join(self.tmp.name, 'jobs')
+        })
+        self.env.start()
+
+        @job_queue.handler('test')
+        def _run(job):
+            job.progress(5, total=10, force=True)
+            if job.params.get('fail_times', 0) >= job.attempts:
+                raise IOError("transient")
+            return {'echo': job.secrets['value']}
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_runs_and_persists_result(self):
+        job = job_queue.submit('test', {}, secrets={'value': 'x'})
+        self.assertEqual(job['status'], job_queue.QUEUED)
+        self.assertTrue(job_queue.run_one())
+        self.assertFalse(job_queue.run_one())
+        job = job_queue.get(job['id'])
+        self.assertEqual((job['status'], job['result'], job['progress']), (job_queue.DONE, {'echo': 'x'}, 10))
+        # Secrets never reach the database
+        self.assertNotIn("'x'", json.dumps(job['params']))
+
+    def test_retries_then_fails(self):
+        retried = job_queue.submit('test', {'fail_times': 1}, secrets={'value': 'x'})
+        failed = job_queue.submit('test', {'fail_times': job_queue.MAX_ATTEMPTS}, secrets={'value': 'x'})
+        while job_queue.run_one():
+            pass
+        self.assertEqual(job_queue.get(retried['id'])['status'], job_queue.DONE)
+        self.assertEqual(job_queue.get(retried['id'])['attempts'], 2)
+        failed = job_queue.get(failed['id'])
+        self.assertEqual((failed['status'], failed['attempts'], failed['error']), (job_queue.FAILED, job_queue.MAX_ATTEMPTS, 'transient'))
+        self.assertIsNone(job_queue.secrets(failed['id']))
+
+    def test_jobs_of_exited_processes_fail(self):
+        job = job_queue.submit('test', {}, secrets={'value': 'x'})
+        job_queue.get_connection().execute("UPDATE jobs SET owner = ? WHERE id = ?", (f"{job['owner'].rsplit(':', 1)[0]}:999999999", job['id']))
+        self.assertEqual(job_queue.fail_orphans(), 1)
+        self.assertEqual(job_queue.get(job['id'])['status'], job_queue.FAILED)
+
+    def test_chunk_reader(self):
+        reader = job_queue.ChunkReader([b'abc', b'', b'defg', b'h'])
+        self.assertEqual([reader.read(3), reader.read(3), reader.read(3), reader.read(3)], [b'abc', b'def', b'gh', b''])
+
+class TestBackgroundRoutes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'METADATA_BACKEND': 'sqlite',
+            'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db'),
+            'JOBS_DB_PATH': os.path.join(self.tmp.name, 'jobs.db'),
+            'JOBS_DIR': os.path.join(self.tmp.name, 'jobs')
+        })
+        self.env.start()
+        self.storage = FlakyStorage(os.path.join(self.tmp.name, 'blobs'), {})
+        self.patcher = patch('securevault.routes.get_storage', return_value=self.storage)
+        self.patcher.start()
+
+        import securevault
+        self.app = securevault.create_app()
+        # No worker threads: the tests run each job themselves
+        self.app.config.update(
+            TESTING=True, JOB_WORKERS=0, MULTIPART_THRESHOLD=1024, MULTIPART_CHUNK_SIZE=1000,
+            UPLOAD_STAGING_DIR=os.path.join(self.tmp.name, 'staging')
+        )
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _run_jobs(self):
+        with self.app.app_context():
+            while job_queue.run_one():
+                pass
+
+    def _status(self, location):
+        return json.loads(self.client.get(location + '/status').data)
+
+    def test_encrypt_and_decrypt_as_resumable_jobs(self):
+        content = os.urandom(5000)
+        # The fifth part fails past the upload's own retries, so the first attempt fails
+        self.storage.failures['000004'] = 4
+        response = self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(content), 'big.bin'), 'background': '1',
+            'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        job_url = response.headers['Location']
+
+        with patch.object(file_crypto, 'encrypt_part', wraps=file_crypto.encrypt_part) as encrypt_part:
+            self._run_jobs()
+        status = self._status(job_url)
+        self.assertEqual((status['status'], status['attempts']), ('done', 2))
+        # The retry uploaded the staged parts without encrypting again
+        self.assertEqual(encrypt_part.call_count, 5)
+        self.assertEqual(status['progress'], status['total'])
+        # Nothing the download needs is left in this process, so any worker can serve it
+        self.assertNotIn(status['id'], job_queue._SECRETS)
+
+        export = json.loads(self.client.get(status['result_url']).data)
+        self.assertIsNone(self._status(job_url)['result_url'])
+        bundle = json.dumps({'key_set_id': export['key_set_id'], 'shares': export['shares'][:2]}).encode()
+        self.client.post('/reconstruct-key', data={
+            'shares': [(io.BytesIO(bundle), 'shares.json')], 'password': 'pw'
+        }, content_type='multipart/form-data')
+
+        file_id = SQLiteModels.list_files_for_keyset(export['key_set_id'])[0]['id']
+        response = self.client.post('/decrypt-file', data={'file_id': file_id, 'background': '1'})
+        job_url = response.headers['Location']
+        self._run_jobs()
+        status = self._status(job_url)
+        self.assertEqual(status['result']['size'], len(content))
+        self.assertNotIn(status['id'], job_queue._SECRETS)
+
+        # The staged result is sealed; the plaintext only exists in the download
+        with open(job_queue.result_path(status['id']), 'rb') as f:
+            self.assertNotIn(content[:64], f.read())
+        self.assertEqual(self.client.get(status['result_url']).data, content)
+        self.assertEqual(self.client.get(status['result_url']).status_code, 302)
+
+    def test_shares_are_persisted_before_the_key_set_is_committed(self):
+        response = self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(b'payload'), 'a.txt'), 'background': '1',
+            'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+        }, content_type='multipart/form-data')
+        job = job_queue.get(response.headers['Location'].rsplit('/', 1)[1])
+        key_set_id = job['payload']['key_set_id']
+        self.assertEqual(len(job['payload']['shares']), 3)
+        self.assertIsNone(SQLiteModels.get_key_set(key_set_id))
+
+        self._run_jobs()
+        self.assertIsNotNone(SQLiteModels.get_key_set(key_set_id))
+        self.assertEqual(json.loads(self.client.get(f"/jobs/{job['id']}/result").data)['shares'], job['payload']['shares'])
+        self.assertIsNone(job_queue.get(job['id'])['payload'])
+
+        # Finished jobs nobody collects are deleted with their results
+        self.assertEqual(job_queue.prune(max_age=0), 1)
+        self.assertIsNone(job_queue.get(job['id']))
+
+    def test_jobs_are_private_to_their_session(self):
+        response = self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(b'payload'), 'a.txt'), 'background': '1',
+            'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+        }, content_type='multipart/form-data')
+        job_url = response.headers['Location']
+        self.assertEqual(self.client.get(job_url).status_code, 200)
+        self.assertEqual(self.app.test_client().get(job_url + '/status').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
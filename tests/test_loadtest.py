@@ -0,0 +1,100 @@
+import os
+import argparse
+import unittest
+from unittest.mock import patch
+import securevault.storage as storage_module
+import securevault.supabase_client as supabase_client
+from benchmarks import loadtest
+from benchmarks.fake_supabase import FakeSupabase, InjectedFailure, install
+
+class TestFakeSupabase(unittest.TestCase):
+    def setUp(self):
+        self.env = patch.dict(os.environ, {})
+        self.env.start()
+        self.saved = (supabase_client._supabase, storage_module._storage)
+        self.fake = FakeSupabase()
+        install(self.fake)
+
+    def tearDown(self):
+        supabase_client._supabase, storage_module._storage = self.saved
+        self.env.stop()
+
+    def test_supabase_models_and_storage_run_against_stand_in(self):
+        from securevault.models_supabase import SupabaseModels
+        key_set = SupabaseModels.create_key_set(3, 2, 'x')
+        SupabaseModels.create_file_record('a', 'encrypted/a.enc', 'n', 't', key_set['id'])
+        SupabaseModels.create_file_record('b', 'encrypted/b.enc', 'n', 't', key_set['id'])
+        self.assertEqual(len(SupabaseModels.list_files_for_keyset(key_set['id'])), 2)
+        self.assertEqual(len(SupabaseModels.list_files(limit=1)), 1)
+
+        SupabaseModels.update_key_set_shares(key_set['id'], 5, 3)
+        self.assertEqual(SupabaseModels.get_key_set(key_set['id'])['threshold'], 3)
+
+        storage = storage_module.get_storage()
+        storage.put('encrypted/a.enc', b'cipher')
+        self.assertEqual(storage.get('encrypted/a.enc'), b'cipher')
+        self.assertTrue(storage.exists('encrypted/a.enc'))
+
+    def test_unit_of_work_and_audit_partitions(self):
+        from securevault.models_supabase import SupabaseModels
+        with SupabaseModels.unit_of_work() as uow:
+            key_set = uow.create_key_set(3, 2)
+            record = uow.create_file_record('a', 'encrypted/a.enc', 'n', 't', key_set['id'])
+            uow.update_key_set_shares(key_set['id'], 5, 3, share_generation=1)
+            uow.insert_audit_log({'operation_type': 'FILE_ENCRYPTED'})
+        stored = SupabaseModels.get_key_set(key_set['id'])
+        self.assertEqual((stored['n_shares'], stored['share_generation']), (5, 1))
+        self.assertEqual(record['layout'], 'single')
+        self.assertIn('created_at', record)
+
+        # A rejected batch writes nothing
+        with self.assertRaises(ValueError):
+            self.fake.rpc('apply_writes', {'ops': [
+                {'op': 'insert', 'table': 'key_sets', 'row': {'n_shares': 3, 'threshold': 2}},
+                {'op': 'insert', 'table': 'audit_archives', 'row': {}},
+            ]}).execute()
+        self.assertEqual(len(SupabaseModels.list_key_sets()), 1)
+
+        # So does one whose guard fails
+        from securevault.unit_of_work import WriteConflict
+        with self.assertRaises(WriteConflict):
+            with SupabaseModels.unit_of_work() as uow:
+                uow.insert_audit_log({'operation_type': 'KEY_ROTATED'})
+                uow.update_key_set_shares(key_set['id'], 3, 2, share_generation=1)
+        self.assertEqual(SupabaseModels.get_key_set(key_set['id'])['n_shares'], 5)
+        self.assertEqual(len(self.fake.tables['audit_logs']), 1)
+
+        self.fake.rpc('ensure_audit_partitions').execute()
+        partitions = self.fake.rpc('list_audit_partitions').execute().data
+        self.assertEqual([p['row_count'] for p in partitions], [1])
+        self.fake.rpc('drop_audit_partition', {'month': partitions[0]['month']}).execute()
+        self.assertEqual(self.fake.rpc('list_audit_partitions').execute().data, [])
+
+    def test_user_flow_succeeds_end_to_end(self):
+        from securevault import create_app
+        app = create_app()
+        app.config['SECRET_KEY'] = 'load-test'
+        samples = []
+        args = argparse.Namespace(shares=3, threshold=2, file_size=4096)
+        loadtest._user_flow(app.test_client(), self.fake, args, lambda *sample: samples.append(sample))
+        self.assertEqual([(endpoint, ok) for endpoint, _, ok in samples],
+                         [(endpoint, True) for endpoint in loadtest.ENDPOINTS])
+
+    def test_error_injection(self):
+        self.fake.table_faults.error_rate = 1.0
+        from securevault.models_supabase import SupabaseModels
+        with self.assertRaises(InjectedFailure):
+            SupabaseModels.list_key_sets()
+
+class TestLoadTestReport(unittest.TestCase):
+    def test_summary_percentiles(self):
+        samples = [('/logs', i / 1000, i != 100) for i in range(1, 101)]
+        report = loadtest.summarize(samples, duration=10)
+        self.assertEqual(report['rps'], 10)
+        self.assertEqual(report['errors'], 1)
+        stats = report['endpoints']['/logs']
+        self.assertAlmostEqual(stats['p50_ms'], 50)
+        self.assertAlmostEqual(stats['p99_ms'], 99)
+
+if __name__ == '__main__':
+    unittest.main()
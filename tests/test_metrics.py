@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import unittest
+import subprocess
+import multiprocessing
+from unittest.mock import patch
+from securevault import metrics
+
+def _idle_worker(ready, done):
+    # Observes a burst, then stays alive and idle like a gunicorn worker
+    metrics.FLUSH_INTERVAL = 0.2
+    for _ in range(5):
+        metrics.REGISTRY.observe('unit.burst', 0.01)
+    ready.set()
+    done.wait(10)
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.clear()
+
+    def test_decorator_and_context_manager(self):
+        @metrics.timed('unit.decorated')
+        def work(x):
+            return x * 2
+
+        self.assertEqual(work(21), 42)
+        with metrics.timed('unit.block'):
+            pass
+        histograms = metrics.REGISTRY.snapshot()
+        self.assertEqual(sum(histograms['unit.decorated'][:-1]), 1)
+        self.assertEqual(sum(histograms['unit.block'][:-1]), 1)
+
+    def test_quantiles_from_buckets(self):
+        for _ in range(98):
+            metrics.REGISTRY.observe('unit.q', 0.002)
+        for _ in range(2):
+            metrics.REGISTRY.observe('unit.q', 3.0)
+        hist = metrics.REGISTRY.snapshot()['unit.q']
+        self.assertTrue(0.001 < metrics.quantile(hist, 0.5) <= 0.0025)
+        self.assertTrue(2.5 < metrics.quantile(hist, 0.99) <= 5.0)
+
+    def test_instrumented_proxy_times_methods(self):
+        class Backend:
+            label = 'x'
+
+            @staticmethod
+            def fetch(v):
+                return v
+
+        proxy = metrics.Instrumented(Backend, 'db')
+        self.assertEqual(proxy.fetch(1), 1)
+        self.assertEqual(proxy.label, 'x')
+        self.assertIn('db.fetch', metrics.REGISTRY.snapshot())
+
+    def test_workers_are_summed_through_metrics_dir(self):
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {'METRICS_DIR': tmp}):
+            # Another worker's snapshot
+            other = [0] * (len(metrics.BUCKETS) + 1) + [0.5]
+            other[3] = 5
+            with open(os.path.join(tmp, '999-abc.json'), 'w') as f:
+                json.dump({'derive_key': other}, f)
+
+            metrics.REGISTRY.observe('derive_key', 0.004)
+            hist = metrics.REGISTRY.snapshot()['derive_key']
+            self.assertEqual(sum(hist[:-1]), 6)
+
+            text = metrics.render_prometheus(metrics.REGISTRY.snapshot())
+            self.assertIn('securevault_stage_duration_seconds_count{stage="derive_key"} 6', text)
+            self.assertIn('le="+Inf"} 6', text)
+
+    def test_idle_and_exited_workers_reach_metrics_dir(self):
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {'METRICS_DIR': tmp}):
+            context = multiprocessing.get_context('fork')
+            ready, done = context.Event(), context.Event()
+            worker = context.Process(target=_idle_worker, args=(ready, done))
+            worker.start()
+            try:
+                self.assertTrue(ready.wait(10))
+                time.sleep(0.6)
+                self.assertEqual(sum(metrics.REGISTRY.snapshot()['unit.burst'][:-1]), 5)
+            finally:
+                done.set()
+                worker.join()
+
+            code = "from securevault import metrics\nfor _ in range(3): metrics.REGISTRY.observe('unit.exit', 0.01)"
+            subprocess.run([sys.executable, '-c', code], check=True, env=os.environ)
+            self.assertEqual(sum(metrics.REGISTRY.snapshot()['unit.exit'][:-1]), 3)
+
+    def test_forked_worker_starts_empty(self):
+        metrics.REGISTRY.observe('unit.fork', 0.01)
+        with patch('securevault.metrics.os.getpid', return_value=os.getpid() + 1):
+            metrics.REGISTRY.observe('unit.other', 0.01)
+            self.assertNotIn('unit.fork', metrics.REGISTRY.snapshot())
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        import securevault
+        metrics.REGISTRY.clear()
+        self.app = securevault.create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+    def test_stage_and_request_histograms_exposed(self):
+        from securevault.services import security_utils
+        security_utils.derive_key('pw', os.urandom(16), iterations=1000)
+        self.client.get('/metrics')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn('stage="derive_key"', body)
+        self.assertIn('stage="http.main.metrics_endpoint"', body)
+
+        summary = self.client.get('/metrics?format=json').get_json()
+        self.assertEqual(summary['derive_key']['count'], 1)
+        self.assertIn('p99', summary['derive_key'])
+
+if __name__ == '__main__':
+    unittest.main()
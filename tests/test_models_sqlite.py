@@ -0,0 +1,271 @@
+import io
+import os
+import json
+import datetime
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from securevault.models_sqlite import SQLiteModels, get_connection
+
+class TestSQLiteModels(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db')})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_key_sets_and_files(self):
+        key_set = SQLiteModels.create_key_set(5, 3, 'label')
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['threshold'], 3)
+
+        SQLiteModels.update_key_set_shares(key_set['id'], 7, 4)
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['n_shares'], 7)
+
+        # A new split only lands on the generation it was made from
+        self.assertTrue(SQLiteModels.update_key_set_shares(key_set['id'], 4, 2, share_generation=1))
+        self.assertFalse(SQLiteModels.update_key_set_shares(key_set['id'], 6, 3, share_generation=1))
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 1)
+
+        record = SQLiteModels.create_file_record('a.txt', 'encrypted/a.enc', 'n', 't', key_set['id'], 'wk', 'wn')
+        self.assertEqual(SQLiteModels.get_file_record(record['id'])['wrapped_key'], 'wk')
+        self.assertEqual([f['id'] for f in SQLiteModels.list_files_for_keyset(key_set['id'])], [record['id']])
+        self.assertIsNone(SQLiteModels.get_file_record('missing'))
+
+    def test_sessions_and_audit_logs(self):
+        key_set = SQLiteModels.create_key_set(3, 2)
+        sess = SQLiteModels.create_reconstruction_session(key_set['id'], '2030-01-01T00:00:00')
+        self.assertEqual(SQLiteModels.get_active_session(key_set['id'])['id'], sess['id'])
+        SQLiteModels.update_session_status(sess['id'], 'USED')
+        self.assertIsNone(SQLiteModels.get_active_session(key_set['id']))
+
+        SQLiteModels.create_reconstruction_session(key_set['id'], '2020-01-01T00:00:00')
+        live = SQLiteModels.create_reconstruction_session(key_set['id'], '2030-01-01T00:00:00')
+        self.assertEqual(SQLiteModels.expire_stale_sessions('2025-01-01T00:00:00'), 1)
+        self.assertEqual(SQLiteModels.get_active_session(key_set['id'])['id'], live['id'])
+
+        SQLiteModels.insert_audit_log({'operation_type': 'KEY_GENERATION', 'details': {'label': 'x'}, 'ip': '1.2.3.4'})
+        logs = SQLiteModels.list_audit_logs(10)
+        self.assertEqual(logs[0]['details'], {'label': 'x'})
+
+    def test_audit_rollups(self):
+        SQLiteModels.insert_audit_log({'operation_type': 'KEY_GENERATION', 'timestamp': '2025-01-01T10:05:00+00:00'})
+        SQLiteModels.insert_audit_log({'operation_type': 'KEY_GENERATION', 'timestamp': '2025-01-01T10:55:00+00:00'})
+        SQLiteModels.insert_audit_log({'operation_type': 'FILE_ENCRYPTED', 'timestamp': '2025-01-01T11:00:00+00:00'})
+        rollups = SQLiteModels.list_audit_rollups('2025-01-01T10:00:00+00:00')
+        self.assertEqual(
+            [(r['hour'], r['operation_type'], r['count']) for r in rollups],
+            [('2025-01-01T10:00:00+00:00', 'KEY_GENERATION', 2), ('2025-01-01T11:00:00+00:00', 'FILE_ENCRYPTED', 1)]
+        )
+        self.assertEqual(len(SQLiteModels.list_audit_rollups('2025-01-01T11:00:00+00:00')), 1)
+
+        # A database from before the rollup table is backfilled on first connect
+        conn = get_connection()
+        conn.execute("DELETE FROM audit_rollups")
+        from securevault.models_sqlite import _backfill_rollups
+        _backfill_rollups(conn)
+        self.assertEqual(sum(r['count'] for r in SQLiteModels.list_audit_rollups()), 3)
+
+    def test_wal_mode_and_indexes(self):
+        conn = get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM files WHERE key_set_id = ?", ('x',)
+        ).fetchall()
+        self.assertIn('idx_files_key_set_id', ' '.join(str(tuple(r)) for r in plan))
+
+class TestRoutesOnSQLite(unittest.TestCase):
+    """Drives the real routes against SQLite and local storage, with no mocks."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'METADATA_BACKEND': 'sqlite',
+            'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db'),
+        })
+        self.env.start()
+        from securevault.storage.local_backend import LocalStorage
+        self.storage = patch('securevault.routes.get_storage', return_value=LocalStorage(os.path.join(self.tmp.name, 'blobs')))
+        self.storage.start()
+
+        import securevault
+        self.app = securevault.create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['UPLOAD_STAGING_DIR'] = os.path.join(self.tmp.name, 'staging')
+        self.client = self.app.test_client()
+        from securevault.services import audit_logger
+        audit_logger.log_cache.clear()
+
+    def tearDown(self):
+        self.storage.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_encrypt_reconstruct_decrypt(self):
+        self._roundtrip(b'top secret')
+
+    def test_multipart_encrypt_reconstruct_decrypt(self):
+        self.app.config['MULTIPART_THRESHOLD'] = 1024
+        self.app.config['MULTIPART_CHUNK_SIZE'] = 1000
+        self._roundtrip(os.urandom(5000))
+
+    def test_streamed_decrypt_is_logged_once_every_part_authenticates(self):
+        from securevault.services import multipart_upload
+        self.app.config['MULTIPART_THRESHOLD'] = 1024
+        self.app.config['MULTIPART_CHUNK_SIZE'] = 1000
+        self._roundtrip(os.urandom(5000))
+        decrypted = [r for r in SQLiteModels.list_audit_logs(50) if r['operation_type'] == 'FILE_DECRYPTED']
+        self.assertEqual(len(decrypted), 1)
+
+        record = SQLiteModels.list_files()[0]
+        storage = self.storage.kwargs['return_value']
+        last = multipart_upload.part_path(record['storage_path'], record['part_count'] - 1)
+        storage.put(last, b'\x00' + storage.get(last)[1:])
+        response = self.client.post('/decrypt-file', data={'file_id': record['id']}, buffered=False)
+        with self.assertRaises(Exception):
+            b''.join(response.response)
+        decrypted = [r for r in SQLiteModels.list_audit_logs(50) if r['operation_type'] == 'FILE_DECRYPTED']
+        self.assertEqual(len(decrypted), 1)
+
+    def test_chacha20_files_record_their_suite(self):
+        from securevault.services import cipher_suite
+        self.app.config['MULTIPART_THRESHOLD'] = 1024
+        self.app.config['MULTIPART_CHUNK_SIZE'] = 1000
+        with patch.object(cipher_suite, '_preferred', cipher_suite.CHACHA20_POLY1305):
+            self._roundtrip(b'small file')
+            self._roundtrip(os.urandom(3000))
+        suites = {r['cipher_suite'] for r in SQLiteModels.list_files()}
+        self.assertEqual(suites, {cipher_suite.CHACHA20_POLY1305})
+
+    def test_rotation_from_a_stale_session_is_refused(self):
+        self._roundtrip(b'top secret')
+        key_set = SQLiteModels.list_key_sets()[0]
+        wrapped_key = SQLiteModels.list_files()[0]['wrapped_key']
+        # Re-shared by another worker after this session was reconstructed
+        self.assertTrue(SQLiteModels.update_key_set_shares(key_set['id'], 3, 2, share_generation=1))
+
+        response = self.client.post('/rotate-key', data={'password': 'pw'})
+        self.assertIn('reconstruct-key', response.headers['Location'])
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 1)
+        self.assertEqual(SQLiteModels.list_files()[0]['wrapped_key'], wrapped_key)
+
+    def test_rotation_racing_a_reshare_changes_nothing(self):
+        from securevault.services import key_manager
+        self._roundtrip(b'top secret')
+        key_set = SQLiteModels.list_key_sets()[0]
+        wrapped_key = SQLiteModels.list_files()[0]['wrapped_key']
+
+        def reshared_meanwhile(*args):
+            SQLiteModels.update_key_set_shares(key_set['id'], 3, 2, share_generation=1)
+            return rewrap(*args)
+
+        rewrap = key_manager.rewrap_file_keys
+        with patch('securevault.routes.key_manager.rewrap_file_keys', side_effect=reshared_meanwhile):
+            response = self.client.post('/rotate-key', data={'password': 'pw'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 1)
+        self.assertEqual(SQLiteModels.list_files()[0]['wrapped_key'], wrapped_key)
+
+    def test_rotation_fails_if_a_file_is_added_meanwhile(self):
+        from securevault.services import key_manager
+        self._roundtrip(b'top secret')
+        key_set = SQLiteModels.list_key_sets()[0]
+        first = SQLiteModels.list_files()[0]
+
+        def added_meanwhile(*args):
+            SQLiteModels.create_file_record('late.txt', 'encrypted/late.enc', 'n', 't', key_set['id'],
+                                            wrapped_key=first['wrapped_key'], wrap_nonce=first['wrap_nonce'])
+            return rewrap(*args)
+
+        rewrap = key_manager.rewrap_file_keys
+        with patch('securevault.routes.key_manager.rewrap_file_keys', side_effect=added_meanwhile):
+            self.client.post('/rotate-key', data={'password': 'pw'})
+        # Not rotated, so the late file's key is still wrapped under the current KEK
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 0)
+        self.assertEqual({f['wrapped_key'] for f in SQLiteModels.list_files()}, {first['wrapped_key']})
+
+        response = self.client.post('/rotate-key', data={'password': 'pw'})
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 1)
+        self.assertNotIn(first['wrapped_key'], {f['wrapped_key'] for f in SQLiteModels.list_files()})
+
+    def test_logs_page_and_stats(self):
+        from securevault.services import audit_logger
+        with self.app.test_request_context():
+            audit_logger.AuditLogger.log('KEY_GENERATION', details={'label': 'cached-row'})
+        response = self.client.get('/logs')
+        self.assertIn(b'cached-row', response.data)
+
+        # Rows written by another worker go straight to the database and are
+        # fetched as the delta on the next view
+        SQLiteModels.insert_audit_log({'operation_type': 'FILE_DECRYPTED', 'details': {'filename': 'other-worker.txt'}})
+        response = self.client.get('/logs')
+        self.assertIn(b'other-worker.txt', response.data)
+        self.assertIn(b'cached-row', response.data)
+        self.assertLess(response.data.index(b'other-worker.txt'), response.data.index(b'cached-row'))
+
+        stats = json.loads(self.client.get('/logs/stats?hours=2').data)
+        self.assertEqual(stats['totals'], {'KEY_GENERATION': 1, 'FILE_DECRYPTED': 1})
+
+    def test_log_cache_fetches_without_the_lock(self):
+        from securevault.services import audit_logger
+        cache = audit_logger.AuditLogCache(size=10)
+        slow_started, release = threading.Event(), threading.Event()
+
+        def slow_fetch(limit, since):
+            slow_started.set()
+            release.wait(5)
+            return [{'id': 'archived', 'timestamp': '2025-01-01T00:00:00+00:00'}]
+
+        pages = []
+        slow = threading.Thread(target=lambda: pages.append(cache.rows(slow_fetch, lambda log: log['id'])))
+        slow.start()
+        self.assertTrue(slow_started.wait(5))
+        # Another page view is served while the slow query is still running
+        fresh = [{'id': 'fresh', 'timestamp': '2025-01-02T00:00:00+00:00'}]
+        self.assertEqual(cache.rows(lambda limit, since: fresh, lambda log: log['id']), ['fresh'])
+
+        # Rows deleted meanwhile: the slow fetch must not put them back
+        cache.clear()
+        release.set()
+        slow.join()
+        self.assertEqual(cache.rows(lambda limit, since: [], lambda log: log['id']), [])
+
+    def test_log_cache_drops_rows_compacted_by_another_process(self):
+        from securevault.services import audit_logger
+        cache = audit_logger.AuditLogCache(size=10)
+        table = [{'id': 'old', 'operation_type': 'KEY_GENERATION', 'timestamp': '2024-01-01T00:00:00+00:00'}]
+
+        def fetch(limit, since):
+            return [log for log in table if since is None or log['timestamp'] >= since]
+
+        self.assertEqual(cache.rows(fetch, lambda log: log['id']), ['old'])
+        # The CLI archives and deletes the old row, then logs the compaction
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        table[:] = [{'id': 'compacted', 'operation_type': audit_logger.COMPACTED, 'timestamp': now}]
+        self.assertEqual(cache.rows(fetch, lambda log: log['id']), ['compacted'])
+        self.assertEqual(cache.rows(fetch, lambda log: log['id']), ['compacted'])
+
+    def _roundtrip(self, content):
+        response = self.client.post('/encrypt-file', data={
+            'file': (io.BytesIO(content), 'doc.txt'),
+            'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        export = json.loads(response.data)
+
+        bundle = json.dumps({'key_set_id': export['key_set_id'], 'shares': export['shares'][:2]}).encode()
+        response = self.client.post('/reconstruct-key', data={
+            'shares': [(io.BytesIO(bundle), 'shares.json')], 'password': 'pw'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+
+        file_id = SQLiteModels.list_files_for_keyset(export['key_set_id'])[0]['id']
+        response = self.client.post('/decrypt-file', data={'file_id': file_id})
+        self.assertEqual(response.data, content)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from securevault.services import multipart_upload
+from securevault.storage.local_backend import LocalStorage
+
+class FlakyStorage(LocalStorage):
+    """Local storage whose put() fails for selected parts."""
+
+    def __init__(self, root, failures):
+        super().__init__(root)
+        self.failures = failures  # part suffix -> remaining failures (-1 = forever)
+
+    def put(self, path, data):
+        suffix = path.rsplit('/', 1)[-1]
+        remaining = self.failures.get(suffix, 0)
+        if remaining:
+            self.failures[suffix] = remaining - 1
+            raise IOError("transient failure")
+        super().put(path, data)
+
+class TestMultipartUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.staging = os.path.join(self.tmp.name, 'staging')
+        self.key = os.urandom(32)
+        self.data = os.urandom(10 * 1024 + 123)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _download(self, storage, layout):
+        return b"".join(multipart_upload.download_and_decrypt(
+            storage, "encrypted/ks/big.enc", self.key, layout['nonce'], layout['part_count'], max_workers=3
+        ))
+
+    def test_roundtrip_with_transient_failures(self):
+        storage = FlakyStorage(os.path.join(self.tmp.name, 'blobs'), {'000002': 2})
+        upload = multipart_upload.MultipartUpload.start(
+            storage, self.staging, "encrypted/ks/big.enc", chunk_size=1024, max_workers=3
+        )
+        layout = upload.encrypt_and_upload(io.BytesIO(self.data), self.key)
+
+        self.assertEqual(layout['part_count'], 11)
+        self.assertEqual(self._download(storage, layout), self.data)
+        # Staging is cleaned up once every part is committed
+        self.assertEqual(os.listdir(self.staging), [])
+
+    def test_failed_part_stops_encryption_early(self):
+        storage = FlakyStorage(os.path.join(self.tmp.name, 'blobs'), {'000001': -1})
+        failing = threading.Event()
+        flaky_put = storage.put
+
+        def put(path, data):
+            # No part commits before part 1 has failed
+            if path.endswith('000001'):
+                failing.set()
+            else:
+                failing.wait(5)
+            flaky_put(path, data)
+
+        storage.put = put
+        upload = multipart_upload.MultipartUpload.start(
+            storage, self.staging, "encrypted/ks/big.enc", chunk_size=1024, max_workers=2, max_retries=0
+        )
+        encrypt_part = multipart_upload.file_crypto.encrypt_part
+        with patch('securevault.services.file_crypto.encrypt_part', side_effect=encrypt_part) as mock_encrypt:
+            with self.assertRaises(IOError):
+                upload.encrypt_and_upload(io.BytesIO(self.data), self.key)
+
+        # Encryption stopped before the last part
+        self.assertLess(mock_encrypt.call_count, 11)
+        self.assertIsNone(upload.manifest['part_count'])
+        self.assertIn(0, upload.manifest['committed'])
+        self.assertNotIn(1, upload.manifest['committed'])
+
+    def test_resume_without_re_encrypting(self):
+        # The final part fails, so every part was encrypted before the error
+        storage = FlakyStorage(os.path.join(self.tmp.name, 'blobs'), {'000010': -1})
+        upload = multipart_upload.MultipartUpload.start(
+            storage, self.staging, "encrypted/ks/big.enc", record={'original_filename': 'big'},
+            chunk_size=1024, max_workers=2, max_retries=1
+        )
+        with patch('securevault.services.multipart_upload.time.sleep'):
+            with self.assertRaises(IOError):
+                upload.encrypt_and_upload(io.BytesIO(self.data), self.key)
+
+        storage.failures.clear()
+        created = []
+        with patch('securevault.services.file_crypto.encrypt_part') as mock_encrypt:
+            completed = multipart_upload.resume_pending_uploads(
+                storage, self.staging, create_record=lambda **r: created.append(r)
+            )
+            mock_encrypt.assert_not_called()
+
+        self.assertEqual(completed, {'completed': ["encrypted/ks/big.enc"], 'removed': []})
+        self.assertEqual(created[0]['original_filename'], 'big')
+        self.assertEqual(self._download(storage, created[0]), self.data)
+
+    def test_abandoned_uploads_are_removed(self):
+        storage = FlakyStorage(os.path.join(self.tmp.name, 'blobs'), {'000003': -1})
+
+        class FailingReader(io.BytesIO):
+            def read(self, size=-1):
+                if self.tell() >= 4096:
+                    raise IOError("client went away")
+                return super().read(size)
+
+        def interrupted(path, src, **kwargs):
+            upload = multipart_upload.MultipartUpload.start(
+                storage, self.staging, path, record={'key_set_id': path}, chunk_size=1024,
+                max_workers=2, max_retries=0, **kwargs
+            )
+            with self.assertRaises(IOError):
+                upload.encrypt_and_upload(src, self.key)
+            return upload
+
+        unencrypted = interrupted("encrypted/ks/a.enc", FailingReader(self.data))
+        rotated = interrupted("encrypted/ks/b.enc", io.BytesIO(self.data), key_generation=1)
+        queued = interrupted("encrypted/ks/c.enc", io.BytesIO(self.data))
+        self.assertIsNone(unencrypted.manifest['part_count'])
+
+        # Uploads still making progress are left alone
+        report = multipart_upload.resume_pending_uploads(storage, self.staging, min_age=3600)
+        self.assertEqual(report, {'completed': [], 'removed': []})
+
+        report = multipart_upload.resume_pending_uploads(
+            storage, self.staging, is_current=lambda m: m['key_generation'] == 0, skip=[queued.staging_dir]
+        )
+        self.assertEqual(sorted(report['removed']), ["encrypted/ks/a.enc", "encrypted/ks/b.enc"])
+        self.assertEqual(os.listdir(self.staging), [os.path.basename(queued.staging_dir)])
+        for upload in (unencrypted, rotated):
+            self.assertTrue(upload.manifest['committed'])
+            for index in upload.manifest['committed']:
+                self.assertFalse(storage.exists(multipart_upload.part_path(upload.manifest['storage_path'], index)))
+
+    def test_reordered_parts_fail_authentication(self):
+        storage = LocalStorage(os.path.join(self.tmp.name, 'blobs'))
+        upload = multipart_upload.MultipartUpload.start(storage, self.staging, "encrypted/ks/big.enc", chunk_size=4096)
+        layout = upload.encrypt_and_upload(io.BytesIO(self.data), self.key)
+
+        first = storage.get(multipart_upload.part_path("encrypted/ks/big.enc", 0))
+        second = storage.get(multipart_upload.part_path("encrypted/ks/big.enc", 1))
+        storage.put(multipart_upload.part_path("encrypted/ks/big.enc", 0), second)
+        storage.put(multipart_upload.part_path("encrypted/ks/big.enc", 1), first)
+        with self.assertRaises(Exception):
+            self._download(storage, layout)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,36 @@
 import unittest
 from unittest.mock import MagicMock, patch
-from securevault.services import reconstruction_engine
+from securevault.services import reconstruction_engine, security_utils
+
+def _fake_share(**extra):
+    """A structurally valid encrypted share; decrypt_share is mocked in these tests."""
+    import os
+    share = {
+        'salt': security_utils.encode_bytes_to_base64(os.urandom(16)),
+        'nonce': security_utils.encode_bytes_to_base64(os.urandom(12)),
+        'ciphertext': security_utils.encode_bytes_to_base64(os.urandom(48)),
+        'kdf_iterations': 100000
+    }
+    share.update(extra)
+    return share
 
 class TestReconstruction(unittest.TestCase):
     
-    @patch('securevault.services.reconstruction_engine.SupabaseModels')
+    @patch('securevault.services.reconstruction_engine.get_models')
     @patch('securevault.services.reconstruction_engine.AuditLogger')
-    @patch('securevault.services.reconstruction_engine.sss_manager.SSSManager')
-    @patch('securevault.services.reconstruction_engine.share_crypto.decrypt_share')
-    def test_reconstruct_success(self, mock_decrypt, mock_sss, mock_logger, mock_db):
+    @patch('securevault.services.sss_manager.SSSManager')
+    @patch('securevault.services.share_crypto.decrypt_share')
+    def test_reconstruct_success(self, mock_decrypt, mock_sss, mock_logger, mock_get_models):
+        mock_db = mock_get_models.return_value
         # Setup mocks
         mock_decrypt.side_effect = ["share1", "share2", "share3"]
         mock_sss.combine_shares.return_value = b"reconstructed_key_32_bytes______"
         mock_db.create_reconstruction_session.return_value = {'id': 'sess_123'}
+        mock_db.get_key_set.return_value = {'id': 'ks_1', 'n_shares': 3, 'threshold': 3}
         
         engine = reconstruction_engine.ReconstructionEngine()
         
-        share_data = [{'d':1}, {'d':2}, {'d':3}]
+        share_data = [_fake_share(), _fake_share(), _fake_share()]
         passwords = ['p1', 'p2', 'p3']
         key_set_id = 'ks_1'
         
@@ -32,5 +46,123 @@ class TestReconstruction(unittest.TestCase):
         self.assertEqual(mock_decrypt.call_count, 3)
         mock_sss.combine_shares.assert_called_once()
 
+    @patch('securevault.services.reconstruction_engine.get_models')
+    @patch('securevault.services.reconstruction_engine.AuditLogger')
+    def test_reshare_batch(self, mock_logger, mock_get_models):
+        mock_db = mock_get_models.return_value
+        from securevault.services import share_crypto, sss_manager
+        
+        key = b"reshare_key_32_bytes____________"
+        reconstruction_engine._ACTIVE_SESSIONS_MEMORY['sess_a'] = {
+            'key': key,
+            'expires': reconstruction_engine.datetime.datetime.utcnow() + reconstruction_engine.datetime.timedelta(minutes=5),
+            'key_set_id': 'ks_a'
+        }
+        
+        results = reconstruction_engine.ReconstructionEngine.reshare_batch([
+            {'session_id': 'sess_a', 'n': 4, 'k': 3, 'passwords': ['pw'] * 4},
+            {'session_id': 'missing', 'n': 3, 'k': 2, 'passwords': ['pw'] * 3},
+        ], max_workers=2)
+        
+        self.assertEqual(results[0]['key_set_id'], 'ks_a')
+        self.assertEqual(len(results[0]['shares']), 4)
+        self.assertIn('error', results[1])
+        mock_db.update_key_set_shares.assert_called_once_with('ks_a', 4, 3, 1)
+        
+        # Any K of the new shares recover the unchanged key
+        shares = [share_crypto.decrypt_share(s, 'pw') for s in results[0]['shares'][1:]]
+        self.assertEqual(sss_manager.SSSManager.combine_shares(shares), key)
+
+    @patch('securevault.services.reconstruction_engine.get_models')
+    @patch('securevault.services.reconstruction_engine.AuditLogger')
+    @patch('securevault.services.share_crypto.decrypt_share')
+    def test_reconstruct_drops_corrupt_share(self, mock_decrypt, mock_logger, mock_get_models):
+        mock_db = mock_get_models.return_value
+        from securevault.services import sss_manager
+        
+        key = b"robust_reconstruction_key_32____"
+        shares = sss_manager.SSSManager.split_secret(key, 5, 2)
+        idx, data = shares[2].split('-')
+        shares[2] = f"{idx}-{'00' * 32}"
+        mock_decrypt.side_effect = shares
+        mock_db.get_key_set.return_value = {'id': 'ks_2', 'n_shares': 5, 'threshold': 2}
+        mock_db.create_reconstruction_session.return_value = {'id': 'sess_robust'}
+        
+        engine = reconstruction_engine.ReconstructionEngine
+        session_id = engine.reconstruct_key('ks_2', [_fake_share() for _ in range(5)], ['pw'] * 5)
+        
+        self.assertEqual(engine.get_key_for_session(session_id), key)
+        self.assertEqual(engine.get_rejected_shares(session_id), [3])
+
+    @patch('securevault.services.reconstruction_engine.get_models')
+    @patch('securevault.services.reconstruction_engine.AuditLogger')
+    def test_reconstruct_drops_share_that_fails_to_decrypt(self, mock_logger, mock_get_models):
+        mock_db = mock_get_models.return_value
+        from securevault.services import key_manager
+        
+        key = b"undecryptable_share_key_32______"
+        shares = key_manager.split_and_encrypt_key(key, 4, 2, ['pw'] * 4, key_set_id='ks_4')
+        ciphertext = bytearray(security_utils.decode_base64_to_bytes(shares[1]['ciphertext']))
+        ciphertext[0] ^= 1
+        shares[1]['ciphertext'] = security_utils.encode_bytes_to_base64(bytes(ciphertext))
+        mock_db.get_key_set.return_value = {'id': 'ks_4', 'n_shares': 4, 'threshold': 2}
+        mock_db.create_reconstruction_session.return_value = {'id': 'sess_undecryptable'}
+        
+        engine = reconstruction_engine.ReconstructionEngine
+        session_id = engine.reconstruct_key('ks_4', shares, ['pw'] * 4)
+        self.assertEqual(engine.get_key_for_session(session_id), key)
+        self.assertEqual(engine.get_rejected_shares(session_id), [2])
+        engine.end_session(session_id)
+        
+        # Without K good shares left it still fails
+        with self.assertRaises(ValueError):
+            key_manager.recover_key(shares[:2], ['pw'] * 2, 'ks_4', threshold=2)
+
+    @patch('securevault.services.reconstruction_engine.get_models')
+    @patch('securevault.services.reconstruction_engine.AuditLogger')
+    @patch('securevault.services.share_crypto.decrypt_share')
+    def test_foreign_share_rejected_before_kdf(self, mock_decrypt, mock_logger, mock_get_models):
+        from securevault.services import share_crypto
+        
+        own = share_crypto.encrypt_share("1-" + "ab" * 32, 'pw', key_set_id='ks_own')
+        foreign = share_crypto.encrypt_share("2-" + "cd" * 32, 'pw', key_set_id='ks_other')
+        
+        with self.assertRaises(ValueError):
+            reconstruction_engine.ReconstructionEngine.reconstruct_key('ks_own', [own, foreign], ['pw', 'pw'])
+        mock_decrypt.assert_not_called()
+
+    @patch('securevault.services.reconstruction_engine.get_models')
+    @patch('securevault.services.reconstruction_engine.AuditLogger')
+    @patch('securevault.services.share_crypto.decrypt_share')
+    def test_resubmission_reuses_live_session(self, mock_decrypt, mock_logger, mock_get_models):
+        mock_db = mock_get_models.return_value
+        from securevault.services import sss_manager
+        
+        key = b"idempotent_key_32_bytes_________"
+        mock_decrypt.side_effect = lambda share, password: shares[share['share_index'] - 1]
+        shares = sss_manager.SSSManager.split_secret(key, 3, 2)
+        mock_db.get_key_set.return_value = {'id': 'ks_3', 'n_shares': 3, 'threshold': 2}
+        mock_db.create_reconstruction_session.side_effect = [{'id': 'sess_first'}, {'id': 'sess_second'}, {'id': 'sess_third'}]
+        
+        engine = reconstruction_engine.ReconstructionEngine
+        submitted = [_fake_share(share_index=1), _fake_share(share_index=2)]
+        session_id = engine.reconstruct_key('ks_3', submitted, ['pw', 'pw'])
+        self.assertEqual(mock_decrypt.call_count, 2)
+        
+        # Same shares in another order: no KDF work, no new row
+        self.assertEqual(engine.reconstruct_key('ks_3', submitted[::-1], ['pw', 'pw']), session_id)
+        self.assertEqual(mock_decrypt.call_count, 2)
+        self.assertEqual(mock_db.create_reconstruction_session.call_count, 1)
+        
+        # A different password is not taken on trust
+        self.assertEqual(engine.reconstruct_key('ks_3', submitted, ['pw', 'other']), 'sess_second')
+        self.assertEqual(mock_decrypt.call_count, 4)
+        
+        # After a rotation the old shares no longer resolve to the session
+        engine.replace_session_key(session_id, b"rotated_key_32_bytes____________")
+        self.assertEqual(engine.reconstruct_key('ks_3', submitted, ['pw', 'pw']), 'sess_third')
+        engine.end_session('sess_third')
+        self.assertIsNone(engine.get_live_session(reconstruction_engine._submission_fingerprint('ks_3', submitted, ['pw', 'pw'])))
+
 if __name__ == '__main__':
     unittest.main()
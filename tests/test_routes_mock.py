@@ -21,13 +21,14 @@ class TestEncryptFileMock(unittest.TestCase):
         self.app.config['SECRET_KEY'] = 'dev'
         self.client = self.app.test_client()
 
-    @patch('securevault.routes.get_supabase')
-    @patch('securevault.routes.SupabaseModels')
+    @patch('securevault.storage.supabase_backend.get_supabase')
+    @patch('securevault.routes.get_models')
     @patch('securevault.routes.audit_logger.AuditLogger')
     @patch('securevault.routes.file_crypto')
     @patch('securevault.services.sss_manager')
     @patch('securevault.services.share_crypto')
-    def test_encrypt_file_upload_flow(self, mock_share_crypto, mock_sss, mock_file_crypto, mock_audit, mock_models, mock_get_supabase):
+    def test_encrypt_file_upload_flow(self, mock_share_crypto, mock_sss, mock_file_crypto, mock_audit, mock_get_models, mock_get_supabase):
+        mock_models = mock_get_models.return_value
         # Setup Mocks
         mock_file_crypto.encrypt_file.return_value = {
             'ciphertext': b'encrypted_content',
@@ -43,7 +44,7 @@ class TestEncryptFileMock(unittest.TestCase):
         
         # Mock Supabase
         mock_key_set = {'id': 'key_set_123', 'label': 'test'}
-        mock_models.create_key_set.return_value = mock_key_set
+        mock_models.unit_of_work.return_value.create_key_set.return_value = mock_key_set
         
         mock_storage = MagicMock()
         mock_bucket = MagicMock()
@@ -26,5 +26,57 @@ class TestShareCrypto(unittest.TestCase):
         with self.assertRaises(ValueError):
             share_crypto.decrypt_share(encrypted, wrong_password)
 
+    def test_binding_is_authenticated(self):
+        share = "3-" + "ab" * 32
+        encrypted = share_crypto.encrypt_share(share, "pw", key_set_id="ks_1")
+        self.assertEqual(encrypted['share_index'], 3)
+        self.assertEqual(encrypted['share_length'], 32)
+        self.assertEqual(share_crypto.decrypt_share(encrypted, "pw"), share)
+        
+        # Re-labelling the share for another key set breaks the GCM tag
+        tampered = dict(encrypted, key_set_id="ks_2")
+        with self.assertRaises(ValueError):
+            share_crypto.decrypt_share(tampered, "pw")
+
+    def test_binding_gf16_share(self):
+        share = "16:300-" + "ab" * 32
+        encrypted = share_crypto.encrypt_share(share, "pw", key_set_id="ks_1")
+        self.assertEqual(encrypted['field_bits'], 16)
+        self.assertEqual(share_crypto.check_share_bindings([encrypted], "ks_1"), [0])
+        self.assertEqual(share_crypto.decrypt_share(encrypted, "pw"), share)
+
+    def test_check_share_bindings(self):
+        a = share_crypto.encrypt_share("1-" + "ab" * 32, "pw", key_set_id="ks_1")
+        b = share_crypto.encrypt_share("2-" + "cd" * 32, "pw", key_set_id="ks_1")
+        
+        # Exact duplicates are dropped
+        self.assertEqual(share_crypto.check_share_bindings([a, b, a], "ks_1"), [0, 1])
+        
+        # Foreign key set, mismatched length, conflicting index, malformed input
+        short = share_crypto.encrypt_share("3-" + "ef" * 16, "pw", key_set_id="ks_1")
+        clash = share_crypto.encrypt_share("1-" + "ff" * 32, "pw", key_set_id="ks_1")
+        for bad in ([a, b], [a, short], [a, clash], [a, {'salt': '!!'}]):
+            key_set_id = "ks_2" if bad == [a, b] else "ks_1"
+            with self.assertRaises(ValueError):
+                share_crypto.check_share_bindings(bad, key_set_id)
+
+    def test_splits_cannot_be_mixed(self):
+        from securevault.services import key_manager
+        key = b'k' * 32
+        old = key_manager.split_and_encrypt_key(key, 3, 2, ['pw'] * 3, key_set_id='ks_1')
+        new = key_manager.split_and_encrypt_key(key, 3, 2, ['pw'] * 3, key_set_id='ks_1', generation=1)
+        self.assertEqual(new[0]['generation'], 1)
+
+        # Exactly K shares of two splits would combine into a wrong key
+        with self.assertRaises(ValueError):
+            key_manager.recover_key([old[0], new[1]], ['pw'] * 2, 'ks_1', 2)
+        # The generation is authenticated, so it cannot be relabelled
+        with self.assertRaises(ValueError):
+            share_crypto.decrypt_share(dict(old[0], generation=1), 'pw')
+        # Once the key set is at generation 1, the old split is refused outright
+        with self.assertRaises(ValueError):
+            key_manager.recover_key(old[:2], ['pw'] * 2, 'ks_1', 2, generation=1)
+        self.assertEqual(key_manager.recover_key(new[1:], ['pw'] * 2, 'ks_1', 2, generation=1)[0], key)
+
 if __name__ == '__main__':
     unittest.main()
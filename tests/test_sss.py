@@ -34,5 +34,56 @@ class TestSSSManager(unittest.TestCase):
             # If it raises, that's also acceptable for "failed to recover"
             pass
 
+    def test_combine_robust_locates_bad_shares(self):
+        secret = b"this is a 32 byte secret key!!!!"
+        shares = SSSManager.split_secret(secret, 7, 3)
+        
+        # Corrupt two shares: one flipped byte, one share from another secret
+        idx, data = shares[1].split('-')
+        corrupted = bytearray.fromhex(data)
+        corrupted[5] ^= 0xFF
+        shares[1] = f"{idx}-{corrupted.hex()}"
+        foreign = SSSManager.split_secret(b"another secret of 32 bytes!!!!!!", 7, 3)
+        shares[4] = foreign[4]
+        
+        recovered, bad = SSSManager.combine_shares_robust(shares, 3)
+        self.assertEqual(recovered, secret)
+        self.assertEqual(bad, [2, 5])
+
+    def test_combine_robust_too_many_errors(self):
+        secret = b"short secret"
+        shares = SSSManager.split_secret(secret, 5, 3)
+        foreign = SSSManager.split_secret(b"other secret", 5, 3)
+        shares[0], shares[1] = foreign[0], foreign[1]
+        
+        # 5 shares with K=3 can correct one error; two must not yield the secret
+        try:
+            recovered, _ = SSSManager.combine_shares_robust(shares, 3)
+            self.assertNotEqual(recovered, secret)
+        except ValueError:
+            pass
+
+    def test_gf16_large_share_count(self):
+        secret = b"this is a 32 byte secret key!!!!"
+        shares = SSSManager.split_secret(secret, 1000, 3)
+        self.assertEqual(len(shares), 1000)
+        self.assertTrue(shares[0].startswith("16:"))
+        
+        self.assertEqual(SSSManager.combine_shares(shares[-3:]), secret)
+        self.assertEqual(SSSManager.combine_shares([shares[0], shares[499], shares[999]]), secret)
+
+    def test_gf16_explicit_field(self):
+        secret = b"sixteen byte key"
+        shares = SSSManager.split_secret(secret, 5, 3, field_bits=16)
+        self.assertEqual(SSSManager.combine_shares(shares[1:4]), secret)
+        
+        # Mixing fields is rejected
+        gf8_shares = SSSManager.split_secret(secret, 5, 3)
+        with self.assertRaises(ValueError):
+            SSSManager.combine_shares([shares[0], gf8_shares[1], gf8_shares[2]])
+        
+        with self.assertRaises(ValueError):
+            SSSManager.split_secret(b"odd", 300, 3)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import subprocess
+import unittest
+from securevault import startup, supabase_client
+
+class TestStartup(unittest.TestCase):
+    def test_app_import_does_not_load_supabase_stack(self):
+        code = "import sys, app; print('supabase' in sys.modules, 'httpx' in sys.modules)"
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(out.stdout.strip().splitlines()[-1], 'False False')
+
+    def test_client_is_dropped_in_forked_children(self):
+        saved = supabase_client._supabase
+        supabase_client._supabase = object()
+        try:
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.write(write, b'1' if supabase_client._supabase is None else b'0')
+                os._exit(0)
+            os.waitpid(pid, 0)
+            self.assertEqual(os.read(read, 1), b'1')
+            self.assertIsNotNone(supabase_client._supabase)
+        finally:
+            supabase_client._supabase = saved
+
+    def test_phases_and_calibration(self):
+        import securevault
+        securevault.create_app()
+        calibration = startup.warm_up()
+        for name in ('config', 'blueprints', 'gf_tables', 'kdf_calibration'):
+            self.assertIn(name, startup.PHASES)
+        self.assertGreater(calibration['kdf_iterations_per_sec'], 0)
+        self.assertIn('blueprints=', startup.report())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import io
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from securevault.storage.local_backend import LocalStorage
+from securevault.storage.cache import CiphertextCache, CachedStorage
+
+class TestLocalStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_get_roundtrip(self):
+        data = os.urandom(3 * 1024 * 1024 + 7)
+        self.storage.put("encrypted/ks/a.enc", data)
+        self.assertTrue(self.storage.exists("encrypted/ks/a.enc"))
+        self.assertEqual(self.storage.get("encrypted/ks/a.enc"), data)
+        self.assertEqual(b"".join(self.storage.stream("encrypted/ks/a.enc", chunk_size=65536)), data)
+        self.assertEqual(self.storage.get_range("encrypted/ks/a.enc", 100, 200), data[100:200])
+
+        # File-like input, overwriting the same object
+        self.storage.put("encrypted/ks/a.enc", io.BytesIO(b"second"))
+        self.assertEqual(self.storage.get("encrypted/ks/a.enc"), b"second")
+
+    def test_hash_sharded_layout_and_atomic_commit(self):
+        self.storage.put("encrypted/ks/b.enc", b"blob")
+        physical = self.storage.local_path("encrypted/ks/b.enc")
+        name = os.path.basename(physical)
+        self.assertTrue(physical.endswith(os.path.join(name[:2], name[2:4], name)))
+        # No temporary files are left behind after commit
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'tmp')), [])
+
+    def test_delete_and_missing(self):
+        self.storage.put("x", b"1")
+        self.storage.delete("x")
+        self.assertFalse(self.storage.exists("x"))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.get("x")
+        # Deleting a missing object is not an error
+        self.storage.delete("x")
+
+class TestCiphertextCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = LocalStorage(os.path.join(self.tmp.name, 'remote'))
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_through_serves_second_read_locally(self):
+        self.backend.put("a", b"A" * 100)
+        storage = CachedStorage(self.backend, CiphertextCache(self.cache_dir, 10_000))
+        self.assertEqual(storage.get("a"), b"A" * 100)
+        self.backend.delete("a")
+        # Served from cache although the remote copy is gone
+        self.assertEqual(storage.get("a"), b"A" * 100)
+        self.assertEqual(storage.get_range("a", 10, 20), b"A" * 10)
+
+    def test_lru_eviction_respects_budget(self):
+        cache = CiphertextCache(self.cache_dir, 3 * (100 + 32))
+        for name in ("a", "b", "c"):
+            cache.put(name, name.encode() * 100)
+        cache.get("a")  # 'b' becomes least recently used
+        cache.put("d", b"d" * 100)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"a" * 100)
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+        # The index is rebuilt from disk on restart
+        reopened = CiphertextCache(self.cache_dir, cache.max_bytes)
+        self.assertEqual(reopened.size, cache.size)
+
+    def test_workers_sharing_a_directory_share_the_budget(self):
+        budget = 4 * (100 + 32)
+        workers = [CiphertextCache(self.cache_dir, budget) for _ in range(3)]
+        for i in range(12):
+            workers[i % 3].put(str(i), bytes([i]) * 100)
+            self.assertLessEqual(workers[0].size, budget)
+        on_disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(self.cache_dir)
+                      for f in names if f.endswith('.blob'))
+        self.assertEqual(on_disk, workers[1].size)
+        self.assertEqual(workers[2].get("11"), bytes([11]) * 100)
+
+    def test_entry_evicted_by_another_worker_while_read(self):
+        cache = CiphertextCache(self.cache_dir, 10_000)
+        cache.put("a", b"A" * 100)
+        with patch('securevault.storage.cache.os.utime', side_effect=FileNotFoundError):
+            self.assertEqual(cache.get("a"), b"A" * 100)
+
+    def test_hits_are_streamed_from_the_cached_file(self):
+        self.backend.put("a", b"A" * 5000)
+        storage = CachedStorage(self.backend, CiphertextCache(self.cache_dir, 10_000))
+        storage.get("a")
+        self.backend.delete("a")
+        with patch.object(CiphertextCache, 'get', side_effect=AssertionError("whole blob loaded")):
+            self.assertEqual(list(storage.stream("a", chunk_size=2048)), [b"A" * 2048, b"A" * 2048, b"A" * 904])
+            self.assertEqual(storage.get_range("a", 10, 20), b"A" * 10)
+
+        # A corrupt entry falls back to the backend
+        self.backend.put("a", b"B" * 5000)
+        with open(storage.cache._file("a"), 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"X")
+        self.assertEqual(b"".join(storage.stream("a")), b"B" * 5000)
+
+    def test_corrupt_entry_is_a_miss(self):
+        cache = CiphertextCache(self.cache_dir, 10_000)
+        cache.put("a", b"ciphertext")
+        path = cache._file("a")
+        with open(path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"X")
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(path))
+
+    def test_failed_cache_write_is_best_effort(self):
+        backend = MagicMock()
+        backend.get.return_value = b"A" * 100
+        storage = CachedStorage(backend, CiphertextCache(self.cache_dir, 10_000))
+        full_disk = MagicMock()
+        full_disk.__enter__.return_value.write.side_effect = OSError(28, "No space left on device")
+
+        def fdopen(fd, mode):
+            os.close(fd)
+            return full_disk
+
+        with patch('securevault.storage.cache.os.fdopen', side_effect=fdopen), patch('builtins.print'):
+            self.assertEqual(storage.get("a"), b"A" * 100)
+            storage.put("b", b"B" * 100)
+        backend.put.assert_called_once_with("b", b"B" * 100)
+        self.assertFalse(storage.cache.contains("a"))
+        # The partial entry is not left in the cache directory
+        self.assertEqual([n for n in os.listdir(self.cache_dir) if n.endswith('.tmp')], [])
+
+    def test_prefetch_warms_cache(self):
+        backend = MagicMock()
+        backend.get.side_effect = lambda p: p.encode()
+        storage = CachedStorage(backend, CiphertextCache(self.cache_dir, 10_000))
+        for future in storage.prefetch(["x/1", "x/2"]):
+            future.result()
+        backend.get.reset_mock()
+        self.assertEqual(storage.get("x/2"), b"x/2")
+        backend.get.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault import tracing
+from securevault.metrics import Instrumented
+from securevault.models_sqlite import SQLiteModels
+from securevault.storage.local_backend import LocalStorage
+
+class TestTrace(unittest.TestCase):
+    def test_counts_and_repeated_calls(self):
+        trace = tracing.Trace('main.x')
+        for _ in range(7):
+            trace.record('db.get_file_record', 0.001)
+        trace.record('storage.get', 0.002, 100)
+        self.assertEqual(trace.kind_calls['db'], 7)
+        self.assertEqual(trace.bytes, 100)
+        self.assertEqual(trace.repeated_calls(), {'db.get_file_record': 7})
+        self.assertEqual(trace.headers()['X-Backend-Storage-Calls'], '1')
+
+    def test_propagate_counts_worker_thread_calls(self):
+        from concurrent.futures import ThreadPoolExecutor
+        backend = Instrumented(LocalStorage(tempfile.mkdtemp()), 'storage')
+        token = tracing._current.set(tracing.Trace())
+        try:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(tracing.propagate(backend.put), ['a', 'b'], [b'12', b'345']))
+            trace = tracing.current()
+        finally:
+            tracing._current.reset(token)
+        self.assertEqual(trace.calls['storage.put'], 2)
+        self.assertEqual(trace.bytes, 5)
+
+class TestCallBudgets(unittest.TestCase):
+    """Backend round-trip budgets for the main routes, on SQLite and local storage."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            'METADATA_BACKEND': 'sqlite',
+            'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db'),
+        })
+        self.env.start()
+        storage = Instrumented(LocalStorage(os.path.join(self.tmp.name, 'blobs')), 'storage')
+        self.storage = patch('securevault.routes.get_storage', return_value=storage)
+        self.storage.start()
+
+        import securevault
+        self.app = securevault.create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['TRACE_HEADERS'] = True
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.storage.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_encrypt_reconstruct_decrypt_within_budget(self):
+        # Key set, file row and audit entry are written in one commit
+        with tracing.call_budget(db=1, storage=1):
+            response = self.client.post('/encrypt-file', data={
+                'file': (io.BytesIO(b'payload'), 'doc.txt'),
+                'n_shares': '3', 'threshold': '2', 'password': 'pw', 'key_set_id': 'new'
+            }, content_type='multipart/form-data')
+        export = json.loads(response.data)
+        self.assertEqual(response.headers['X-Backend-Storage-Calls'], '1')
+        # Tag is stored in the files row, so only the ciphertext body moves
+        self.assertEqual(int(response.headers['X-Backend-Bytes']), len(b'payload'))
+
+        bundle = json.dumps({'key_set_id': export['key_set_id'], 'shares': export['shares'][:2]}).encode()
+        with tracing.call_budget(db=3, storage=0):
+            self.client.post('/reconstruct-key', data={
+                'shares': [(io.BytesIO(bundle), 'shares.json')], 'password': 'pw'
+            }, content_type='multipart/form-data')
+
+        file_id = SQLiteModels.list_files_for_keyset(export['key_set_id'])[0]['id']
+        with tracing.call_budget(db=2, storage=1):
+            response = self.client.post('/decrypt-file', data={'file_id': file_id})
+        self.assertEqual(response.data, b'payload')
+
+    def test_budget_violation_fails(self):
+        with self.assertRaises(AssertionError) as ctx:
+            with tracing.call_budget(db=0):
+                self.client.get('/logs')
+        self.assertIn('db.list_audit_logs', str(ctx.exception))
+
+if __name__ == '__main__':
+    unittest.main()
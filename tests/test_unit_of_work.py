@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from securevault import tracing
+from securevault.metrics import Instrumented
+from securevault.models_sqlite import SQLiteModels
+from securevault.models_supabase import SupabaseModels
+from securevault.unit_of_work import WriteConflict
+
+class TestSQLiteUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {'SQLITE_PATH': os.path.join(self.tmp.name, 'meta.db')})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_commits_rows_that_reference_each_other(self):
+        with SQLiteModels.unit_of_work() as uow:
+            key_set = uow.create_key_set(3, 2, 'label')
+            record = uow.create_file_record('a.txt', 'encrypted/a.enc', 'n', 't', key_set['id'], wrapped_key='wk')
+            uow.update_key_set_shares(key_set['id'], 5, 3)
+            log = uow.insert_audit_log({'operation_type': 'FILE_ENCRYPTED', 'details': {'key_set_id': key_set['id']}})
+            # Nothing is written before the block ends
+            self.assertIsNone(SQLiteModels.get_key_set(key_set['id']))
+
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['n_shares'], 5)
+        self.assertEqual(SQLiteModels.get_file_record(record['id'])['wrapped_key'], 'wk')
+        self.assertEqual(SQLiteModels.list_audit_logs(10)[0]['details'], {'key_set_id': key_set['id']})
+        # Queued rows are completed by the commit
+        self.assertEqual(record['created_at'], SQLiteModels.get_file_record(record['id'])['created_at'])
+        self.assertIn('timestamp', log)
+
+    def test_failed_commit_writes_nothing(self):
+        uow = SQLiteModels.unit_of_work()
+        key_set = uow.create_key_set(3, 2)
+        uow.create_file_record('a.txt', 'encrypted/a.enc', 'n', 't', 'no-such-key-set')
+        with self.assertRaises(sqlite3.IntegrityError):
+            uow.commit()
+        self.assertIsNone(SQLiteModels.get_key_set(key_set['id']))
+
+        # An exception inside the block discards the queue
+        with self.assertRaises(RuntimeError):
+            with SQLiteModels.unit_of_work() as uow:
+                key_set = uow.create_key_set(3, 2)
+                raise RuntimeError("upload failed")
+        self.assertEqual(SQLiteModels.list_key_sets(), [])
+
+    def test_commit_is_one_traced_call(self):
+        token = tracing._current.set(tracing.Trace())
+        try:
+            with Instrumented(SQLiteModels, 'db').unit_of_work() as uow:
+                key_set = uow.create_key_set(3, 2)
+                uow.create_reconstruction_session(key_set['id'], '2030-01-01T00:00:00')
+            trace = tracing.current()
+        finally:
+            tracing._current.reset(token)
+        self.assertEqual(dict(trace.calls), {'db.flush': 1})
+
+    def test_failed_guard_fails_the_whole_commit(self):
+        key_set = SQLiteModels.create_key_set(3, 2)
+        SQLiteModels.create_file_record('a.txt', 'encrypted/a.enc', 'n', 't', key_set['id'])
+
+        with self.assertRaises(WriteConflict):
+            with SQLiteModels.unit_of_work() as uow:
+                uow.insert_audit_log({'operation_type': 'KEY_ROTATED'})
+                uow.update_key_set_shares(key_set['id'], 5, 3, share_generation=2)
+        with self.assertRaises(WriteConflict):
+            with SQLiteModels.unit_of_work() as uow:
+                uow.update_key_set_shares(key_set['id'], 5, 3, share_generation=1)
+                uow.expect_count('files', 'key_set_id', key_set['id'], 2)
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 0)
+        self.assertEqual(SQLiteModels.list_audit_logs(10), [])
+
+        with SQLiteModels.unit_of_work() as uow:
+            uow.update_key_set_shares(key_set['id'], 5, 3, share_generation=1)
+            uow.expect_count('files', 'key_set_id', key_set['id'], 1)
+        self.assertEqual(SQLiteModels.get_key_set(key_set['id'])['share_generation'], 1)
+
+    def test_rejects_other_tables(self):
+        with self.assertRaises(ValueError):
+            SQLiteModels.unit_of_work().insert('audit_archives', {'month': '2025-01'})
+
+class TestSupabaseUnitOfWork(unittest.TestCase):
+    @patch('securevault.models_supabase.get_supabase')
+    def test_one_rpc_fills_stored_rows(self, mock_get_supabase):
+        rpc = mock_get_supabase.return_value.rpc
+        with SupabaseModels.unit_of_work() as uow:
+            key_set = uow.create_key_set(3, 2)
+            uow.update_session_status('sess_1', 'USED')
+            rpc.return_value.execute.return_value.data = [dict(key_set, created_at='2025-01-01T00:00:00+00:00'), None]
+
+        rpc.assert_called_once()
+        name, params = rpc.call_args[0]
+        self.assertEqual(name, 'apply_writes')
+        self.assertEqual([(op['op'], op['table']) for op in params['ops']],
+                         [('insert', 'key_sets'), ('update', 'reconstruction_sessions')])
+        self.assertEqual(params['ops'][1], {'op': 'update', 'table': 'reconstruction_sessions', 'id': 'sess_1', 'values': {'status': 'USED'}})
+        self.assertEqual(key_set['created_at'], '2025-01-01T00:00:00+00:00')
+
+if __name__ == '__main__':
+    unittest.main()